@@ -1,8 +1,11 @@
-import threading
+import bisect
+import time
 from pathlib import Path
-from typing import List, Set, Tuple, Optional
+from typing import List, Set, Tuple, Optional, Dict, Union
 import os
 
+import numpy
+
 from src.Core.Dataset.DiscreteScale import DiscreteScale
 from src.Core.IWordSource import IWordSource
 from src.Core.Languages.LinguisticContext import LinguisticContext
@@ -16,7 +19,12 @@ from src.Core.Morphology.RootDetection.RootDetectorStackCacher import RootDetect
 from src.Core.OSimUnrPipeline.EnglishPipeline import EnglishPipeline
 from src.Core.OSimUnrPipeline.PipelineProviderBase import PipelineProviderBase
 
-from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import ICandidatePairGenerator
+from src.Core.Orthographic.CandidateGeneration.CandidateGeneratorFactory import CandidateGeneratorFactory, CandidateStrategies
+from src.Core.Orthographic.CandidateGeneration.MinHashLSHCandidateGenerator import MinHashLSHSettings
+from src.Core.Orthographic.CompositeOrthographicSimilarity import CompositeOrthographicSimilarity
+from src.Core.WordSim.IThresholdedWordSimilarity import IThresholdedWordSimilarity
+from src.Core.Orthographic.NormalizedStringSimilarity.BitParallelEditDistance import BitParallelEditDistance
 from src.Core.Orthographic.OverlappingMeasures import OverlapCoefficient
 from src.Core.Preprocessing.WordsFilterer import WordsFilterer
 from src.Core.Segmentation.Tokenizers.ITokenizer import ITokenizer
@@ -32,11 +40,18 @@ from src.Core.WordNet.Classifiers.WordNetDerivationallyRelatedBinaryClassifier i
 from src.Core.WordNet.IWordNet import IWordNet, WordNetSimilarityAlgorithms, Lemma2SynsetMatching
 from src.Core.WordNet.NLTKWordNetWrapper import NLTKWordNetWrapper
 from src.Core.WordNet.WordPairDefinitionSourceFilter import WordPairDefinitionSourceFilter
-from src.Core.WordPair import WordPair
+from src.Core.Vocabulary import Vocabulary
+from src.Core.WordPair import WordPair, SlottedWordPair
+from src.Core.WordPairTable import WordPairTable
 from src.Core.WordPairSynthesizer import WordPairSynthesizer
+from src.Core.ParallelPairScorer import ParallelPairScorer
+from src.Core.Stage2Checkpoint import Stage2Checkpoint, Stage2OutputWriter
+from src.Core.Stage2RowOrder import Stage2RowOrder
+from src.Core.Stage2ScoreStore import Stage2ScoreStore
 from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+from src.Core.WordSim.PersistentWordSimilarityCache import PersistentWordSimilarityCache
 from src.Core.WordSim.WordSimDataset import WordSimDataset
-from src.Core.WordSim.WordSimilarityNormalizerWrapper import WordSimilarityNormalizerWrapper
+from src.Core.WordSim.StreamingWordSimilarityNormalizer import StreamingWordSimilarityNormalizer
 from src.Tools import StringHelper, Resources
 from src.Tools.FormatHelper import NoDecimal
 from src.Tools.Logger import logp, log, logl, logpif
@@ -50,8 +65,9 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 #endregion
 
 logp("Building common context for the study...", True)
-Provider: PipelineProviderBase = EnglishPipeline(LinguisticContext.BuildEnglishContext(),EditDistance())
+Provider: PipelineProviderBase = EnglishPipeline(LinguisticContext.BuildEnglishContext(),BitParallelEditDistance())
 _Context: LinguisticContext = Provider.Context
+_Vocabulary: Vocabulary = Provider.Vocabulary  # Word ids shared by the stages, the tables and the caches of the study.
 _StudyName = "MyStudy"
 def GetStudyPath() -> str:
     return Resources.GetStudyPath(_StudyName)
@@ -111,134 +127,415 @@ def S2_GenerateOrthographicallySimilarWordPairsExhaustive(wordpool: List[str], o
                                                    minOrthographicSimQ4: float = 0.75, minOrthographicSimQ3: float = 0.5,
                                                    limitResults: int = None, resumeStage2: str = None,
                                                    snapshotPersistenceDetectedBatch: int = None, snapshotPersistenceBatchPercentage: int = 10,
-                                                   snapshotCallback=None, tryLoadStage2SessionCallback=None, snapshotFinalScale: DiscreteScale = None) -> Tuple[List[WordPair], List[WordPair], int]:
+                                                   snapshotCallback=None, tryLoadStage2SessionCallback=None, snapshotFinalScale: DiscreteScale = None,
+                                                   candidateStrategy: CandidateStrategies = None, workers: int = None, lshSettings: MinHashLSHSettings = None,
+                                                   checkpointDirectory: str = None, sessionId: str = None,
+                                                   deadline: float = None, rowOrderSeed: int = None, rowOrderBlocks: int = 100,
+                                                   scoreFloor: float = None) -> Tuple[WordPairTable, WordPairTable, int, int]:
     """
     Always perform the cheaper task first.
+    The detections are collected in WordPairTables, which keep the Q3 output of large pools in a fraction of the memory of WordPair lists.
+    Both tables use the study vocabulary, in which the sorted pool is interned first, so the word ids are the rows of the pool.
+    :param candidateStrategy: How to select the pairs worth scoring. Default (None): Auto. See CandidateStrategies.
+    :param workers: If greater than 1, the pairs are scored over that many processes (see ParallelPairScorer) with the same output. Default (None): Single process.
+    :param lshSettings: Bands, rows, target recall and the recall report of CandidateStrategies.MinHashLSH. Default (None): Calibrated for 0.95 recall on 200 sampled rows, with the measured recall logged before the run.
+    :param checkpointDirectory: If given, the detections are appended to {outputName}-{sessionId}.csv there by a background Stage2OutputWriter as they are found,
+    and a Stage2Checkpoint manifest is saved at every snapshot. A session with a manifest is resumed from its exact row. Default (None): No files, no snapshots.
+    :param sessionId: Session id of the checkpointed files. A resumed session is moved to it.
+    :param deadline: time.time() after which Stage 2 stops at the next row boundary and returns the detections of the rows visited so far.
+    The checkpoint is saved there, so the files are consistent and the session can be resumed from that row. Default (None): No deadline.
+    :param rowOrderSeed: If given, the rows are visited in blocks shuffled with this seed (see Stage2RowOrder), so a Stage 2 stopped early is a uniform sample of the pairs. Default (None): Sorted order.
+    :param rowOrderBlocks: Number of blocks of the shuffled row order.
+    :param scoreFloor: If given, every pair scoring at least this much is also appended to a Stage2ScoreStore (S2-ScoreStore-{alg}-{sessionId}.bin in the checkpoint directory),
+    so RebucketStage2 can emit the Q3/Q4 datasets of any thresholds above it without another Stage 2. The pairs are pruned at the floor instead of Q3, so this run is slower.
     :param snapshotPersistenceBatchPercentage: Specifies at which percentage intervals a snapshot will be taken.
     :param wordSource:
     :param orthographicSim:
     :param snapshotPersistenceBatch: Saves a snapshot of extracted pairs after the specified number of detections. Must be between 0-100.
-    :return:
+    :return: Q3 table, Q4 table, the number of pairs scored in this run (by Stage 2 or inside the candidate generator), and the number of detections in the tables.
     """
     # Validate
     if (minOrthographicSimQ4 == 0 or minOrthographicSimQ3 == 0): raise Exception("Orthographic similarity thresholds cannot be 0.")
     if (minOrthographicSimQ4 is None or minOrthographicSimQ3 is None): raise Exception("Orthographic similarity thresholds cannot be None.")
     if (minOrthographicSimQ3 >= minOrthographicSimQ4): raise Exception("Q3 cannot be greater than Q4.")
     if (not outputName4 or not outputName3): raise Exception("Output names are not provided.")
+    if (checkpointDirectory and not sessionId): raise Exception("Checkpoints need a session id.")
+    if (scoreFloor is not None and (scoreFloor <= 0 or scoreFloor > minOrthographicSimQ3)): raise Exception("The score floor must be greater than 0 and not greater than Q3.")
+    if (scoreFloor is not None and not checkpointDirectory): raise Exception("The score store is written next to the checkpoints, provide a checkpoint directory.")
     oSimName: str = str(orthographicSim)
     logp("Going to use '" + oSimName + "' as the orthographic similarity algorithm!")
-
-    wpOrthographicallySimilarsQ3: List[WordPair] = []
-    wpOrthographicallySimilarsQ4: List[WordPair] = []
+    minScored: float = scoreFloor if scoreFloor is not None else minOrthographicSimQ3     # Pairs below it are pruned by the candidate generators and never kept.
+
+    _Vocabulary.Ids(wordpool)
+    wpOrthographicallySimilarsQ3: WordPairTable = WordPairTable(_Vocabulary)
+    wpOrthographicallySimilarsQ4: WordPairTable = WordPairTable(_Vocabulary)
+    outputNames = {"Q3": outputName3, "Q4": outputName4}
+    minSimilarities = {"Q3": minOrthographicSimQ3, "Q4": minOrthographicSimQ4}
+    if (scoreFloor is not None):
+        outputNames[Stage2Checkpoint.ScoreStoreKey] = "S2-ScoreStore-" + oSimName.lower()
+        minSimilarities[Stage2Checkpoint.ScoreStoreKey] = scoreFloor
+    checkpoint: Stage2Checkpoint = None
+    rowOrder: Stage2RowOrder = Stage2RowOrder(len(wordpool), rowOrderSeed, rowOrderBlocks)
+    startPosition: int = 0  # Position of the first row to score in the row order. Rows before it are already in the tables.
+    i: int = 1
 
     # region Resume Mode
-    startingChar: str = None
-    reachedToLastSession: bool = None
-    if (resumeStage2):
+    if (resumeStage2 and checkpointDirectory and Stage2Checkpoint.Load(checkpointDirectory, oSimName, resumeStage2)):  # Exact row cursor.
+        checkpoint = Stage2Checkpoint.Load(checkpointDirectory, oSimName, resumeStage2)
+        checkpoint.ResumeAs(sessionId, len(wordpool), minSimilarities, rowOrder)
+        wpOrthographicallySimilarsQ3 = WordSimDataset(fullPath=checkpoint.OutputPath("Q3")).Load(autoLowerCase=False, asTable=True, vocabulary=_Vocabulary).Wordpairs
+        wpOrthographicallySimilarsQ4 = WordSimDataset(fullPath=checkpoint.OutputPath("Q4")).Load(autoLowerCase=False, asTable=True, vocabulary=_Vocabulary).Wordpairs
+        if ([len(wpOrthographicallySimilarsQ3), len(wpOrthographicallySimilarsQ4)] != [checkpoint.Counts["Q3"], checkpoint.Counts["Q4"]]):
+            raise Exception("Stage 2 files do not match their checkpoint " + str(checkpoint.Counts) + ".")
+        startPosition = checkpoint.Row
+        i = checkpoint.Pairs + 1
+    elif (resumeStage2):  # Sessions saved by full snapshots: continue from the first character of the last detection.
+        if (not rowOrder.IsSorted()): raise Exception("Sessions saved by full snapshots can only be resumed in the sorted row order.")
+        if (scoreFloor is not None): raise Exception("Sessions saved by full snapshots have no score store to continue.")
         ds4 = tryLoadStage2SessionCallback(outputName4, resumeStage2)
         ds3 = tryLoadStage2SessionCallback(outputName3, resumeStage2)
         lastWordProcessed = ds3.Wordpairs[ds3.Wordpairs.__len__() - 1].Word1  # Continue always from Q3.
         lastCharProccesed = lastWordProcessed[0]
         startingChar: str = _Context.Grammar.ToLowerCase(lastCharProccesed)
         logp("In the previous session, we stopped at the character '" + lastCharProccesed + "', and will continue from the beginning of the character '" + startingChar + "'...")
-        reachedToLastSession: bool = False
         wpOrthographicallySimilarsQ3 = ds3.Wordpairs
         wpOrthographicallySimilarsQ4 = ds4.Wordpairs
 
         # Delete latest pairs - leftovers to avoid possible duplicates - assumes ordered list, otherwise it takes too long.
         logl(str(wpOrthographicallySimilarsQ4.__len__()), "Q4.Items", anyMode=True)
         logp("Deleting word pairs for the last remaining characters to avoid duplicates...", anyMode=True)
-        for wp in wpOrthographicallySimilarsQ4:
-            if (wp.Word1[0] == startingChar):  # Assumes order! Deletes automatically after finding the first character.
-                index4 = wpOrthographicallySimilarsQ4.index(wp)
-                wpOrthographicallySimilarsQ4 = wpOrthographicallySimilarsQ4[0:index4]
-                break
+        index4 = next((r for r, wp in enumerate(wpOrthographicallySimilarsQ4) if wp.Word1[0] == startingChar), len(wpOrthographicallySimilarsQ4))  # Assumes order!
+        wpOrthographicallySimilarsQ4 = wpOrthographicallySimilarsQ4[0:index4]
         logl(str(wpOrthographicallySimilarsQ4.__len__()), "Q4.Items", anyMode=True)
         logl(str(wpOrthographicallySimilarsQ3.__len__()), "Q3.Items", anyMode=True)
-        for wp in wpOrthographicallySimilarsQ3:
-            if (wp.Word1[0] == startingChar):  # Same assumption of order for Q3.
-                index3 = wpOrthographicallySimilarsQ3.index(wp)
-                wpOrthographicallySimilarsQ3 = wpOrthographicallySimilarsQ3[0:index3]
-                break
+        index3 = next((r for r, wp in enumerate(wpOrthographicallySimilarsQ3) if wp.Word1[0] == startingChar), len(wpOrthographicallySimilarsQ3))  # Same assumption of order for Q3.
+        wpOrthographicallySimilarsQ3 = wpOrthographicallySimilarsQ3[0:index3]
         logl(str(wpOrthographicallySimilarsQ3.__len__()), "Q3.Items", anyMode=True)
         logp("Deletion process completed.", anyMode=True)
-        snapshotCallback(wpOrthographicallySimilarsQ3, outputName3, snapshotFinalScale)  # Save again with a new ID after loading.
-        snapshotCallback(wpOrthographicallySimilarsQ4, outputName4, snapshotFinalScale)
+        startPosition = next((r for r, w in enumerate(wordpool) if w[0] == startingChar), len(wordpool))  # The row itself in the sorted order.
+        if (not checkpointDirectory):
+            snapshotCallback(wpOrthographicallySimilarsQ3, outputName3, snapshotFinalScale)  # Save again with a new ID after loading.
+            snapshotCallback(wpOrthographicallySimilarsQ4, outputName4, snapshotFinalScale)
     #endregion
 
-    wpSynthesizer = WordPairSynthesizer().GeneratePossibleWordPairs(wordpool, allowSameWordsInAPair=False)
+    writer: Stage2OutputWriter = None
+    if (checkpointDirectory):
+        loadedRows: bool = checkpoint is None  # New session, or one resumed from full snapshots: the loaded rows are written once to the new files.
+        if (checkpoint is None):
+            checkpoint = Stage2Checkpoint(checkpointDirectory, sessionId, oSimName, outputNames, len(wordpool), minSimilarities, rowOrder)
+        writer = Stage2OutputWriter(checkpoint, [oSimName.lower() + "Similarity"], snapshotFinalScale,
+                                    headers={Stage2Checkpoint.ScoreStoreKey: Stage2ScoreStore.Header(wordpool, oSimName, scoreFloor)} if scoreFloor is not None else None)
+        if (loadedRows):
+            for key, table in [("Q3", wpOrthographicallySimilarsQ3), ("Q4", wpOrthographicallySimilarsQ4)]:
+                for wp in table.ToWordPairs():  # Copies: the writer never reads the tables.
+                    writer.Append(key, wp)
+        writer.SaveCheckpoint(startPosition, i - 1)
 
-    i: int = 1
-    estsize: int = int(NoDecimal((len(wordpool) * (len(wordpool) / 2))))  # Complexity: (n*n/2)
-    prog = Progressor(reportRemaniningTime=True, expectedIteration=estsize)
-    progBatchSize = 10 if estsize < 10000 else int(estsize / 10000)
-    wpCursor = None
+    checkpointDue = [False]  # Checkpoints are saved at the next row boundary, where the detections handed to the writer are whole rows.
+
+    def snapshot():
+        if (writer):
+            checkpointDue[0] = True
+
+    lastSnapshot = [0]
 
-    def saveInSeperateThread(wps, name, scale):
+    def detectionsSnapshot(donePerc: float):
         """
-        #ref:http://sebastiandahlgren.se/2014/06/27/running-a-method-as-a-background-thread-in-python/
-        :param wps:
-        :param name:
-        :return:
+        Snapshot by percentage for the streams that only yield the detections (no per-pair percentage in the loop below).
         """
-        thread = threading.Thread(target=snapshotCallback, args=(wps, name, scale))
-        thread.daemon = True  # Daemonize thread
-        thread.start()  # Start the execution
+        if (snapshotPersistenceBatchPercentage and int(donePerc // snapshotPersistenceBatchPercentage) > lastSnapshot[0]):
+            lastSnapshot[0] = int(donePerc // snapshotPersistenceBatchPercentage)
+            snapshot()
+
+    # All streams visit the same row ranges from startPosition on, so a resumed session does not enumerate the pairs of the rows it already has.
+    rowRanges = rowOrder.Ranges(startPosition)
+    if (not rowOrder.IsSorted()):
+        logp("Stage 2 visits the rows in " + str(len(rowRanges)) + " blocks shuffled with the seed " + str(rowOrderSeed) + ".", anyMode=True)
+    candidateGenerator: ICandidatePairGenerator = None
+    parallelScorer: ParallelPairScorer = None
+    scoredPairs: bool = False
+    exhaustivePairs = [0]  # Pairs of the rows scored so far by the exhaustive stream.
+    firstPair: int = i
+    if (workers and workers > 1):  # Sharded over processes. The stream only holds the detections, already scored.
+        logp("Stage 2 is sharded over " + str(workers) + " processes.", anyMode=True)
+        parallelScorer = ParallelPairScorer(workers)
+        wpSynthesizer = parallelScorer.GenerateScoredPairs(wordpool, orthographicSim, minScored, candidateStrategy, startPosition, chunkCallback=detectionsSnapshot,
+                                                                        lshSettings=lshSettings, rowRanges=None if rowOrder.IsSorted() else rowRanges)
+        estsize: int = None  # Detections are not known in advance. ParallelPairScorer reports the progress by chunks.
+        scoredPairs = True
+    else:
+        candidateGenerator = CandidateGeneratorFactory(orthographicSim, minScored, lshSettings).CreateCandidateGenerator(candidateStrategy)
+        if candidateGenerator:  # Pairs that provably cannot reach Q3 are never scored.
+            estsize: int = None
+            if (startPosition == 0 and deadline is None and not checkpointDirectory):  # Counting covers the whole pool, before the deadline and the checkpoints can see a row.
+                estsize = candidateGenerator.CountCandidatePairs(wordpool)
+                logp(type(candidateGenerator).__name__ + " kept " + str(estsize) + " candidate pairs out of " + NoDecimal(len(wordpool) * (len(wordpool) / 2)) + ".", anyMode=True)
+            wpSynthesizer = (wp for startRow, endRow in rowRanges for wp in candidateGenerator.GenerateCandidatePairs(wordpool, startRow, endRow))
+            scoredPairs = candidateGenerator.ScoresPairs()
+        else:  # Row by row over the sorted pool. Only the detections become WordPairs.
+            rowsProg = Progressor(reportRemaniningTime=True, expectedIteration=100)
+            lastPerc = [0]
+
+            def rowCompleted(donePerc: float, donePairs: int):
+                exhaustivePairs[0] = donePairs
+                if (int(donePerc) > lastPerc[0]):
+                    lastPerc[0] = int(donePerc)
+                    rowsProg.logpif(lastPerc[0], iterstr="pairs%", progressBatchSize=1, anyMode=True)
+                detectionsSnapshot(donePerc)
+
+            def inRowOrder(scoredRows):
+                """
+                Scores the row ranges one after the other and reports the percentage of all their pairs.
+                """
+                totalPairs: int = sum(Stage2RowOrder.PairsInRows(len(wordpool), startRow, endRow) for startRow, endRow in rowRanges)
+                donePairs: int = 0
+                for startRow, endRow in rowRanges:
+                    rangePairs: int = Stage2RowOrder.PairsInRows(len(wordpool), startRow, endRow)
+                    yield from scoredRows(wordpool, orthographicSim, minScored, startRow, endRow,
+                                          rowCallback=lambda perc, done=donePairs, pairs=rangePairs: rowCompleted(100 * (done + pairs * perc / 100) / totalPairs if totalPairs else 100.0,
+                                                                                                                  done + round(pairs * perc / 100)))
+                    donePairs += rangePairs
+
+            if (orthographicSim.IsBatchVectorized()):  # One WordSimilarityBatch call per row of the triangle.
+                wpSynthesizer = inRowOrder(WordPairSynthesizer().GenerateScoredPairsByRows)
+            else:
+                wpSynthesizer = inRowOrder(WordPairSynthesizer().GenerateScoredPairsByIndex)
+            estsize: int = None
+            scoredPairs = True
+
+    def results(streamPairs: int) -> Tuple[WordPairTable, WordPairTable, int, int]:
+        """
+        :param streamPairs: Pairs of the stream scored in this run.
+        """
+        if (parallelScorer):
+            scored = parallelScorer.ScoredPairs
+        elif (candidateGenerator is None):
+            scored = exhaustivePairs[0]
+        elif (scoredPairs):  # The stream only holds the detections.
+            scored = candidateGenerator.ScoredPairs
+        else:  # Every pair of the stream was scored below.
+            scored = streamPairs
+        return wpOrthographicallySimilarsQ3, wpOrthographicallySimilarsQ4, scored, len(wpOrthographicallySimilarsQ3) + len(wpOrthographicallySimilarsQ4)
 
+    prog = Progressor(reportRemaniningTime=True, expectedIteration=estsize)
+    progBatchSize = 100 if estsize is None else (10 if estsize < 10000 else int(estsize / 10000))
+    wpCursor = None
+
+    thresholdedSim: IThresholdedWordSimilarity = orthographicSim if isinstance(orthographicSim, IThresholdedWordSimilarity) else None  # Can stop scoring a pair as soon as it cannot reach Q3.
     firstChar: str = None
+    storeRecords: bytearray = bytearray()  # Score store records of the current row, handed to the writer at the row boundary.
+    storeCount: List[int] = [0]
+
+    def flushStore():
+        if (storeCount[0]):
+            writer.AppendRecords(Stage2Checkpoint.ScoreStoreKey, bytes(storeRecords), storeCount[0])
+            storeRecords.clear()
+            storeCount[0] = 0
+
+    row: int = 0
+    rowWord: str = None  # Word1 of a pair is always its row word of the sorted pool.
     for wp in wpSynthesizer:
+        if (wp.Word1 != rowWord):  # Row boundary: the tables hold exactly the detections of the rows visited before it.
+            rowWord = wp.Word1
+            row = bisect.bisect_left(wordpool, rowWord)
+            position: int = rowOrder.Position(row)
+            flushStore()
+            if (deadline is not None and time.time() >= deadline):  # Anytime stop: the partial output is whole rows, and the checkpoint is its resume cursor.
+                wpSynthesizer.close()
+                if (writer):
+                    writer.SaveCheckpoint(position, i - 1)
+                    writer.Close()
+                logp("Stage 2 reached its deadline after " + str(position) + " of " + str(len(wordpool)) + " rows"
+                     + (". Resume the session " + sessionId + " to continue." if writer else "."), anyMode=True)
+                return results(i - firstPair)  # The current pair is not scored.
+            if (checkpointDue[0]):
+                writer.SaveCheckpoint(position, i - 1)
+                checkpointDue[0] = False
         firstChar = wp.Word1[0]
         perc: float = prog.logpif(i, progressBatchSize=progBatchSize, anyMode=True, iterstr="iter-" + firstChar)
 
-        # region resume check
-        if (reachedToLastSession == False):
-            if (firstChar == startingChar):  # Skipping until reaching the stopped character; skipping is 10x faster than similarity calculation.
-                reachedToLastSession = True
-            else:
-                i = i + 1
-                continue
-        #endregion
-
         # Do the job
         try:
-            sim = orthographicSim.WordSimilarity(wp.Word1, wp.Word2)  # Without this cost, generating all possibilities for EN takes only 36 minutes. 95% of time is spent on this operation!
+            if (scoredPairs):
+                sim = wp.GetOtherSimilarity(oSimName)  # Already scored by the candidate generator.
+            elif (thresholdedSim is not None):
+                sim = thresholdedSim.WordSimilarityAtLeast(wp.Word1, wp.Word2, minScored)  # None if below Q3 (or the score floor).
+            else:
+                sim = orthographicSim.WordSimilarity(wp.Word1, wp.Word2)  # Without this cost, generating all possibilities for EN takes only 36 minutes. 95% of time is spent on this operation!
         except Exception as e:
             print("Error in osim operation! Alg:" + str(orthographicSim) + ", wp:" + wp.ToPairDisplay())
             print(e)
             raise
 
-        if (sim >= minOrthographicSimQ3):  # Ignore if smaller than both thresholds.
+        if (scoreFloor is not None and sim is not None and sim >= scoreFloor):
+            storeRecords += Stage2ScoreStore.Record.pack(row, bisect.bisect_left(wordpool, wp.Word2, row + 1), sim)
+            storeCount[0] += 1
+        if (sim is not None and sim >= minOrthographicSimQ3):  # Ignore if smaller than both thresholds.
             wp.SetOtherSimilarity(oSimName, sim)
             wpCursor = wpOrthographicallySimilarsQ4 if sim >= minOrthographicSimQ4 else wpOrthographicallySimilarsQ3
-            wpCursor.append(wp)
+            wpCursor.AppendWordPair(wp)
+            if (writer):
+                writer.Append("Q4" if sim >= minOrthographicSimQ4 else "Q3", wp)
             extracted: int = len(wpCursor)
             logpif(iter=len(wpCursor), iterstr="Detected", progressBatchSize=100, anyMode=True)  # Log every 100 detections.
             if (limitResults):
                 if (extracted >= limitResults):
-                    return wpOrthographicallySimilarsQ3, wpOrthographicallySimilarsQ4, i - 1
+                    if (writer):  # The files get the partial row too; the checkpoint stays at the last row boundary.
+                        flushStore()
+                        writer.Close()
+                    return results(i - firstPair + 1)
 
             # Snapshot by detected (disabled by default)
             if (snapshotPersistenceDetectedBatch):  # Save snapshot after specified detections.
                 if (extracted % snapshotPersistenceDetectedBatch == 0):
-                    saveInSeperateThread(wpOrthographicallySimilarsQ3, outputName3, snapshotFinalScale)
-                    saveInSeperateThread(wpOrthographicallySimilarsQ4, outputName4, snapshotFinalScale)
+                    snapshot()
 
         # Snapshot by percentage
         if (snapshotPersistenceBatchPercentage and perc):
             if ((perc % snapshotPersistenceBatchPercentage == 0)):  # Only at whole percentage points.
-                saveInSeperateThread(wpOrthographicallySimilarsQ3, outputName3, snapshotFinalScale)
-                saveInSeperateThread(wpOrthographicallySimilarsQ4, outputName4, snapshotFinalScale)
+                snapshot()
 
         i = i + 1
-    return wpOrthographicallySimilarsQ3, wpOrthographicallySimilarsQ4, i - 1
+    if (writer):
+        flushStore()
+        writer.SaveCheckpoint(len(wordpool), i - 1)
+        writer.Close()
+    return results(i - firstPair)
+
+
+def S2_GenerateOrthographicallySimilarWordPairsMultiMeasure(wordpool: List[str], compositeSim: CompositeOrthographicSimilarity, outputNames3: Dict[str, str], outputNames4: Dict[str, str],
+                                                            minSimilaritiesQ3: Dict[str, float], minSimilaritiesQ4: Dict[str, float], resumeStage2: str = None,
+                                                            snapshotPersistenceBatchPercentage: int = 10, snapshotFinalScale: DiscreteScale = None,
+                                                            checkpointDirectory: str = None, sessionId: str = None,
+                                                            deadline: float = None, rowOrderSeed: int = None, rowOrderBlocks: int = 100) -> Tuple[Dict[str, Tuple[WordPairTable, WordPairTable]], int]:
+    """
+    Stage 2 for all the measures of a composite similarity in one pass: every row of the pair triangle is enumerated once and scored by all measures (see CompositeOrthographicSimilarity).
+    Each measure has its own thresholds and its own Q3/Q4 outputs, with the same detections, order and columns as a Stage 2 run with that measure alone.
+    The checkpoints, the resume, the deadline and the row order work as in S2_GenerateOrthographicallySimilarWordPairsExhaustive; a session can only be resumed from its checkpoint manifest.
+    :param outputNames3: Measure name (e.g. nedit, jacc_ngr2), Q3 dataset name. Same for outputNames4.
+    :param minSimilaritiesQ3: Measure name, Q3 threshold. Same for minSimilaritiesQ4.
+    :return: Measure name, (Q3 table, Q4 table); and the number of pairs scored.
+    """
+    # Validate
+    names: List[str] = compositeSim.Names
+    for name in names:
+        if (name not in outputNames3 or name not in outputNames4): raise Exception("Output names are not provided for " + name + ".")
+        if (minSimilaritiesQ3.get(name) is None or minSimilaritiesQ4.get(name) is None): raise Exception("Orthographic similarity thresholds of " + name + " cannot be None.")
+        if (minSimilaritiesQ3[name] == 0 or minSimilaritiesQ4[name] == 0): raise Exception("Orthographic similarity thresholds cannot be 0.")
+        if (minSimilaritiesQ3[name] >= minSimilaritiesQ4[name]): raise Exception("Q3 cannot be greater than Q4 for " + name + ".")
+    if (checkpointDirectory and not sessionId): raise Exception("Checkpoints need a session id.")
+    oSimName: str = str(compositeSim)
+    logp("Going to score the measures " + str(names) + " in a single Stage 2 pass!")
+
+    _Vocabulary.Ids(wordpool)
+    tables: Dict[str, Tuple[WordPairTable, WordPairTable]] = {name: (WordPairTable(_Vocabulary), WordPairTable(_Vocabulary)) for name in names}
+    outputNames: Dict[str, str] = {}
+    minSimilarities: Dict[str, float] = {}
+    for name in names:
+        outputNames["Q3-" + name], outputNames["Q4-" + name] = outputNames3[name], outputNames4[name]
+        minSimilarities["Q3-" + name], minSimilarities["Q4-" + name] = minSimilaritiesQ3[name], minSimilaritiesQ4[name]
+    rowOrder: Stage2RowOrder = Stage2RowOrder(len(wordpool), rowOrderSeed, rowOrderBlocks)
+    checkpoint: Stage2Checkpoint = None
+    startPosition: int = 0
+    pairs: int = 0
+
+    if (resumeStage2):
+        checkpoint = Stage2Checkpoint.Load(checkpointDirectory, oSimName, resumeStage2) if checkpointDirectory else None
+        if (checkpoint is None): raise Exception("No Stage 2 checkpoint manifest found for the session " + resumeStage2 + " of " + oSimName + ".")
+        checkpoint.ResumeAs(sessionId, len(wordpool), minSimilarities, rowOrder)
+        tables = {name: tuple(WordSimDataset(fullPath=checkpoint.OutputPath(q + "-" + name)).Load(autoLowerCase=False, asTable=True, vocabulary=_Vocabulary).Wordpairs
+                              for q in ["Q3", "Q4"]) for name in names}
+        if ({q + "-" + name: len(tables[name][q == "Q4"]) for name in names for q in ["Q3", "Q4"]} != checkpoint.Counts):
+            raise Exception("Stage 2 files do not match their checkpoint " + str(checkpoint.Counts) + ".")
+        startPosition = checkpoint.Row
+        pairs = checkpoint.Pairs
+
+    writer: Stage2OutputWriter = None
+    if (checkpointDirectory):
+        if (checkpoint is None):
+            checkpoint = Stage2Checkpoint(checkpointDirectory, sessionId, oSimName, outputNames, len(wordpool), minSimilarities, rowOrder)
+        writer = Stage2OutputWriter(checkpoint, {key: [key[3:].lower() + "Similarity"] for key in outputNames}, snapshotFinalScale)
+        writer.SaveCheckpoint(startPosition, pairs)
+
+    rowRanges = rowOrder.Ranges(startPosition)
+    totalPairs: int = sum(Stage2RowOrder.PairsInRows(len(wordpool), startRow, endRow) for startRow, endRow in rowRanges)
+    donePairs: int = 0
+    lastSnapshot: int = 0
+    prog = Progressor(reportRemaniningTime=True, expectedIteration=100)
+    lastPerc: int = 0
+    for startRow, endRow in rowRanges:
+        for row in range(startRow, endRow):
+            if (deadline is not None and time.time() >= deadline):  # Anytime stop at a row boundary, as in the single measure Stage 2.
+                if (writer):
+                    writer.SaveCheckpoint(rowOrder.Position(row), pairs)
+                    writer.Close()
+                logp("Stage 2 reached its deadline after " + str(rowOrder.Position(row)) + " of " + str(len(wordpool)) + " rows"
+                     + (". Resume the session " + sessionId + " to continue." if writer else "."), anyMode=True)
+                return tables, pairs
+
+            w1: str = wordpool[row]
+            candidates: List[str] = wordpool[row + 1:]
+            for name, sims in compositeSim.WordSimilaritiesBatch(w1, candidates, minSimilaritiesQ3).items():
+                for offset in (sims >= minSimilaritiesQ3[name]).nonzero()[0]:     # NaN (skipped or None) is never selected.
+                    w2: str = candidates[offset]
+                    wp = SlottedWordPair(w1, w2) if w1 < w2 else SlottedWordPair(w2, w1)
+                    sim = float(sims[offset])
+                    wp.SetOtherSimilarity(name, sim)
+                    q4: bool = sim >= minSimilaritiesQ4[name]
+                    tables[name][q4].AppendWordPair(wp)
+                    if (writer):
+                        writer.Append(("Q4-" if q4 else "Q3-") + name, wp)
+            pairs += len(candidates)
+            donePairs += len(candidates)
+
+            perc: float = 100 * donePairs / totalPairs if totalPairs else 100.0
+            if (int(perc) > lastPerc):
+                lastPerc = int(perc)
+                prog.logpif(lastPerc, iterstr="pairs%", progressBatchSize=1, anyMode=True)
+            if (writer and snapshotPersistenceBatchPercentage and int(perc // snapshotPersistenceBatchPercentage) > lastSnapshot):
+                lastSnapshot = int(perc // snapshotPersistenceBatchPercentage)
+                writer.SaveCheckpoint(rowOrder.Position(row) + 1, pairs)
+    if (writer):
+        writer.SaveCheckpoint(len(wordpool), pairs)
+        writer.Close()
+    logp("Stage 2 detections by measure: " + str({name: (len(q3), len(q4)) for name, (q3, q4) in tables.items()}), anyMode=True)
+    return tables, pairs
+
+
+def RebucketStage2(minOrthographicSimQ3: float, minOrthographicSimQ4: float, scoreStorePath: str, posFilters: List[POSTypes] = [POSTypes.NOUN], runStage3: bool = True,
+                   maxRelatedness: float = 0.25, wnSimilarityCache: bool = False) -> Tuple[str, str]:
+    """
+    Emits the Stage 2 datasets of new thresholds from a Stage2ScoreStore (see the scoreFloor of Stage 2) and feeds them into S3_Run, without running Stage 2 again.
+    The datasets are saved in the study folder as a new Stage 2 session, named as in RunStudy. Stage 3 names its outputs after the session of the process,
+    so rebucketing to several thresholds in one process needs runStage3=False for all but one of them.
+    :param scoreStorePath: S2-ScoreStore-{alg}-{sessionId}.bin of a Stage 2 run with a score floor at or below minOrthographicSimQ3.
+    :param wnSimilarityCache: Stage 3 reuses the WordNet similarities cached by the earlier buckets. See S3_Run.
+    :return: The paths of the Q3 and Q4 datasets.
+    """
+    store: Stage2ScoreStore = Stage2ScoreStore.Load(scoreStorePath)
+    recordsQ3, recordsQ4 = store.Bucket(minOrthographicSimQ3, minOrthographicSimQ4)
+    sessionId: str = StringHelper.GenerateRandomStr(5)
+    oSimName: str = store.MeasureName.lower()
+    pathQ3: str = Stage2Checkpoint.SessionFilePath(str(StudyPathForLanguage()), "S2-OrthographicallySimilarsQ3-" + oSimName, sessionId)
+    pathQ4: str = Stage2Checkpoint.SessionFilePath(str(StudyPathForLanguage()), "S2-OrthographicallySimilarsQ4-" + oSimName, sessionId)
+    store.PersistBucket(recordsQ3, pathQ3, DiscreteScale(0, 1))
+    store.PersistBucket(recordsQ4, pathQ4, DiscreteScale(0, 1))
+    logp("Rebucketed " + str(len(store.Records)) + " pairs above " + str(store.Floor) + " for Q3=" + str(minOrthographicSimQ3) + " (" + str(len(recordsQ3)) + ") and Q4="
+         + str(minOrthographicSimQ4) + " (" + str(len(recordsQ4)) + ") as the session " + sessionId + ".", anyMode=True)
+    if (runStage3):
+        S3_Run(posFilters=posFilters, orthographicallySimilarWpsPathQ4=pathQ4, maxRelatedness=maxRelatedness, wnSimilarityCache=wnSimilarityCache)
+    return pathQ3, pathQ4
+
 
 
 # noinspection PyUnresolvedReferences
 # @with_goto
 def S3_Run(orthographicallySimilarWpsPathQ4: str = None, autoPersist: bool = True, posFilters: List[POSTypes] = [POSTypes.NOUN], includeQ3: bool = True,
-           orthographicallySimilarsWithRelatednessPathQ4=None, maxRelatedness: float = 0.25, skip: str = ""):
+           orthographicallySimilarsWithRelatednessPathQ4=None, maxRelatedness: float = 0.25, skip: str = "", vocabularyPath: str = None, wnSimilarityCache: bool = False):
     """
     Executes the steps of Stage4-Morphological Relatedness Filtering.
+    :param wnSimilarityCache: If True, the WordNet similarities are read from and written to the cache shared by the studies (see PersistentWordSimilarityCache), so reruns only score the new pairs.
+    :param vocabularyPath: S1-Vocabulary file of the study. If provided, the words keep the ids of Stage 1 and 2 when Stage 3 runs in a new process.
     :param orthographicallySimilarWpsPathQ4:
     :param autoPersist:
     :param posFilters:
@@ -258,6 +555,8 @@ def S3_Run(orthographicallySimilarWpsPathQ4: str = None, autoPersist: bool = Tru
     logl(wnSimName, "CreateWordNetSimAlgorithm")
     log("S3: Creating WordNet similarity for the language...")
     wordnetSim: IWordSimilarity = Provider.CreateWordNetForSimilarity(wnSimAlgorithm, wordSimPOSFilters=posFilters)
+    if wnSimilarityCache:
+        wordnetSim = PersistentWordSimilarityCache(wordnetSim)
     logl(str(wordnetSim), "WordNetSim Type", anyMode=True)
     logp("S3: Calculating WordNet relatedness values for WordPairs...", anyMode=True)
     if skip is None: skip = ""
@@ -269,6 +568,8 @@ def S3_Run(orthographicallySimilarWpsPathQ4: str = None, autoPersist: bool = Tru
 
     # region Load
     logp("S3: Loading", anyMode=True)
+    if vocabularyPath:
+        _Vocabulary.Load(vocabularyPath)
     if not orthographicallySimilarWpsPathQ4: raise Exception("orthographicallySimilarWpsPathQ4 is null!")
     orthographicallySimilarWpsPathQ3: str = orthographicallySimilarWpsPathQ4.replace("SimilarsQ4", "SimilarsQ3")
     dsOrthographicallySimilarsQ3: WordSimDataset = None
@@ -276,11 +577,11 @@ def S3_Run(orthographicallySimilarWpsPathQ4: str = None, autoPersist: bool = Tru
     # Q4
     if orthographicallySimilarWpsPathQ4:
         dsOrthographicallySimilarsQ4 = WordSimDataset(fullPath=orthographicallySimilarWpsPathQ4, linguisticContext=_Context)
-        dsOrthographicallySimilarsQ4.Load()
+        dsOrthographicallySimilarsQ4.Load(asTable=True, vocabulary=_Vocabulary)
     # Q3
     if includeQ3:
         dsOrthographicallySimilarsQ3 = WordSimDataset(fullPath=orthographicallySimilarWpsPathQ3, linguisticContext=_Context)
-        dsOrthographicallySimilarsQ3.Load()
+        dsOrthographicallySimilarsQ3.Load(asTable=True, vocabulary=_Vocabulary)
     # endregion
 
     def setWordNetSimilarities(wn, ds, s2ExistingPath: str, allowNoneSims: bool = False) -> Tuple[str, str]:
@@ -294,15 +595,18 @@ def S3_Run(orthographicallySimilarWpsPathQ4: str = None, autoPersist: bool = Tru
         """
         logp("Setting WordNet similarities for " + s2ExistingPath + " ...", anyMode=True)
         scoreScale = wn.SimilarityScale()
-        wnEff: IWordSimilarity = None  # Can be wrapped for normalization purposes if needed.
+        normalizer: StreamingWordSimilarityNormalizer = None  # Min-max normalizes the open scales over the dataset, in two passes over a score array.
+        normalizeds: numpy.ndarray = None
         if not scoreScale.IsNormalized():
-            wnEff = WordSimilarityNormalizerWrapper(wn, ds.Wordpairs, finalScale)
-        else:
-            wnEff = wn
+            normalizer = StreamingWordSimilarityNormalizer(wn, finalScale)
+            normalizeds = normalizer.Normalize(ds.Wordpairs)
 
         wpIndex: int = 0
         for wp in ds.Wordpairs:
-            sim = wnEff.WordSimilarityInScale(wp.Word1, wp.Word2, finalScale)
+            if normalizer is not None:
+                sim = normalizer.ScoreInScale(normalizeds[wpIndex], finalScale)
+            else:
+                sim = wn.WordSimilarityInScale(wp.Word1, wp.Word2, finalScale)
             if sim is None and not allowNoneSims:
                 raise Exception("OSim result is 'None'. Cannot proceed without enabling allowNoneSims mode. OSimUnr does not accept None TSim." + str(wp))
             ds.Wordpairs[wpIndex].SetOtherSimilarity(wnSimName, sim)
@@ -321,16 +625,19 @@ def S3_Run(orthographicallySimilarWpsPathQ4: str = None, autoPersist: bool = Tru
 
     if includeQ3:
         newS3DatasetNameQ3, newS3DatasetPathQ3 = setWordNetSimilarities(wordnetSim, dsOrthographicallySimilarsQ3, orthographicallySimilarWpsPathQ3)
+    if isinstance(wordnetSim, PersistentWordSimilarityCache):
+        wordnetSim.Close()
+        logp("S3: " + wordnetSim.Report(), anyMode=True)
 
     # region 3a - Relatedness Filtering
     # label .Stage3a
     if dsOrthographicallySimilarsQ4 is None:
         dsOrthographicallySimilarsQ4 = WordSimDataset(fullPath=orthographicallySimilarsWithRelatednessPathQ4, linguisticContext=_Context)
-        dsOrthographicallySimilarsQ4.Load()
+        dsOrthographicallySimilarsQ4.Load(asTable=True, vocabulary=_Vocabulary)
     if includeQ3:
         orthographicallySimilarsWithRelatednessPathQ3: str = orthographicallySimilarsWithRelatednessPathQ4.replace("SimilarsWithWNQ4", "SimilarsWithWNQ3")
         dsOrthographicallySimilarsQ3 = WordSimDataset(fullPath=orthographicallySimilarsWithRelatednessPathQ3, linguisticContext=_Context)
-        dsOrthographicallySimilarsQ3.Load()
+        dsOrthographicallySimilarsQ3.Load(asTable=True, vocabulary=_Vocabulary)
 
     # Initialize Root Detection Tools
     logp("Initializing root detection dependencies...", anyMode=True)
@@ -406,10 +713,21 @@ def S3_Run(orthographicallySimilarWpsPathQ4: str = None, autoPersist: bool = Tru
 
 
 def RunStudy(wordPosFilters: List[POSTypes] = None, preExtractedWordPairsPath=None, wordpoolPath=None, wordpairLimit: int = None, autoPersist=True, limitWordCands: int = None,
-             wordpairsPath: str = None, minOrthographicSimQ4: float = None, minOrthographicSimQ3: float = None, orthographicSim: IWordSimilarity = None, resumeStage2: str = None, s1Only: bool = False,
-             allowAccentDuplicates: bool = True, resumeStage3and4: bool = True, maxRelatedness: float = 0.25):
+             wordpairsPath: str = None, minOrthographicSimQ4: Union[float, Dict[str, float]] = None, minOrthographicSimQ3: Union[float, Dict[str, float]] = None, orthographicSim: IWordSimilarity = None, resumeStage2: str = None, s1Only: bool = False,
+             allowAccentDuplicates: bool = True, resumeStage3and4: bool = True, maxRelatedness: float = 0.25, candidateStrategy: CandidateStrategies = None, workers: int = None,
+             lshSettings: MinHashLSHSettings = None, timeBudget: float = None, rowOrderSeed: int = None, rowOrderBlocks: int = 100, scoreFloor: float = None,
+             wnSimilarityCache: bool = False):
     """
-    :param resumeStage2: If the session ID of a previously incomplete stage2 is provided, it continues from there. If None, it calculates a new session from scratch. Default: None
+    :param wnSimilarityCache: Stage 3 reads and writes the WordNet similarities in the cache shared by the studies. See S3_Run.
+    :param scoreFloor: If given, Stage 2 also keeps every pair above it in a score store, from which RebucketStage2 emits the datasets of other thresholds. Default (None): No store.
+    :param timeBudget: Seconds from the start of the study after which Stage 2 stops at the next row boundary. Stage 3 then runs on the partial Q3/Q4 files,
+    and the Stage 2 session can be resumed later from its checkpoint. Default (None): Stage 2 runs to the end.
+    :param rowOrderSeed: Seed of the shuffled Stage 2 row order, so a Stage 2 stopped by the time budget is a uniform sample of the pairs instead of the first words of the alphabet. Default (None): Sorted order.
+    :param rowOrderBlocks: Number of row blocks of the shuffled order (see Stage2RowOrder).
+    :param candidateStrategy: Stage 2 candidate pair selection. Default (None): Auto, which filters nedit with CandidateStrategies.QGramIndex and scores the survivors in row batches.
+    :param workers: Number of processes for Stage 2. Default (None): Single process. Use os.cpu_count() for all cores.
+    :param lshSettings: Only for CandidateStrategies.MinHashLSH. The recall is measured and logged before Stage 2 starts unless recallSampleRows is 0.
+    :param resumeStage2: If the session ID of a previously incomplete stage2 is provided, it continues from there (from its exact row if it has a checkpoint manifest). If None, it calculates a new session from scratch. Default: None
     :param wordPosFilters: If None, all words found are used. If filters are provided, only those POS words are included in the pipeline at the wordpool level.
     :param preExtractedWordPairsPath:
     :param wordpoolPath:
@@ -417,13 +735,15 @@ def RunStudy(wordPosFilters: List[POSTypes] = None, preExtractedWordPairsPath=No
     :param autoPersist:
     :param limitWordCands:
     :param wordpairsPath:
-    :param minOrthographicSimQ4:
-    :param minOrthographicSimQ3:
+    :param minOrthographicSimQ4: With a CompositeOrthographicSimilarity, either one threshold for all measures or the threshold of each measure by its name (e.g. {"nedit": 0.75, "jacc_ngr2": 0.6}).
+    :param minOrthographicSimQ3: Same as minOrthographicSimQ4.
+    :param orthographicSim: A CompositeOrthographicSimilarity scores all of its measures in one Stage 2 pass, with the Q3/Q4 files and Stage 3 of each measure.
     :param allowAccentDuplicates: If True, allows matches like "harekât-harekat". If False, keeps the accented version and removes unaccented matches.
     :return:
     """
     finalScale = DiscreteScale(0, 1)
     _MaxRelatedness = maxRelatedness
+    deadline: float = time.time() + timeBudget if timeBudget is not None else None
 
     # General Warnings
     if (wordPosFilters is None): logp("No POS Filter defined for the entire pipeline! Are you sure? Ignore this if you are using an existing pool file!")
@@ -434,7 +754,7 @@ def RunStudy(wordPosFilters: List[POSTypes] = None, preExtractedWordPairsPath=No
         dsName = subDatasetName + "-" + sessionId
         fpath = str(Path(StudyPathForLanguage().joinpath(f'{dsName}.csv')))
         dsOrthographicallySimilars: WordSimDataset = WordSimDataset(fullPath=fpath, linguisticContext=_Context)
-        WordSimDataset.Load(dsOrthographicallySimilars, autoLowerCase=False)
+        WordSimDataset.Load(dsOrthographicallySimilars, autoLowerCase=False, asTable=True, vocabulary=_Vocabulary)
         logp("Loaded snapshot: " + fpath + "(" + str(len(dsOrthographicallySimilars.Wordpairs)) + ")", anyMode=True)
         return dsOrthographicallySimilars
 
@@ -523,34 +843,53 @@ def RunStudy(wordPosFilters: List[POSTypes] = None, preExtractedWordPairsPath=No
                 saveWordpool(sortedWordpool, str(Path(StudyPathForLanguage()).joinpath(f'S1-FinalWordPool-{_RndName}.txt')))
                 # endregion
 
+            # Word ids: the rows of the sorted pool, then the words derived in the later stages.
+            _Vocabulary.Ids(sortedWordpool)
+            _Vocabulary.Save(str(Path(StudyPathForLanguage()).joinpath(f'S1-Vocabulary-{_RndName}.txt')))
+
             # 2: GENERATE WORDPAIRS
             if (s1Only):
                 log("S1 completed. Exiting due to S1Only mode!", anyMode=True)
                 exit()
             log("Starting Stage2...", anyMode=True)
             if (not orthographicSim): raise Exception("No OrthographicSim defined. Cannot continue to Stage2!")
-            oSimName: str = str(orthographicSim).lower()
-            logl(oSimName, "oSimAlg", anyMode=True)
-            outputName3: str = "S2-OrthographicallySimilarsQ3-" + oSimName
-            outputName4: str = "S2-OrthographicallySimilarsQ4-" + oSimName
-            orthographicallySimilarQ3, orthographicallySimilarQ4, totalSpace = S2_GenerateOrthographicallySimilarWordPairsExhaustive(
-                wordpool=sortedWordpool,
-                orthographicSim=orthographicSim, minOrthographicSimQ3=minOrthographicSimQ3, minOrthographicSimQ4=minOrthographicSimQ4, limitResults=wordpairLimit,
-                snapshotPersistenceDetectedBatch=None if autoPersist else None,
-                snapshotPersistenceBatchPercentage=4 if autoPersist else None,
-                snapshotCallback=snapshotSave, outputName3=outputName3, outputName4=outputName4,
-                tryLoadStage2SessionCallback=tryLoadStage2Session, resumeStage2=resumeStage2, snapshotFinalScale=finalScale)
-            print("totalSpace: " + str(totalSpace))
-
-            # Save as WordSim Dataset
+            measureNames: List[str] = orthographicSim.Names if isinstance(orthographicSim, CompositeOrthographicSimilarity) else [str(orthographicSim)]
+            logl(str(orthographicSim).lower(), "oSimAlg", anyMode=True)
+            outputNames3: Dict[str, str] = {name: "S2-OrthographicallySimilarsQ3-" + name.lower() for name in measureNames}
+            outputNames4: Dict[str, str] = {name: "S2-OrthographicallySimilarsQ4-" + name.lower() for name in measureNames}
+            if (isinstance(orthographicSim, CompositeOrthographicSimilarity)):  # One pass for all measures, with the files of each measure.
+                if (scoreFloor is not None): raise Exception("Score stores are only written by the Stage 2 of a single measure.")
+                tables, totalSpace = S2_GenerateOrthographicallySimilarWordPairsMultiMeasure(
+                    wordpool=sortedWordpool, compositeSim=orthographicSim, outputNames3=outputNames3, outputNames4=outputNames4,
+                    minSimilaritiesQ3={name: minOrthographicSimQ3[name] if isinstance(minOrthographicSimQ3, dict) else minOrthographicSimQ3 for name in measureNames},
+                    minSimilaritiesQ4={name: minOrthographicSimQ4[name] if isinstance(minOrthographicSimQ4, dict) else minOrthographicSimQ4 for name in measureNames},
+                    resumeStage2=resumeStage2, snapshotPersistenceBatchPercentage=4 if autoPersist else None, snapshotFinalScale=finalScale,
+                    checkpointDirectory=str(StudyPathForLanguage()) if autoPersist else None, sessionId=_RndName,
+                    deadline=deadline, rowOrderSeed=rowOrderSeed, rowOrderBlocks=rowOrderBlocks)
+                detections: int = sum(len(q3) + len(q4) for q3, q4 in tables.values())
+            else:
+                orthographicallySimilarQ3, orthographicallySimilarQ4, totalSpace, detections = S2_GenerateOrthographicallySimilarWordPairsExhaustive(
+                    wordpool=sortedWordpool,
+                    orthographicSim=orthographicSim, minOrthographicSimQ3=minOrthographicSimQ3, minOrthographicSimQ4=minOrthographicSimQ4, limitResults=wordpairLimit,
+                    snapshotPersistenceDetectedBatch=None if autoPersist else None,
+                    snapshotPersistenceBatchPercentage=4 if autoPersist else None,
+                    snapshotCallback=snapshotSave, outputName3=outputNames3[measureNames[0]], outputName4=outputNames4[measureNames[0]],
+                    tryLoadStage2SessionCallback=tryLoadStage2Session, resumeStage2=resumeStage2, snapshotFinalScale=finalScale,
+                    candidateStrategy=candidateStrategy, workers=workers, lshSettings=lshSettings,
+                    checkpointDirectory=str(StudyPathForLanguage()) if autoPersist else None, sessionId=_RndName,
+                    deadline=deadline, rowOrderSeed=rowOrderSeed, rowOrderBlocks=rowOrderBlocks, scoreFloor=scoreFloor)
+            print("totalSpace: " + str(totalSpace))     # Pairs scored, not the whole pair space when a candidate strategy skips some.
+            print("detections: " + str(detections))
+
+            # The WordSim Datasets are already complete: Stage 2 appends them at every checkpoint. After a deadline, they hold the rows visited so far.
             if (autoPersist):
-                pathQ3: Optional[str] = snapshotSave(orthographicallySimilarQ3, outputName3, finalScale)
-                pathQ4: Optional[str] = snapshotSave(orthographicallySimilarQ4, outputName4, finalScale)
+                for name in measureNames:
+                    pathQ4: Optional[str] = Stage2Checkpoint.SessionFilePath(str(StudyPathForLanguage()), outputNames4[name], _RndName)
 
-                # Resume Stage 3 and 4
-                if (resumeStage3and4):
-                    S3_Run(posFilters=wordPosFilters, orthographicallySimilarWpsPathQ4=pathQ4, autoPersist=autoPersist,
-                           maxRelatedness=_MaxRelatedness)
+                    # Resume Stage 3 and 4
+                    if (resumeStage3and4):
+                        S3_Run(posFilters=wordPosFilters, orthographicallySimilarWpsPathQ4=pathQ4, autoPersist=autoPersist,
+                               maxRelatedness=_MaxRelatedness, wnSimilarityCache=wnSimilarityCache)
             else:
                 raise Exception("AutoPersist is disabled. Cannot continue to Stage 3 without saving the results.")
     # endregion
@@ -558,17 +897,32 @@ def RunStudy(wordPosFilters: List[POSTypes] = None, preExtractedWordPairsPath=No
 
 def GenerateDataset(wordpoolPath: str = None, wordpairsPath: str = None,
           resume: str = None, s1Only: bool = False, limitWordCands: int = None, minOrthographicSimQ4:float=None, minOrthographicSimQ3:float=None,
-          wordPosFilters:List[POSTypes]=None, resumeStage3and4=True, maxRelatedness:float = 0.25):
+          wordPosFilters:List[POSTypes]=None, resumeStage3and4=True, maxRelatedness:float = 0.25, candidateStrategy:CandidateStrategies = None, workers:int = None,
+          lshSettings:MinHashLSHSettings = None, timeBudget:float = None, rowOrderSeed:int = None, rowOrderBlocks:int = 100,
+          orthographicSims:List[IWordSimilarity] = None, scoreFloor:float = None, wnSimilarityCache:bool = False):
+    """
+    :param wnSimilarityCache: Reuses the WordNet similarities of earlier runs and studies in Stage 3. See S3_Run.
+    :param scoreFloor: Keeps the Stage 2 scores above it, so that RebucketStage2 can emit the datasets of other thresholds in seconds. See RunStudy.
+    :param orthographicSims: Several orthographic similarities to compare (e.g. nedit, jacc, dice, over), scored in a single Stage 2 pass with their own Q3/Q4 files.
+    The thresholds can then be given by measure name. Default (None): The orthographic similarity of the pipeline.
+    :param timeBudget: Seconds after which Stage 2 stops with consistent partial Q3/Q4 files and continues into Stage 3 with them. See RunStudy.
+    :param rowOrderSeed: Shuffles the Stage 2 row order, so that the partial files are a uniform sample of the pairs. See RunStudy.
+    """
 
     if wordPosFilters is None:
         wordPosFilters = []
 
     oSimAlg = Provider.GetOrthographicSimilarityAlgorithm()
+    if orthographicSims:
+        oSimAlg = orthographicSims[0] if len(orthographicSims) == 1 else CompositeOrthographicSimilarity(orthographicSims)
 
     RunStudy(
         wordPosFilters=wordPosFilters, limitWordCands=limitWordCands, minOrthographicSimQ3=minOrthographicSimQ3, minOrthographicSimQ4=minOrthographicSimQ4,
         orthographicSim=oSimAlg,
         wordpoolPath=wordpoolPath,
         wordpairsPath=wordpairsPath, wordpairLimit=None,
-        resumeStage2=resume, s1Only=s1Only, resumeStage3and4=resumeStage3and4, maxRelatedness=maxRelatedness
+        resumeStage2=resume, s1Only=s1Only, resumeStage3and4=resumeStage3and4, maxRelatedness=maxRelatedness,
+        candidateStrategy=candidateStrategy, workers=workers, lshSettings=lshSettings,
+        timeBudget=timeBudget, rowOrderSeed=rowOrderSeed, rowOrderBlocks=rowOrderBlocks, scoreFloor=scoreFloor,
+        wnSimilarityCache=wnSimilarityCache
     )
@@ -0,0 +1,73 @@
+# coding=utf-8
+import unittest
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+from unittest import TestCase
+
+from src.Core.Morphology.RootDetection.RootDetectorCacher import MonitorableCacheBase
+
+
+class LRUCache(MonitorableCacheBase):
+    """
+    Size-bounded cache that drops the least recently used items first. None values are cached too (see TryGet).
+    Provides the hit/miss counters of MonitorableCacheBase and the number of evicted items.
+    """
+
+    def __init__(self, maxSize: int = None) -> None:
+        """
+        :param maxSize: Max number of items. Default (None): Unbounded. 0 disables the cache.
+        """
+        super().__init__()
+        self.MaxSize: int = maxSize
+        self.Evicted: int = 0
+        self._Items: OrderedDict = OrderedDict()
+
+    def TryGet(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        :return: (True, value) if the key is cached, else (False, None).
+        """
+        self.Attempt = self.Attempt + 1
+        if key in self._Items:
+            self.Hit = self.Hit + 1
+            self._Items.move_to_end(key)
+            return True, self._Items[key]
+        self.Miss = self.Miss + 1
+        return False, None
+
+    def Put(self, key: Hashable, value: Any) -> None:
+        if self.MaxSize == 0:
+            return
+        self._Items[key] = value
+        self._Items.move_to_end(key)
+        if self.MaxSize is not None and len(self._Items) > self.MaxSize:
+            self._Items.popitem(last=False)
+            self.Evicted = self.Evicted + 1
+
+    def Clear(self) -> None:
+        self._Items.clear()
+
+    def CachedItemCount(self):
+        return len(self._Items)
+
+    def __str__(self) -> str:
+        return str(self.Hit) + " hits, " + str(self.Miss) + " misses, " + str(self.CachedItemCount()) + " items, " + str(self.Evicted) + " evicted"
+
+
+class LRUCacheTest(TestCase):
+
+    def test_Put_EvictsLeastRecentlyUsed(self):
+        target = LRUCache(2)
+        target.Put("a", 1)
+        target.Put("b", None)
+        self.assertEqual((True, 1), target.TryGet("a"))      # b is now the least recently used.
+        target.Put("c", 3)
+        self.assertEqual((False, None), target.TryGet("b"))
+        self.assertEqual((True, 3), target.TryGet("c"))
+        self.assertEqual((2, 1, 1), (target.Hit, target.Miss, target.Evicted))
+        disabled = LRUCache(0)
+        disabled.Put("a", 1)
+        self.assertEqual(0, disabled.CachedItemCount())
+
+
+if __name__ == "__main__":
+    unittest.main()
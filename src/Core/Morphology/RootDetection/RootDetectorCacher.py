@@ -1,3 +1,4 @@
+import unittest
 from abc import ABC, abstractmethod
 from typing import List, Dict
 from unittest import TestCase
@@ -5,6 +6,7 @@ from unittest import TestCase
 
 from src.Core.Morphology.POSTypes import POSTypes
 from src.Core.Morphology.RootDetection.IRootDetector import IRootDetector
+from src.Core.Vocabulary import Vocabulary
 
 class ICacher(ABC):
 
@@ -31,24 +33,62 @@ class MonitorableCacheBase(ICacher):
 class RootDetectorCacher(IRootDetector,MonitorableCacheBase):
     """
     Wraps a RootDetector and caches the results. Provides cache statistics and operations.
+    The cache is keyed on the vocabulary id of the word and the POS, and the roots are interned in the same vocabulary.
     """
-    def __init__(self, rootDetector:IRootDetector) -> None:
+    def __init__(self, rootDetector:IRootDetector, vocabulary:Vocabulary = None) -> None:
+        """
+        :param vocabulary: Default (None): A vocabulary of this cache only.
+        """
         super().__init__()
         self.RootDetector:IRootDetector = rootDetector
-        self._Cache:Dict[str,List[str]] = {}  #expr(w+pos), roots
+        self.Vocabulary:Vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self._Cache:Dict[int,List[str]] = {}  #word id and pos (see RootCacheKey), roots
 
     def DetectRoots(self, surface: str, priorPOS: POSTypes = None) -> List[str]:
-        expr:str = surface+ ("" if priorPOS is None else "-" + str(priorPOS.name))
+        expr:int = RootDetectorCacher.RootCacheKey(self.Vocabulary.Id(surface), priorPOS)
         cached = self._Cache.get(expr)
         self.Attempt = self.Attempt + 1
         if (cached is None):
             self.Miss = self.Miss + 1
             cached = self.RootDetector.DetectRoots(surface,priorPOS)
+            if cached: cached = [self.Vocabulary.Intern(root) for root in cached]
             self._Cache[expr] = cached
         else:
             self.Hit = self.Hit + 1
         return cached
 
+    @staticmethod
+    def RootCacheKey(wordId:int, priorPOS:POSTypes = None)->int:
+        """
+        Int counterpart of the former word+"-"+pos key: the word id with the POS (0 for None) in the low bits.
+        """
+        return (wordId << 3) | (0 if priorPOS is None else priorPOS.value[0] + 1)
+
     def CachedItemCount(self):
         return len(self._Cache)
 
+
+class RootDetectorCacherTest(TestCase):
+
+    class _SuffixRootDetector(IRootDetector):
+        def __init__(self) -> None:
+            self.Calls = 0
+
+        def DetectRoots(self, surface: str, priorPOS: POSTypes = None) -> List[str]:
+            self.Calls += 1
+            return [surface[:-2]] if priorPOS == POSTypes.VERB else [surface]
+
+    def test_DetectRoots_CachedByWordAndPOS(self):
+        detector = RootDetectorCacherTest._SuffixRootDetector()
+        target = RootDetectorCacher(detector, Vocabulary())
+        self.assertEqual(["walked"], target.DetectRoots("walked"))
+        self.assertEqual(["walk"], target.DetectRoots("walked", POSTypes.VERB))
+        self.assertEqual(["walk"], target.DetectRoots("walked", POSTypes.VERB))
+        self.assertEqual(2, detector.Calls)
+        self.assertEqual(2, target.CachedItemCount())
+        self.assertEqual(1, target.Hit)
+        self.assertIn("walk", target.Vocabulary)
+
+
+if __name__ == "__main__":
+    unittest.main()
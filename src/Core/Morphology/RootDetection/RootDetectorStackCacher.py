@@ -1,7 +1,8 @@
 from typing import List, Dict, Tuple, Set
 from src.Core.Morphology.POSTypes import POSTypes
 from src.Core.Morphology.RootDetection.IRootDetectorStack import IRootDetectorStack
-from src.Core.Morphology.RootDetection.RootDetectorCacher import MonitorableCacheBase
+from src.Core.Morphology.RootDetection.RootDetectorCacher import MonitorableCacheBase, RootDetectorCacher
+from src.Core.Vocabulary import Vocabulary
 
 
 class RootDetectorStackCacher(IRootDetectorStack,MonitorableCacheBase):
@@ -9,13 +10,17 @@ class RootDetectorStackCacher(IRootDetectorStack,MonitorableCacheBase):
     Wraps a RootDetectorStack and caches the results. Provides cache statistics and operations. Refer to behavior tests for more information.
 
     """
-    def __init__(self, rootDetectorStack:IRootDetectorStack) -> None:
+    def __init__(self, rootDetectorStack:IRootDetectorStack, vocabulary:Vocabulary = None) -> None:
+        """
+        :param vocabulary: Where the words get the ids the cache is keyed on. Default (None): A vocabulary of this cache only.
+        """
         super().__init__()
         self.RootDetectorStack:IRootDetectorStack = rootDetectorStack
-        self._Cache:Dict[str,List[str]] = {}  #expr(w+pos), roots
+        self.Vocabulary:Vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self._Cache:Dict[int,List[str]] = {}  #word id and pos (see RootDetectorCacher.RootCacheKey), roots
 
     def DetectRootsInStack(self, surface:str, priorPOS:POSTypes = None)->Tuple[Set[str],str,Set[str]]:
-        expr:str = surface+ ("" if priorPOS is None else "-" + str(priorPOS.name))
+        expr:int = RootDetectorCacher.RootCacheKey(self.Vocabulary.Id(surface), priorPOS)
         cached = self._Cache.get(expr)
         self.Attempt = self.Attempt + 1
         if (cached is None):
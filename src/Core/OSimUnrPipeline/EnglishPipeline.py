@@ -17,6 +17,7 @@ from src.Core.WordNet.Classifiers.ConceptWiseWordNetRelatednessFilterer import C
 from src.Core.WordNet.Classifiers.DefinitionBasedRelatednessClassifier import DefinitionBasedRelatednessClassifier
 from src.Core.WordNet.Classifiers.WordNetDerivationallyRelatedBinaryClassifier import \
     WordNetDerivationallyRelatedBinaryClassifier
+from src.Core.WordNet.CompiledNLTKWordNetWrapper import CompiledNLTKWordNetWrapper
 from src.Core.WordNet.IWordNet import IWordNet, WordNetSimilarityAlgorithms, Lemma2SynsetMatching
 from src.Core.WordNet.NLTKWordNetWrapper import NLTKWordNetWrapper
 from src.Core.WordNet.WordPairDefinitionSourceFilter import WordPairDefinitionSourceFilter
@@ -27,8 +28,17 @@ from src.Tools.Logger import logp
 
 class EnglishPipeline(PipelineProviderBase):
 
-    def __init__(self, ctx: LinguisticContext, osimAlgorithm:IWordSimilarity):
+    def __init__(self, ctx: LinguisticContext, osimAlgorithm:IWordSimilarity, compiledTaxonomy: bool = False, pruneSenses: bool = False,
+                 closedLCHScale: bool = False):
+        """
+        :param compiledTaxonomy: If True, WordNet PATH/LCH/WUP similarities are scored on a compiled taxonomy (same values as NLTK, see CompiledNLTKWordNetWrapper).
+        :param pruneSenses: If True, the max over the sense pairs of WordNet similarities skips the pairs whose upper bound cannot beat it (same values, see NLTKWordNetWrapper).
+        :param closedLCHScale: If True, LCH is scaled on its analytic max (from the max depth of the taxonomy) in a single pass, instead of min-max normalized over each Stage 3 dataset.
+        """
         super().__init__(ctx, osimAlgorithm)
+        self.CompiledTaxonomy: bool = compiledTaxonomy
+        self.PruneSenses: bool = pruneSenses
+        self.ClosedLCHScale: bool = closedLCHScale
 
     def CreateWordNet(self):
         return NLTKWordNetWrapper()     #TODO: pass lang.
@@ -42,14 +52,14 @@ class EnglishPipeline(PipelineProviderBase):
         from src.Core.Morphology.RootDetection.EnglishRootDetectionStack import EnglishRootDetectionStack
         stack: IRootDetectorStack = EnglishRootDetectionStack(inflectional, morpholex, lexiconPosFilter=None,
                                                               yieldOutOfLexiconRoots=True)  # We do not limit lexicon POS because it may have been derived from different POS.
-        return RootDetectorStackCacher(stack)  # Note: StackCacher is not the same as Cacher! Stacks must be cached inside StackCacher.
+        return RootDetectorStackCacher(stack, self.Vocabulary)  # Note: StackCacher is not the same as Cacher! Stacks must be cached inside StackCacher.
         # return RootDetectorCacher(stack)
         # return stack  # No cache usage
 
     def CreateFastRootDetector(self):
         # stack: EnglishRootDetectionStack = CreateRootDetector()  # This is slow, but the cached root detector is used by multiple tasks: SharingRootDetector, DefinitionBased, etc.
         morpholex: MorphoLexSegmentedDataset = self._CreateMorphoLex()
-        return RootDetectorCacher(morpholex)
+        return RootDetectorCacher(morpholex, self.Vocabulary)
 
     def _CreateMorphoLex(self) -> MorphoLexSegmentedDataset:
         txtpath: str = Resources.GetOthersPath("MorphoLEX2.txt")
@@ -57,7 +67,7 @@ class EnglishPipeline(PipelineProviderBase):
         return morpholex
 
     def CreateTokenizer(self)->ITokenizer:
-        tokenizer: ITokenizer = TokenizerCacher(NLTKWhitespaceTokenizer())
+        tokenizer: ITokenizer = TokenizerCacher(NLTKWhitespaceTokenizer(), self.Vocabulary)
         return tokenizer
 
     def CreateWordSimilarityAlgorithm(self):
@@ -68,7 +78,9 @@ class EnglishPipeline(PipelineProviderBase):
     def CreateWordNetForSimilarity(self,wnSimAlg: WordNetSimilarityAlgorithms,
                                    l2s: Lemma2SynsetMatching = Lemma2SynsetMatching.HighestScoreOfCombinations,
                                    wordSimPOSFilters: List[POSTypes] = None):
-        return NLTKWordNetWrapper(algorithm=wnSimAlg, l2s=l2s, wordSimPOSFilters=wordSimPOSFilters)  # For now, we are producing a separate instance due to ctor params. It can be connected to WORDNET_EN.
+        if self.CompiledTaxonomy:
+            return CompiledNLTKWordNetWrapper(algorithm=wnSimAlg, l2s=l2s, wordSimPOSFilters=wordSimPOSFilters, pruneSenses=self.PruneSenses, closedLCHScale=self.ClosedLCHScale)
+        return NLTKWordNetWrapper(algorithm=wnSimAlg, l2s=l2s, wordSimPOSFilters=wordSimPOSFilters, pruneSenses=self.PruneSenses, closedLCHScale=self.ClosedLCHScale)  # For now, we are producing a separate instance due to ctor params. It can be connected to WORDNET_EN.
 
     def CreateWordNetSimAlgorithm(self) -> WordNetSimilarityAlgorithms:
         sim = WordNetSimilarityAlgorithms.LCH
@@ -195,7 +207,7 @@ class EnglishPipeline(PipelineProviderBase):
     def CreateDefinitionBasedRelatednessClassifier(self, posFilter, rootDetector, fastRootDetector):
         minRootlength: int = 4  # OSimUnr study uses 4. It is a good value for English.
         typeDepthRatio = 0.4    # OSimUnr study uses 0.4. It is a good value for English.
-        tokenizer: ITokenizer = TokenizerCacher(NLTKWhitespaceTokenizer())
+        tokenizer: ITokenizer = TokenizerCacher(NLTKWhitespaceTokenizer(), self.Vocabulary)
 
         wn: IWordNet = self.CreateWordNet()
         definitionClassifier = DefinitionBasedRelatednessClassifier(
@@ -7,6 +7,7 @@ from src.Core.Morphology.POSTypes import POSTypes
 from src.Core.Morphology.RootDetection.IRootDetector import IRootDetector
 from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
 from src.Core.Segmentation.Tokenizers.ITokenizer import ITokenizer
+from src.Core.Vocabulary import Vocabulary
 from src.Core.Task.IWordRelatednessBinaryClassifier import IWordRelatednessBinaryClassifier
 from src.Core.WordNet.Classifiers.BlacklistedConceptsWordNetRelatednessFilterer import \
     BlacklistedConceptsWordNetRelatednessFilterer
@@ -17,8 +18,12 @@ from src.Core.WordSim.IWordSimilarity import IWordSimilarity
 
 
 class PipelineProviderBase(ABC):
-    def __init__(self, ctx:LinguisticContext, osimAlgorithm:IWordSimilarity):
+    def __init__(self, ctx:LinguisticContext, osimAlgorithm:IWordSimilarity, vocabulary:Vocabulary = None):
+        """
+        :param vocabulary: Where the caches of the pipeline intern the words, so they share the ids of the study's tables. Default (None): A new vocabulary.
+        """
         self.Context:LinguisticContext = ctx
+        self.Vocabulary:Vocabulary = vocabulary if vocabulary is not None else Vocabulary()
         self.OSimAlgorithm:IWordSimilarity = osimAlgorithm
         self._WordNet:IWordNet = None
         self._WordSource: IWordSource = None
@@ -33,7 +33,7 @@ class TurkishPipeline(PipelineProviderBase):
         raise NotImplementedError("Turkish WordNet is not included sur to deployment complexity.")
 
     def CreateTokenizer(self):
-        return TokenizerCacher(NLTKWhitespaceTokenizer())
+        return TokenizerCacher(NLTKWhitespaceTokenizer(), self.Vocabulary)
 
     def CreateWordSimilarityAlgorithm(self):
         sim = WordNetSimilarityAlgorithms.WUP
@@ -134,7 +134,7 @@ class TurkishPipeline(PipelineProviderBase):
     def CreateDefinitionBasedRelatednessClassifier(self, posFilter, rootDetector, fastRootDetector):
         minRootlength: int = 4  # OSimUnr study uses 4. It is a good value for English.
         typeDepthRatio = 0.4  # OSimUnr study uses 0.4. It is a good value for English.
-        tokenizer: ITokenizer = TokenizerCacher(NLTKWhitespaceTokenizer())
+        tokenizer: ITokenizer = TokenizerCacher(NLTKWhitespaceTokenizer(), self.Vocabulary)
 
         wn: IWordNet = self.CreateWordNet()
         definitionClassifier = DefinitionBasedRelatednessClassifier(
@@ -0,0 +1,69 @@
+# coding=utf-8
+import unittest
+from typing import List, Dict, Iterator, Tuple
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.CandidateColumnsGeneratorBase import CandidateColumnsGeneratorBase
+from src.Core.Orthographic.MetricIndex.BKTree import BKTree
+from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+
+
+class BKTreeCandidateGenerator(CandidateColumnsGeneratorBase):
+    """
+    Runs BK-tree radius queries per wordpool word instead of pairing it with every other word.
+    The pool is indexed in one BK-tree per word length, and a word queries the tree of every length it can reach with the exact radius of that length combination,
+    so the hits are only the pairs above the minimum similarity.
+    The queries cost a Python distance call per visited node, and a tree visits most of its nodes once the radius reaches 3 on 6-12 letter words:
+    it only beats scoring the rows (Exhaustive) at high thresholds, e.g. 0.9 on a pool of English words, which allow 1-2 edits. Use QGramIndex (or Auto) below that.
+    The trees are built once per pool, and CountCandidatePairs keeps the hits for GenerateCandidatePairs (see CandidateColumnsGeneratorBase).
+    """
+
+    def __init__(self, editDistance: EditDistance, minSimilarity: float) -> None:
+        super().__init__()
+        self.EditDistance: EditDistance = editDistance
+        self.MinSimilarity: float = minSimilarity
+
+    def _MaxDistances(self, lengths: List[int]) -> Dict[Tuple[int, int], int]:
+        maxDistances: Dict[Tuple[int, int], int] = {}  # (len1, len2), allowed distance. Missing if the lengths cannot reach the minimum similarity.
+        for len1 in lengths:
+            for len2 in lengths:
+                k: int = EditDistance.MaxDistance(max(len1, len2), self.MinSimilarity)
+                if k >= abs(len1 - len2):
+                    maxDistances[(len1, len2)] = k
+        return maxDistances
+
+    def _BuildIndex(self, sortedWords: List[str]) -> Tuple[Dict[int, Tuple[BKTree, List[int]]], Dict[int, List[Tuple[int, int]]]]:
+        trees: Dict[int, Tuple[BKTree, List[int]]] = {}    # length, (tree, word id of each tree id)
+        for wordId, word in enumerate(sortedWords):
+            tree, wordIds = trees.setdefault(len(word), (BKTree(self.EditDistance), []))
+            tree.Add(word)
+            wordIds.append(wordId)
+        radiuses: Dict[int, List[Tuple[int, int]]] = {length: [] for length in trees}     # length, [(compatible length, radius)]
+        for (len1, len2), k in self._MaxDistances(sorted(trees)).items():
+            radiuses[len1].append((len2, k))
+        return trees, radiuses
+
+    def _CandidateColumns(self, sortedWords: List[str], bkIndex, startRow: int, endRow: int) -> Iterator[Tuple[int, List[int]]]:
+        trees, radiuses = bkIndex
+        for i in range(startRow, endRow):
+            w1: str = sortedWords[i]
+            columns: List[int] = []
+            for len2, radius in radiuses[len(w1)]:
+                tree, wordIds = trees[len2]
+                columns.extend(j for j in (wordIds[treeId] for treeId, _ in tree.Query(w1, radius)) if j > i)   # Only the upper triangle.
+            columns.sort()  # Keeps the exhaustive order.
+            yield i, columns
+
+
+class BKTreeCandidateGeneratorTest(TestCase):
+
+    def test_GenerateCandidatePairs_OnlyDetections(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        edit = EditDistance()
+        for minSim in [0.5, 0.75, 0.8]:
+            candidates = CandidatePairTestPool.AssertSameAsExhaustive(self, BKTreeCandidateGenerator(edit, minSim), edit, minSim)
+            self.assertEqual(len(CandidatePairTestPool.ExhaustiveDetections(edit, minSim)), len(candidates))  # Nothing else.
+
+
+if __name__ == '__main__':
+    unittest.main()
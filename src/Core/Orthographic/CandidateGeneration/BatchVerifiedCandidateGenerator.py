@@ -0,0 +1,70 @@
+# coding=utf-8
+import unittest
+from typing import List, Iterator, Tuple
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.CandidateColumnsGeneratorBase import CandidateColumnsGeneratorBase
+from src.Core.Orthographic.CandidateGeneration.ScoredRowsGeneratorBase import ScoredRowsGeneratorBase
+from src.Core.WordSim.IThresholdedWordSimilarity import IThresholdedWordSimilarity
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+
+
+class BatchVerifiedCandidateGenerator(ScoredRowsGeneratorBase):
+    """
+    Filters each row with a candidate columns generator (length buckets, q-gram counts) and scores only the surviving columns with one WordSimilarityBatch call per row.
+    For the batch-vectorized similarities, so that the filter and the vectorized scoring add up instead of excluding each other.
+    An IThresholdedWordSimilarity scores with WordSimilarityBatchAtLeast, as in WordPairSynthesizer.GenerateScoredPairsByRows.
+    Rows with only a few surviving columns are scored pair by pair, where the setup of a batch costs more than the pairs themselves.
+    Yields only the pairs above the minimum similarity, with their similarity already set (see ScoresPairs).
+    """
+
+    def __init__(self, candidateFilter: CandidateColumnsGeneratorBase, orthographicSim: IWordSimilarity, minSimilarity: float, minBatchSize: int = 64) -> None:
+        """
+        :param minBatchSize: Rows with fewer surviving columns are scored pair by pair.
+        """
+        super().__init__(str(orthographicSim))
+        self.CandidateFilter: CandidateColumnsGeneratorBase = candidateFilter
+        self.OrthographicSim: IWordSimilarity = orthographicSim
+        self.MinSimilarity: float = minSimilarity
+        self.MinBatchSize: int = minBatchSize
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        self.CandidateFilter.Prepare(sortedWords)
+
+    def _RowDetections(self, sortedWords: List[str], startRow: int, endRow: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        thresholdedSim: IThresholdedWordSimilarity = self.OrthographicSim if isinstance(self.OrthographicSim, IThresholdedWordSimilarity) else None
+        for i, columns in self.CandidateFilter.CandidateColumns(sortedWords, startRow, endRow):
+            w1: str = sortedWords[i]
+            self.ScoredPairs += len(columns)
+            if len(columns) < self.MinBatchSize:
+                hits: List[Tuple[int, float]] = []
+                for j in columns:
+                    sim = thresholdedSim.WordSimilarityAtLeast(w1, sortedWords[j], self.MinSimilarity) if thresholdedSim is not None else self.OrthographicSim.WordSimilarity(w1, sortedWords[j])
+                    if sim is not None and sim >= self.MinSimilarity:
+                        hits.append((j, sim))
+                yield i, hits
+                continue
+            candidates: List[str] = [sortedWords[j] for j in columns]
+            if thresholdedSim is not None:
+                sims = thresholdedSim.WordSimilarityBatchAtLeast(w1, candidates, self.MinSimilarity)
+            else:
+                sims = self.OrthographicSim.WordSimilarityBatch(w1, candidates)
+            yield i, [(columns[k], float(sims[k])) for k in (sims >= self.MinSimilarity).nonzero()[0]]    # NaN is never selected.
+
+
+class BatchVerifiedCandidateGeneratorTest(TestCase):
+
+    def test_GenerateCandidatePairs_SameDetectionsAndScoresAsExhaustive(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        from src.Core.Orthographic.CandidateGeneration.LengthBucketCandidateGenerator import LengthBucketCandidateGenerator
+        from src.Core.Orthographic.CandidateGeneration.QGramIndexCandidateGenerator import QGramIndexCandidateGenerator
+        from src.Core.Orthographic.NormalizedStringSimilarity.BitParallelEditDistance import BitParallelEditDistance
+        edit = BitParallelEditDistance()
+        for minSim in [0.5, 0.75]:
+            for candidateFilter, minBatchSize in [(LengthBucketCandidateGenerator(edit, minSim), 1), (QGramIndexCandidateGenerator(minSim, 1), 1), (QGramIndexCandidateGenerator(minSim, 1), 5)]:
+                target = BatchVerifiedCandidateGenerator(candidateFilter, edit, minSim, minBatchSize)   # Batches only, and pair by pair for the short rows.
+                CandidatePairTestPool.AssertSameAsExhaustive(self, target, edit, minSim)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# coding=utf-8
+from abc import abstractmethod
+from array import array
+from typing import List, Iterator, Tuple, Any
+
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import ICandidatePairGenerator
+from src.Core.WordPair import WordPair
+
+
+class CandidateColumnsGeneratorBase(ICandidatePairGenerator):
+    """
+    Base of the filters that find the candidate columns of each row (the words j > i worth scoring) over an index of the pool, and leave the scoring to Stage 2.
+    The index is built once per sorted list, so the row ranges of a shuffled or sharded Stage 2 reuse it.
+    The columns found by CountCandidatePairs are kept (as int32 arrays) for the following GenerateCandidatePairs call on the same list, so the filtering runs once.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._Index: Tuple[List[str], Any] = None
+        self._CachedColumns: Tuple[List[str], List[Tuple[int, array]]] = None
+
+    @abstractmethod
+    def _BuildIndex(self, sortedWords: List[str]) -> Any:
+        pass
+
+    @abstractmethod
+    def _CandidateColumns(self, sortedWords: List[str], index: Any, startRow: int, endRow: int) -> Iterator[Tuple[int, List[int]]]:
+        """
+        :return: For every row i in [startRow, endRow): (i, [j]) with j > i in ascending order.
+        """
+        pass
+
+    def _GetIndex(self, sortedWords: List[str]) -> Any:
+        if self._Index is None or self._Index[0] is not sortedWords:
+            self._Index = (sortedWords, self._BuildIndex(sortedWords))
+        return self._Index[1]
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        self._GetIndex(sortedWords)
+
+    def CandidateColumns(self, sortedWords: List[str], startRow: int = 0, endRow: int = None) -> Iterator[Tuple[int, List[int]]]:
+        if self._CachedColumns is not None and self._CachedColumns[0] is sortedWords:
+            return iter(self._CachedColumns[1][startRow:endRow])   # One item per row.
+        return self._CandidateColumns(sortedWords, self._GetIndex(sortedWords), startRow, len(sortedWords) if endRow is None else endRow)
+
+    def GenerateCandidatePairs(self, sortedWords: List[str], startRow: int = 0, endRow: int = None) -> Iterator[WordPair]:
+        for i, columns in self.CandidateColumns(sortedWords, startRow, endRow):
+            w1: str = sortedWords[i]
+            for j in columns:
+                w2: str = sortedWords[j]
+                yield WordPair(w1, w2) if w1 < w2 else WordPair(w2, w1)  # The smaller word always comes first.
+
+    def CountCandidatePairs(self, sortedWords: List[str]) -> int:
+        """
+        Finds the columns of all rows and keeps them, so the following GenerateCandidatePairs call on the same list does not filter again.
+        """
+        allColumns = [(i, array("i", columns)) for i, columns in self.CandidateColumns(sortedWords)]
+        self._CachedColumns = (sortedWords, allColumns)
+        return sum(len(columns) for _, columns in allColumns)
@@ -0,0 +1,114 @@
+# coding=utf-8
+import unittest
+from enum import unique, Enum
+from importlib.util import find_spec
+from typing import Optional
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.BatchVerifiedCandidateGenerator import BatchVerifiedCandidateGenerator
+from src.Core.Orthographic.CandidateGeneration.BKTreeCandidateGenerator import BKTreeCandidateGenerator
+from src.Core.Orthographic.CandidateGeneration.DeletionIndexCandidateGenerator import DeletionIndexCandidateGenerator
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import ICandidatePairGenerator
+from src.Core.Orthographic.CandidateGeneration.LengthBucketCandidateGenerator import LengthBucketCandidateGenerator
+from src.Core.Orthographic.CandidateGeneration.MinHashLSHCandidateGenerator import MinHashLSHCandidateGenerator, MinHashLSHSettings
+from src.Core.Orthographic.CandidateGeneration.PrefixFilterCandidateGenerator import PrefixFilterCandidateGenerator
+from src.Core.Orthographic.CandidateGeneration.QGramIndexCandidateGenerator import QGramIndexCandidateGenerator
+from src.Core.Orthographic.CandidateGeneration.TrieCandidateGenerator import TrieCandidateGenerator
+from src.Core.Orthographic.ILengthBoundedSimilarity import ILengthBoundedSimilarity
+from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+from src.Core.Orthographic.OverlappingMeasures import OverlappingMeasureBase
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+
+
+@unique
+class CandidateStrategies(Enum):
+    """
+    How Stage 2 selects the word pairs to score. All strategies but MinHashLSH detect the same pairs; they only differ in how many pairs they skip.
+    """
+    Auto = 0            # SparseMatrix for overlap measures if scipy is installed (PrefixFilter if not). For the edit distance, QGramIndex with the surviving columns of each row scored in one WordSimilarityBatch (see BatchVerifiedCandidateGenerator). Exhaustive rows for the other batch-vectorized similarities, otherwise LengthBuckets if the similarity supports it.
+    Exhaustive = 1      # All n*n/2 pairs.
+    LengthBuckets = 2   # Requires an ILengthBoundedSimilarity.
+    QGramIndex = 3      # Requires an EditDistance (nedit).
+    BKTree = 4          # Requires an EditDistance (nedit). Yields only the detections. Only faster than Exhaustive at high thresholds (about 0.9 and above), see BKTreeCandidateGenerator.
+    Trie = 5            # Requires an EditDistance (nedit). Yields only the detections, already scored. Slower than Exhaustive, not a performance strategy.
+    SparseMatrix = 6    # Requires an OverlappingMeasureBase (jacc, dice, over) and scipy. Yields only the detections, already scored.
+    PrefixFilter = 7    # Requires an OverlappingMeasureBase (jacc, dice, over). Set-similarity join, no scipy needed. Yields only the detections, already scored.
+    MinHashLSH = 8      # Any similarity. Approximate: may miss detections (see MinHashLSHSettings for the recall). Never chosen by Auto. Yields only the detections, already scored.
+    DeletionIndex = 9   # Requires an EditDistance (nedit). Indexes the length combinations that allow at most 3 edits (e.g. 0.75 on words up to 15 letters), the others fall back to length buckets. Yields only the detections, already scored.
+
+
+class CandidateGeneratorFactory:
+
+    def __init__(self, orthographicSim: IWordSimilarity, minSimilarity: float, lshSettings: MinHashLSHSettings = None) -> None:
+        """
+        :param lshSettings: Only for MinHashLSH. Default (None): Banding calibrated for 0.95 recall on a sample of the pool.
+        """
+        super().__init__()
+        self.OrthographicSim: IWordSimilarity = orthographicSim
+        self.MinSimilarity: float = minSimilarity
+        self.LSHSettings: MinHashLSHSettings = lshSettings
+
+    def CreateCandidateGenerator(self, strategy: CandidateStrategies = None, qgramSize: int = None) -> Optional[ICandidatePairGenerator]:
+        """
+        :param strategy: None means Auto.
+        :param qgramSize: Only for QGramIndex. By default, 1 for thresholds up to 0.5 (where longer grams cannot prune anything) and 2 otherwise.
+        :return: None for the exhaustive pairing.
+        """
+        if (strategy is None or strategy == CandidateStrategies.Auto):
+            if (isinstance(self.OrthographicSim, OverlappingMeasureBase)):
+                strategy = CandidateStrategies.SparseMatrix if find_spec("scipy") is not None else CandidateStrategies.PrefixFilter
+            elif (isinstance(self.OrthographicSim, EditDistance)):  # Filters first, then scores the survivors of a row in one batch.
+                return BatchVerifiedCandidateGenerator(self.CreateCandidateGenerator(CandidateStrategies.QGramIndex, qgramSize), self.OrthographicSim, self.MinSimilarity)
+            elif (self.OrthographicSim.IsBatchVectorized()):  # Length buckets would not prune enough to beat a vectorized row.
+                strategy = CandidateStrategies.Exhaustive
+            else:
+                strategy = CandidateStrategies.LengthBuckets if isinstance(self.OrthographicSim, ILengthBoundedSimilarity) else CandidateStrategies.Exhaustive
+
+        if (strategy == CandidateStrategies.Exhaustive):
+            return None
+        elif (strategy == CandidateStrategies.LengthBuckets):
+            if (not isinstance(self.OrthographicSim, ILengthBoundedSimilarity)): raise Exception(str(self.OrthographicSim) + " does not support the LengthBuckets candidate strategy.")
+            return LengthBucketCandidateGenerator(self.OrthographicSim, self.MinSimilarity)
+        elif (strategy == CandidateStrategies.QGramIndex):
+            if (not isinstance(self.OrthographicSim, EditDistance)): raise Exception("QGramIndex candidate strategy only works with the edit distance (nedit). Given: " + str(self.OrthographicSim))
+            if (qgramSize is None): qgramSize = 1 if self.MinSimilarity <= 0.5 else 2
+            return QGramIndexCandidateGenerator(self.MinSimilarity, qgramSize)
+        elif (strategy == CandidateStrategies.BKTree):
+            if (not isinstance(self.OrthographicSim, EditDistance)): raise Exception("BKTree candidate strategy only works with the edit distance (nedit). Given: " + str(self.OrthographicSim))
+            return BKTreeCandidateGenerator(self.OrthographicSim, self.MinSimilarity)
+        elif (strategy == CandidateStrategies.Trie):
+            if (not isinstance(self.OrthographicSim, EditDistance)): raise Exception("Trie candidate strategy only works with the edit distance (nedit). Given: " + str(self.OrthographicSim))
+            return TrieCandidateGenerator(self.OrthographicSim, self.MinSimilarity)
+        elif (strategy == CandidateStrategies.SparseMatrix):
+            if (not isinstance(self.OrthographicSim, OverlappingMeasureBase)): raise Exception("SparseMatrix candidate strategy only works with the overlap measures (jacc, dice, over). Given: " + str(self.OrthographicSim))
+            from src.Core.Orthographic.CandidateGeneration.SparseOverlapCandidateGenerator import SparseOverlapCandidateGenerator  # scipy is only needed here.
+            return SparseOverlapCandidateGenerator(self.OrthographicSim, self.MinSimilarity)
+        elif (strategy == CandidateStrategies.PrefixFilter):
+            if (not isinstance(self.OrthographicSim, OverlappingMeasureBase)): raise Exception("PrefixFilter candidate strategy only works with the overlap measures (jacc, dice, over). Given: " + str(self.OrthographicSim))
+            return PrefixFilterCandidateGenerator(self.OrthographicSim, self.MinSimilarity)
+        elif (strategy == CandidateStrategies.DeletionIndex):
+            if (not isinstance(self.OrthographicSim, EditDistance)): raise Exception("DeletionIndex candidate strategy only works with the edit distance (nedit). Given: " + str(self.OrthographicSim))
+            return DeletionIndexCandidateGenerator(self.OrthographicSim, self.MinSimilarity)
+        elif (strategy == CandidateStrategies.MinHashLSH):
+            return MinHashLSHCandidateGenerator(self.OrthographicSim, self.MinSimilarity, self.LSHSettings)
+        else:
+            raise Exception("Unknown candidate strategy: " + str(strategy))
+
+
+class CandidateGeneratorFactoryTest(TestCase):
+
+    def test_CreateCandidateGenerator_Auto(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.BitParallelEditDistance import BitParallelEditDistance
+        from src.Core.Orthographic.OverlappingMeasures import Dice
+        from src.Core.Segmentation.Ngram import Ngram
+        for minSim, q in [(0.5, 1), (0.75, 2)]:
+            target = CandidateGeneratorFactory(BitParallelEditDistance(), minSim).CreateCandidateGenerator(CandidateStrategies.Auto)
+            self.assertIsInstance(target, BatchVerifiedCandidateGenerator)
+            self.assertIsInstance(target.CandidateFilter, QGramIndexCandidateGenerator)
+            self.assertEqual(q, target.CandidateFilter.Q)
+        expected = "SparseOverlapCandidateGenerator" if find_spec("scipy") is not None else "PrefixFilterCandidateGenerator"
+        self.assertEqual(expected, type(CandidateGeneratorFactory(Dice(Ngram(2)), 0.5).CreateCandidateGenerator()).__name__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# coding=utf-8
+import sys
+import unittest
+from bisect import bisect_right
+from typing import List, Iterator, Tuple, Dict, Set
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.ScoredRowsGeneratorBase import ScoredRowsGeneratorBase
+from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+from src.Tools.Logger import logp
+
+
+class DeletionIndexCandidateGenerator(ScoredRowsGeneratorBase):
+    """
+    Symmetric deletion index (as in SymSpell) for small edit distances. If two words are within edit distance k,
+    deleting at most k characters from each gives a common string, so every word is indexed under all its deletion variants up to its allowed distance
+    and the candidates of a word are the words sharing one of its variants. Candidates are verified with the edit distance.
+    The allowed distance comes from the minimum similarity for every length combination, so it suits the Q4 band (1-3 edits on 6-12 letter words) and Q3 only while it stays small.
+    The number of variants grows as C(length, k), which is why maxDistance guards it and the index size is logged.
+    Length combinations that allow more than maxDistance edits (long words, low thresholds) are not indexed: their pairs are listed from length buckets,
+    as in LengthBucketCandidateGenerator, and verified in the same batch.
+    Yields only the detections, already scored.
+    """
+
+    def __init__(self, editDistance: EditDistance, minSimilarity: float, maxDistance: int = 3) -> None:
+        """
+        :param maxDistance: Largest number of deletions indexed. Length combinations that allow more edits fall back to length buckets.
+        """
+        super().__init__(str(editDistance))
+        self.EditDistance: EditDistance = editDistance
+        self.MinSimilarity: float = minSimilarity
+        self.MaxDistance: int = maxDistance
+        self.IndexKeys: int = 0         # Distinct deletion variants of the last built index.
+        self.IndexPostings: int = 0     # (variant, word) entries of the last built index.
+        self.IndexBytes: int = 0        # Approximate memory of the last built index.
+        self.FallbackPairs: int = 0     # Pairs of the last built index listed from length buckets.
+        self._Index: Tuple[List[str], Dict[str, List[int]], Dict[int, int], Dict[Tuple[int, int], int], Dict[int, List[int]], Dict[int, List[int]]] = None  # Workers reuse the index for their other chunks.
+
+    @staticmethod
+    def DeletionVariants(word: str, k: int) -> Set[str]:
+        """
+        :return: The word itself and all the distinct strings obtained by deleting up to k of its characters.
+        """
+        variants: Set[str] = {word}
+        frontier: Set[str] = {word}
+        for _ in range(k):
+            frontier = {v[:p] + v[p + 1:] for v in frontier for p in range(len(v))}
+            variants.update(frontier)
+        return variants
+
+    def _BuildIndex(self, sortedWords: List[str]) -> Tuple[Dict[str, List[int]], Dict[int, int], Dict[Tuple[int, int], int], Dict[int, List[int]], Dict[int, List[int]]]:
+        lengths = sorted(set(len(w) for w in sortedWords))
+        maxDistances: Dict[Tuple[int, int], int] = {}  # (len1, len2), allowed distance. Missing if the lengths cannot reach the minimum similarity.
+        for len1 in lengths:
+            for len2 in lengths:
+                k: int = EditDistance.MaxDistance(max(len1, len2), self.MinSimilarity)
+                if k >= abs(len1 - len2):
+                    maxDistances[(len1, len2)] = k
+        radii: Dict[int, int] = {}  # length, deletions needed to meet any indexed partner.
+        fallbacks: Dict[int, List[int]] = {}  # length, partner lengths that allow more than maxDistance edits.
+        for (len1, len2), k in maxDistances.items():
+            if k <= self.MaxDistance:
+                radii[len1] = max(radii.get(len1, -1), k)
+            else:
+                fallbacks.setdefault(len1, []).append(len2)
+        buckets: Dict[int, List[int]] = {}  # length, ascending word ids. Only the lengths of the fallback partners.
+        fallbackLengths: Set[int] = set(len2 for lens2 in fallbacks.values() for len2 in lens2)
+        for wordId, word in enumerate(sortedWords):
+            if len(word) in fallbackLengths:
+                buckets.setdefault(len(word), []).append(wordId)
+        self.FallbackPairs = sum(len(buckets[len1]) * len(buckets[len2]) for len1, lens2 in fallbacks.items() for len2 in lens2 if len1 < len2) \
+                             + sum(len(buckets[len1]) * (len(buckets[len1]) - 1) // 2 for len1, lens2 in fallbacks.items() if len1 in lens2)
+        if fallbacks:
+            logp("DeletionIndex: " + str(self.FallbackPairs) + " pairs need more than maxDistance=" + str(self.MaxDistance) + " edits for the minimum similarity "
+                 + str(self.MinSimilarity) + " and are listed from length buckets.", anyMode=True)
+
+        index: Dict[str, List[int]] = {}
+        for wordId, word in enumerate(sortedWords):
+            if len(word) in radii:
+                for variant in DeletionIndexCandidateGenerator.DeletionVariants(word, radii[len(word)]):
+                    index.setdefault(variant, []).append(wordId)  # Ascending word ids.
+        self.IndexKeys = len(index)
+        self.IndexPostings = sum(len(ids) for ids in index.values())
+        self.IndexBytes = sys.getsizeof(index) + sum(sys.getsizeof(v) + sys.getsizeof(ids) for v, ids in index.items()) + 28 * self.IndexPostings  # Small ints are shared, 28 bytes is the upper bound.
+        logp("DeletionIndex: " + str(self.IndexKeys) + " variants, " + str(self.IndexPostings) + " postings, ~" + str(round(self.IndexBytes / (1 << 20), 1)) + " MB.", anyMode=True)
+        return index, radii, maxDistances, fallbacks, buckets
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        if self._Index is None or self._Index[0] is not sortedWords:
+            self._Index = (sortedWords,) + self._BuildIndex(sortedWords)
+
+    def _RowDetections(self, sortedWords: List[str], startRow: int, endRow: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        self.Prepare(sortedWords)
+        _, index, radii, maxDistances, fallbacks, buckets = self._Index
+        for i in range(startRow, endRow):
+            w1: str = sortedWords[i]
+            len1: int = len(w1)
+            columns: Set[int] = set()
+            if len1 in radii:
+                for variant in DeletionIndexCandidateGenerator.DeletionVariants(w1, radii[len1]):
+                    for j in reversed(index[variant]):  # Only the upper triangle, from the end of the ascending ids.
+                        if j <= i:
+                            break
+                        k = maxDistances.get((len1, len(sortedWords[j])))
+                        if k is not None and k <= self.MaxDistance:   # The other lengths come from the buckets below.
+                            columns.add(j)
+            for len2 in fallbacks.get(len1, ()):
+                bucket = buckets[len2]
+                columns.update(bucket[bisect_right(bucket, i):])
+            hits: List[Tuple[int, float]] = []
+            self.ScoredPairs += len(columns)
+            if columns:
+                ordered: List[int] = sorted(columns)  # Keeps the exhaustive order.
+                sims = self.EditDistance.WordSimilarityBatchAtLeast(w1, [sortedWords[j] for j in ordered], self.MinSimilarity)
+                hits = [(j, float(sim)) for j, sim in zip(ordered, sims) if sim >= self.MinSimilarity]   # NaN never passes.
+            yield i, hits
+
+
+class DeletionIndexCandidateGeneratorTest(TestCase):
+
+    def test_GenerateCandidatePairs_SameDetectionsAndScoresAsExhaustive(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        edit = EditDistance()
+        for minSim in [0.6, 0.75, 0.8]:
+            target = DeletionIndexCandidateGenerator(edit, minSim, maxDistance=6)
+            CandidatePairTestPool.AssertSameAsExhaustive(self, target, edit, minSim)
+            self.assertGreater(target.IndexBytes, 0)
+
+    def test_GenerateCandidatePairs_FallsBackBeyondMaxDistance(self):
+        target = DeletionIndexCandidateGenerator(EditDistance(), 0.5, maxDistance=2)
+        self.assertEqual(["shakespeare-shakespearean"], [wp.ToKey() for wp in target.GenerateCandidatePairs(["shakespeare", "shakespearean"])])
+        self.assertEqual(1, target.FallbackPairs)
+
+    def test_GenerateCandidatePairs_RealPoolSameAsExhaustive(self):
+        import os
+        import random
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        from src.Core.Orthographic.NormalizedStringSimilarity.BitParallelEditDistance import BitParallelEditDistance
+        from src.Tools import Resources
+        with open(os.path.join(Resources.GetResourcesSubFolder("Others"), "MorphoLEX2.txt"), encoding="utf-8") as f:
+            lexicon = sorted(set(w for w in (line.split("\t")[0].strip().lower() for line in f) if w.isalpha()))
+        words = sorted(set(random.Random(1).sample(lexicon, 400)) | {"incomprehensible", "incomprehensibility"})  # 0.75 allows 4 edits from 16 letters on.
+        edit = BitParallelEditDistance()
+        for minSim in [0.5, 0.75]:    # Q3 and Q4 of the default study.
+            target = DeletionIndexCandidateGenerator(edit, minSim)
+            CandidatePairTestPool.AssertSameAsExhaustive(self, target, edit, minSim, words)
+            self.assertGreater(target.FallbackPairs, 0)
+
+    def test_DeletionVariants(self):
+        self.assertEqual({"abc", "bc", "ac", "ab"}, DeletionIndexCandidateGenerator.DeletionVariants("abc", 1))
+        self.assertEqual(8, len(DeletionIndexCandidateGenerator.DeletionVariants("abc", 3)))   # Including the empty string.
+
+
+if __name__ == '__main__':
+    unittest.main()
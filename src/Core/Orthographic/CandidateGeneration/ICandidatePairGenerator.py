@@ -0,0 +1,90 @@
+# coding=utf-8
+from abc import ABC, abstractmethod
+from typing import List, Iterator, Tuple
+from unittest import TestCase
+
+from src.Core.WordPair import WordPair
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+
+
+class ICandidatePairGenerator(ABC):
+    """
+    Produces the word pairs of a sorted wordpool that are worth scoring in Stage 2.
+    Implementations may only drop pairs that provably cannot reach the threshold, so the detected pairs are the same as the exhaustive pairing.
+    Pairs are yielded in the exhaustive order (row by row over the sorted pool), with the smaller word first.
+    """
+
+    @abstractmethod
+    def GenerateCandidatePairs(self, sortedWords: List[str], startRow: int = 0, endRow: int = None) -> Iterator[WordPair]:
+        """
+        :param startRow: Only the rows (first word indices) in [startRow, endRow) are generated. Used to shard Stage 2 over processes.
+        :param endRow: None means until the end of the pool.
+        """
+        pass
+
+    @abstractmethod
+    def CountCandidatePairs(self, sortedWords: List[str]) -> int:
+        """
+        Number of pairs GenerateCandidatePairs will yield. Used for progress estimation.
+        :param sortedWords:
+        :return:
+        """
+        pass
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        """
+        Builds the index of the pool ahead of the first call. A process pool forked afterwards inherits it instead of building it in every worker.
+        Default: Nothing to build.
+        """
+        pass
+
+    def ScoresPairs(self) -> bool:
+        """
+        True if the yielded pairs are only the detections and already carry their similarity (set with WordPair.SetOtherSimilarity under the similarity's name).
+        Stage 2 then reads the similarity instead of recalculating it.
+        """
+        return False
+
+
+class CandidatePairTestPool(object):
+    """
+    The pool the tests of the candidate generators and the Stage 2 scorers share, and the exhaustive detections they are compared to.
+    Near pairs (processor-professor), length gaps (shakespeare-shakespearean, action-actions), words without bigrams (a) and unrelated words.
+    """
+    Words: List[str] = sorted(["processor", "professor", "poison", "prison", "academia", "academic", "article", "particle", "banana", "bandana",
+                               "shakespeare", "shakespearean", "viscount", "discount", "glowing", "slowing", "mindlessness", "windlessness",
+                               "assignment", "reassignment", "improve", "impover", "natural", "contrary", "action", "auction", "actions",
+                               "car", "bar", "a", "ab", "tyrannosaurus"])
+
+    @staticmethod
+    def ExhaustiveDetections(similarity: IWordSimilarity, minSimilarity: float, words: List[str] = None) -> List[Tuple[str, float]]:
+        """
+        :return: Key and similarity of the pairs of GeneratePossibleWordPairs at least minSimilarity, in the exhaustive order.
+        """
+        from src.Core.WordPairSynthesizer import WordPairSynthesizer
+        scored = ((wp.ToKey(), similarity.WordSimilarity(wp.Word1, wp.Word2)) for wp in WordPairSynthesizer().GeneratePossibleWordPairs(words or CandidatePairTestPool.Words))
+        return [(key, sim) for key, sim in scored if sim is not None and sim >= minSimilarity]
+
+    @staticmethod
+    def Detections(pairs: Iterator[WordPair], similarity: IWordSimilarity) -> List[Tuple[str, float]]:
+        """
+        :return: Key and similarity of the pairs, as set on them under the name of the similarity.
+        """
+        return [(wp.ToKey(), wp.GetOtherSimilarity(str(similarity))) for wp in pairs]
+
+    @staticmethod
+    def AssertSameAsExhaustive(test: TestCase, target: ICandidatePairGenerator, similarity: IWordSimilarity, minSimilarity: float, words: List[str] = None) -> List[WordPair]:
+        """
+        Asserts that the generator detects the exhaustive pairs with the same similarities, and that CountCandidatePairs counts what it yields.
+        The candidates of the generators that do not score pairs are scored here.
+        :return: The yielded pairs.
+        """
+        words = words or CandidatePairTestPool.Words
+        pairs = list(target.GenerateCandidatePairs(words))
+        if target.ScoresPairs():
+            actual = CandidatePairTestPool.Detections(pairs, similarity)
+        else:
+            actual = [(key, sim) for key, sim in ((wp.ToKey(), similarity.WordSimilarity(wp.Word1, wp.Word2)) for wp in pairs) if sim is not None and sim >= minSimilarity]
+        test.assertEqual(CandidatePairTestPool.ExhaustiveDetections(similarity, minSimilarity, words), actual, str(similarity) + " " + str(minSimilarity))
+        test.assertEqual(len(pairs), target.CountCandidatePairs(words))
+        return pairs
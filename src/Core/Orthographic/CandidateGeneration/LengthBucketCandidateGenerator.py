@@ -0,0 +1,82 @@
+# coding=utf-8
+import unittest
+from bisect import bisect_right
+from typing import List, Dict, Iterator, Tuple
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.CandidateColumnsGeneratorBase import CandidateColumnsGeneratorBase
+from src.Core.Orthographic.ILengthBoundedSimilarity import ILengthBoundedSimilarity
+
+
+class LengthBucketCandidateGenerator(CandidateColumnsGeneratorBase):
+    """
+    Groups the wordpool by word length and only pairs words from length buckets that can reach the minimum similarity.
+    Example: With nedit and Q3=0.5, a 6-letter word is never paired with a 13-letter word.
+    """
+
+    def __init__(self, lengthBoundedSim: ILengthBoundedSimilarity, minSimilarity: float) -> None:
+        super().__init__()
+        self.LengthBoundedSim: ILengthBoundedSimilarity = lengthBoundedSim
+        self.MinSimilarity: float = minSimilarity
+
+    def _BuildBuckets(self, sortedWords: List[str]) -> Dict[int, List[int]]:
+        buckets: Dict[int, List[int]] = {}  # length, ascending word indices
+        for index, word in enumerate(sortedWords):
+            buckets.setdefault(len(word), []).append(index)
+        return buckets
+
+    def _CompatibleLengths(self, lengths: List[int]) -> Dict[int, List[int]]:
+        compatibles: Dict[int, List[int]] = {}
+        for len1 in lengths:
+            compatibles[len1] = [len2 for len2 in lengths if self.LengthBoundedSim.MaxSimilarityByLengths(len1, len2) >= self.MinSimilarity]
+        return compatibles
+
+    def _BuildIndex(self, sortedWords: List[str]) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+        buckets = self._BuildBuckets(sortedWords)
+        return buckets, self._CompatibleLengths(sorted(buckets))
+
+    def _CandidateColumns(self, sortedWords: List[str], bucketIndex, startRow: int, endRow: int) -> Iterator[Tuple[int, List[int]]]:
+        buckets, compatibles = bucketIndex
+        for i in range(startRow, endRow):
+            columns: List[int] = []
+            for len2 in compatibles[len(sortedWords[i])]:
+                bucket = buckets[len2]
+                columns.extend(bucket[bisect_right(bucket, i):])  # Only the upper triangle.
+            columns.sort()  # Keeps the exhaustive order so that resume and snapshot files look the same.
+            yield i, columns
+
+    def CountCandidatePairs(self, sortedWords: List[str]) -> int:
+        """
+        Counted from the bucket sizes, without listing the columns.
+        """
+        buckets, compatibles = self._GetIndex(sortedWords)
+        count: int = 0
+        for len1, lens2 in compatibles.items():
+            size1 = len(buckets[len1])
+            for len2 in lens2:
+                if len2 == len1:
+                    count += size1 * (size1 - 1) // 2
+                elif len2 > len1:
+                    count += size1 * len(buckets[len2])
+        return count
+
+
+class LengthBucketCandidateGeneratorTest(TestCase):
+
+    def test_GenerateCandidatePairs_NEdit_SkipImpossibleLengths(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        words = sorted(["action", "auction", "actionable", "ab"])
+        target = LengthBucketCandidateGenerator(EditDistance(), 0.75)
+        actual = [wp.ToKey() for wp in target.GenerateCandidatePairs(words)]
+        self.assertEqual(["action-auction"], actual)
+        self.assertEqual(1, target.CountCandidatePairs(words))
+
+    def test_GenerateCandidatePairs_SameDetectionsAsExhaustive(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        for minSim in [0.5, 0.75]:
+            CandidatePairTestPool.AssertSameAsExhaustive(self, LengthBucketCandidateGenerator(EditDistance(), minSim), EditDistance(), minSim)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+# coding=utf-8
+import random
+import unittest
+from typing import List, Iterator, Tuple, Dict, Set
+from unittest import TestCase
+
+import numpy
+
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+from src.Core.Orthographic.CandidateGeneration.ScoredRowsGeneratorBase import ScoredRowsGeneratorBase
+from src.Core.Orthographic.OverlappingMeasures import Jaccard
+from src.Core.Segmentation.Ngram import Ngram
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+from src.Tools.Logger import logp
+
+
+class MinHashLSHSettings(object):
+    """
+    Settings of the MinHashLSH candidate strategy. Bands and rows are calibrated for targetRecall on a sample of the pool unless both are given.
+    """
+
+    def __init__(self, bands: int = None, rows: int = None, targetRecall: float = 0.95, gramSize: int = 2, recallSampleRows: int = 200, seed: int = 0) -> None:
+        """
+        :param bands: Number of LSH bands. A pair becomes a candidate if all the hashes of at least one band are equal.
+        :param rows: Number of MinHash values per band.
+        :param targetRecall: Share of the exhaustive detections the banding is calibrated to catch (see MinHashLSHCandidateGenerator.CalibrateBanding).
+        :param gramSize: n of the character n-grams the signatures are built on.
+        :param recallSampleRows: Number of random rows scored exhaustively to calibrate the banding, and, with another sample, to measure and log the recall
+        before Stage 2 starts (a warning if it is below targetRecall). 0 turns both off: the banding is then tuned from the threshold alone (see TuningJaccard).
+        """
+        super().__init__()
+        self.Bands: int = bands
+        self.Rows: int = rows
+        self.TargetRecall: float = targetRecall
+        self.GramSize: int = gramSize
+        self.RecallSampleRows: int = recallSampleRows
+        self.Seed: int = seed
+
+
+class MinHashLSHCandidateGenerator(ScoredRowsGeneratorBase):
+    """
+    Approximate candidates for very large pools: MinHash signatures of the character n-gram sets, split into bands (locality-sensitive hashing).
+    Two words become a candidate pair if one of their bands is equal, then the pair is verified with the configured orthographic similarity.
+    Unlike the other strategies it may miss detections. By default the banding is calibrated on the detections of sampled rows and the recall is measured on
+    other sampled rows when the candidates are first found (see MinHashLSHSettings.RecallSampleRows). Yields only the detections, already scored.
+    """
+    _Prime: int = (1 << 31) - 1
+
+    def __init__(self, orthographicSim: IWordSimilarity, minSimilarity: float, settings: MinHashLSHSettings = None) -> None:
+        super().__init__(str(orthographicSim))
+        self.OrthographicSim: IWordSimilarity = orthographicSim
+        self.MinSimilarity: float = minSimilarity
+        self.Settings: MinHashLSHSettings = settings if settings else MinHashLSHSettings()
+        self.GramExtractor: Ngram = Ngram(self.Settings.GramSize)
+        self._Calibrate: bool = not (self.Settings.Bands and self.Settings.Rows) and self.Settings.RecallSampleRows > 0  # Calibrated when the pool is known.
+        if (self.Settings.Bands and self.Settings.Rows):
+            self.Bands, self.Rows = self.Settings.Bands, self.Settings.Rows
+        else:
+            self.Bands, self.Rows = MinHashLSHCandidateGenerator.TuneBanding(self.TuningJaccard(), self.Settings.TargetRecall)
+        self._Candidates: Tuple[List[str], List[List[int]]] = None  # Candidates by row. Workers reuse them for their other chunks.
+
+    def TuningJaccard(self) -> float:
+        """
+        Gram-set Jaccard the banding is tuned for without a calibration sample. It is the threshold itself for Jaccard, where a detection has at least this Jaccard.
+        For the other measures it is the Jaccard equivalent of the threshold as a Dice score, which does not bound the Jaccard of their detections:
+        with nedit, pairs above the threshold often share far fewer grams, so the recall can be well below the target. Use CalibrateBanding for them.
+        """
+        if (isinstance(self.OrthographicSim, Jaccard)):
+            return self.MinSimilarity
+        return self.MinSimilarity / (2 - self.MinSimilarity)
+
+    @staticmethod
+    def CandidateProbability(jaccard: float, bands: int, rows: int) -> float:
+        """
+        :return: Probability that a pair with this gram-set Jaccard shares at least one band.
+        """
+        return 1 - (1 - jaccard ** rows) ** bands
+
+    @staticmethod
+    def TuneBanding(jaccard: float, targetRecall: float, maxHashes: int = 256) -> Tuple[int, int]:
+        """
+        The most selective banding (most rows per band, then fewest bands) that still reaches targetRecall at the given Jaccard.
+        :param maxHashes: Upper limit of bands x rows, which is the signature length.
+        :return: (bands, rows)
+        """
+        for rows in range(maxHashes, 0, -1):
+            for bands in range(1, maxHashes // rows + 1):
+                if (MinHashLSHCandidateGenerator.CandidateProbability(jaccard, bands, rows) >= targetRecall):
+                    return bands, rows
+        return maxHashes, 1
+
+    def _GramJaccard(self, w1: str, w2: str) -> float:
+        grams1, grams2 = set(self.GramExtractor.ExtractGrams(w1)), set(self.GramExtractor.ExtractGrams(w2))
+        union: int = len(grams1 | grams2)
+        return len(grams1 & grams2) / union if union else 0.0
+
+    def _SampleRows(self, sortedWords: List[str], sampleRows: int, seed: int) -> List[int]:
+        return sorted(random.Random(seed).sample(range(len(sortedWords)), min(sampleRows, len(sortedWords))))
+
+    def CalibrateBanding(self, sortedWords: List[str], sampleRows: int, maxHashes: int = 256) -> Tuple[int, int]:
+        """
+        Scores sampled rows exhaustively and picks the most selective banding (as in TuneBanding) whose expected share of their detections is at least the target recall,
+        each detection being a candidate with the probability of its own gram-set Jaccard. Unlike TuningJaccard, this holds for any measure.
+        :return: (bands, rows). TuneBanding of TuningJaccard if the sampled rows have no detections.
+        """
+        jaccards: List[float] = []
+        for i in self._SampleRows(sortedWords, sampleRows, self.Settings.Seed):
+            for j, _ in self._VerifyRow(sortedWords, i, list(range(i + 1, len(sortedWords)))):
+                jaccards.append(self._GramJaccard(sortedWords[i], sortedWords[j]))
+        if not jaccards:
+            return MinHashLSHCandidateGenerator.TuneBanding(self.TuningJaccard(), self.Settings.TargetRecall, maxHashes)
+        sampled = numpy.array(jaccards)
+        for rows in range(maxHashes, 0, -1):
+            for bands in range(1, maxHashes // rows + 1):
+                if (MinHashLSHCandidateGenerator.CandidateProbability(sampled, bands, rows).mean() >= self.Settings.TargetRecall):
+                    return bands, rows
+        return maxHashes, 1     # Detections without a shared gram are never candidates, so the target may be out of reach.
+
+    def _Signatures(self, sortedWords: List[str]) -> numpy.ndarray:
+        rnd = numpy.random.RandomState(self.Settings.Seed)
+        hashCount: int = self.Bands * self.Rows
+        a = rnd.randint(1, MinHashLSHCandidateGenerator._Prime, size=hashCount).astype(numpy.int64)[:, None]
+        b = rnd.randint(0, MinHashLSHCandidateGenerator._Prime, size=hashCount).astype(numpy.int64)[:, None]
+        gramIds: Dict[str, int] = {}
+        signatures = numpy.full((len(sortedWords), hashCount), -1, dtype=numpy.int64)  # -1: no grams, never a candidate.
+        for w, word in enumerate(sortedWords):
+            grams = self.GramExtractor.ExtractGrams(word)
+            if grams:
+                ids = numpy.array([gramIds.setdefault(g, len(gramIds)) for g in sorted(grams)], dtype=numpy.int64)  # Sorted: set order changes with the hash seed of the process.
+                signatures[w] = ((a * ids + b) % MinHashLSHCandidateGenerator._Prime).min(axis=1)
+        return signatures
+
+    def _FindCandidates(self, sortedWords: List[str]) -> List[List[int]]:
+        signatures = self._Signatures(sortedWords)
+        candidates: List[Set[int]] = [set() for _ in sortedWords]
+        for band in range(self.Bands):
+            buckets: Dict[bytes, List[int]] = {}
+            bandSignatures = numpy.ascontiguousarray(signatures[:, band * self.Rows:(band + 1) * self.Rows])
+            for w in range(len(sortedWords)):
+                if (signatures[w, 0] >= 0):
+                    buckets.setdefault(bandSignatures[w].tobytes(), []).append(w)
+            for bucket in buckets.values():
+                for k, i in enumerate(bucket):  # Ascending word ids, so only the later ones are added.
+                    candidates[i].update(bucket[k + 1:])
+        return [sorted(c) for c in candidates]
+
+    def _GetCandidates(self, sortedWords: List[str]) -> List[List[int]]:
+        if self._Candidates is None or self._Candidates[0] is not sortedWords:
+            if (self._Calibrate):
+                self.Bands, self.Rows = self.CalibrateBanding(sortedWords, self.Settings.RecallSampleRows)
+            self._Candidates = (sortedWords, self._FindCandidates(sortedWords))
+            if (self.Settings.RecallSampleRows):  # Approximate: report how much it misses before the long run.
+                self.MeasureRecall(sortedWords, self.Settings.RecallSampleRows)
+        return self._Candidates[1]
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        self._GetCandidates(sortedWords)
+
+    def _VerifyRow(self, sortedWords: List[str], i: int, columns: List[int]) -> List[Tuple[int, float]]:
+        if not columns:
+            return []
+        sims = self.OrthographicSim.WordSimilarityBatch(sortedWords[i], [sortedWords[j] for j in columns])
+        return [(j, float(sim)) for j, sim in zip(columns, sims) if sim >= self.MinSimilarity]  # NaN never passes.
+
+    def _RowDetections(self, sortedWords: List[str], startRow: int, endRow: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        candidates = self._GetCandidates(sortedWords)
+        for i in range(startRow, endRow):
+            self.ScoredPairs += len(candidates[i])
+            yield i, self._VerifyRow(sortedWords, i, candidates[i])
+
+    def MeasureRecall(self, sortedWords: List[str], sampleRows: int = 200) -> Tuple[float, int, int]:
+        """
+        Compares the detections of random rows with the exhaustive ones and logs the result, as a warning if it is below the target recall.
+        The rows are sampled apart from the calibration rows.
+        :return: (recall, detections found, exhaustive detections) over the sampled rows. Recall is 1 if the sampled rows have no detections.
+        """
+        candidates = self._GetCandidates(sortedWords)
+        rows = self._SampleRows(sortedWords, sampleRows, self.Settings.Seed + 1)
+        found: int = 0
+        expected: int = 0
+        for i in rows:
+            found += len(self._VerifyRow(sortedWords, i, candidates[i]))
+            expected += len(self._VerifyRow(sortedWords, i, list(range(i + 1, len(sortedWords)))))
+        recall: float = found / expected if expected else 1.0
+        logp(("WARNING: " if recall < self.Settings.TargetRecall else "") + "MinHashLSH (bands=" + str(self.Bands) + ", rows=" + str(self.Rows) + ") recall on "
+             + str(len(rows)) + " sampled rows: " + str(round(recall, 4)) + " (" + str(found) + "/" + str(expected) + "), target " + str(self.Settings.TargetRecall)
+             + ". Candidates: " + str(sum(len(c) for c in candidates)) + ".", anyMode=True)
+        return recall, found, expected
+
+
+class MinHashLSHCandidateGeneratorTest(TestCase):
+    Words = CandidatePairTestPool.Words
+
+    def test_GenerateCandidatePairs_SubsetOfExhaustiveWithSameScores(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        edit = EditDistance()
+        exhaustive = dict(CandidatePairTestPool.ExhaustiveDetections(edit, 0.5))
+        target = MinHashLSHCandidateGenerator(edit, 0.5, MinHashLSHSettings(targetRecall=0.99))
+        actual = CandidatePairTestPool.Detections(target.GenerateCandidatePairs(self.Words), edit)
+        self.assertEqual([k for k in exhaustive if k in dict(actual)], [k for k, _ in actual])  # Exhaustive order.
+        for key, sim in actual:
+            self.assertEqual(exhaustive[key], sim)
+        self.assertGreater(len(actual), 0)
+
+    def test_MeasureRecall_AllCandidatesGiveFullRecall(self):
+        from src.Core.Orthographic.OverlappingMeasures import Jaccard
+        target = MinHashLSHCandidateGenerator(Jaccard(Ngram(2)), 0.3, MinHashLSHSettings(bands=64, rows=1))
+        recall, found, expected = target.MeasureRecall(self.Words, sampleRows=len(self.Words))
+        self.assertEqual(1.0, recall)   # With single-hash bands, any pair sharing a gram is almost surely a candidate.
+        self.assertEqual(found, expected)
+
+    def test_MeasureRecall_CalibratedOnRealPool(self):
+        import os
+        from src.Core.Orthographic.NormalizedStringSimilarity.BitParallelEditDistance import BitParallelEditDistance
+        from src.Tools import Resources
+        with open(os.path.join(Resources.GetResourcesSubFolder("Others"), "MorphoLEX2.txt"), encoding="utf-8") as f:
+            lexicon = sorted(set(w for w in (line.split("\t")[0].strip().lower() for line in f) if len(w) >= 6 and w.isalpha()))
+        words = sorted(random.Random(1).sample(lexicon, 600))
+        edit = BitParallelEditDistance()
+        for minSim in [0.5, 0.75]:
+            tuned = MinHashLSHCandidateGenerator(edit, minSim, MinHashLSHSettings(recallSampleRows=0))
+            calibrated = MinHashLSHCandidateGenerator(edit, minSim)
+            tunedRecall, _, _ = tuned.MeasureRecall(words, sampleRows=len(words))
+            calibratedRecall, found, expected = calibrated.MeasureRecall(words, sampleRows=len(words))    # All rows, against the exhaustive detections.
+            self.assertGreater(expected, 0)
+            self.assertGreaterEqual(calibratedRecall, 0.9, str(minSim))
+            self.assertGreater(calibratedRecall, tunedRecall, str(minSim))  # The threshold alone does not tune nedit.
+
+    def test_TuneBanding_ReachesTargetRecall(self):
+        bands, rows = MinHashLSHCandidateGenerator.TuneBanding(0.5, 0.95)
+        self.assertGreaterEqual(MinHashLSHCandidateGenerator.CandidateProbability(0.5, bands, rows), 0.95)
+        self.assertEqual((47, 4), (bands, rows))   # 5 rows would need more than 256 hashes.
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# coding=utf-8
+import unittest
+from typing import List, Iterator, Tuple, Dict, Optional, Set
+from unittest import TestCase
+
+import numpy
+
+from src.Core.Orthographic.CandidateGeneration.ScoredRowsGeneratorBase import ScoredRowsGeneratorBase
+from src.Core.Orthographic.OverlappingMeasures import OverlappingMeasureBase
+
+
+class PrefixFilterCandidateGenerator(ScoredRowsGeneratorBase):
+    """
+    Set-similarity self-join over the gram sets of the pool (AllPairs with the PPJoin positional filter). Does not need scipy.
+    Grams are ordered globally from rare to frequent and the sets are processed from small to large. If two sets share at least o grams,
+    their prefixes of size |set|-o+1 must share a gram, so only the prefixes are indexed and probed.
+    The minimum overlap o for two set sizes is found with the measure's own expression, so the same filters work for Jaccard, Dice and Overlap.
+    Candidates that survive the length and positional filters are verified on their full gram sets; only the detections are materialised as WordPairs.
+    """
+
+    def __init__(self, measure: OverlappingMeasureBase, minSimilarity: float) -> None:
+        super().__init__(str(measure))
+        self.Measure: OverlappingMeasureBase = measure
+        self.MinSimilarity: float = minSimilarity
+        self._MinOverlaps: Dict[Tuple[int, int], Optional[int]] = {}
+        self._Joined: Tuple[List[str], List[List[Tuple[int, float]]]] = None     # All detections by row. Workers reuse them for their other chunks.
+
+    def MinOverlap(self, size1: int, size2: int) -> Optional[int]:
+        """
+        :return: The smallest intersection count with which two sets of these sizes reach the minimum similarity, None if they never do.
+        """
+        key = (size1, size2)
+        if key not in self._MinOverlaps:
+            overlaps = numpy.arange(1, min(size1, size2) + 1)
+            reached = (self.Measure._MeasureOverlapBatchImpl(overlaps, size1, size2) >= self.MinSimilarity).nonzero()[0]
+            self._MinOverlaps[key] = int(overlaps[reached[0]]) if len(reached) else None
+        return self._MinOverlaps[key]
+
+    def _OrderedSets(self, sortedWords: List[str]) -> List[List[int]]:
+        gramSets: List[Set[str]] = [self.Measure.GramExtractor.ExtractGrams(w) for w in sortedWords]
+        frequencies: Dict[str, int] = {}
+        for grams in gramSets:
+            for gram in grams:
+                frequencies[gram] = frequencies.get(gram, 0) + 1
+        rank: Dict[str, int] = {gram: r for r, gram in enumerate(sorted(frequencies, key=lambda g: (frequencies[g], g)))}  # Rare grams first.
+        return [sorted(rank[g] for g in grams) for grams in gramSets]
+
+    def _Join(self, sortedWords: List[str]) -> List[List[Tuple[int, float]]]:
+        sets = self._OrderedSets(sortedWords)
+        sizes = sorted(set(len(s) for s in sets if s))
+        # Prefix lengths from the loosest overlap bound: the probe side sees partners of its size or smaller, the indexed side partners of its size or larger.
+        probeOverlap: Dict[int, Optional[int]] = {}
+        indexOverlap: Dict[int, Optional[int]] = {}
+        for size in sizes:
+            probeOverlap[size] = min((o for o in (self.MinOverlap(size, s) for s in sizes if s <= size) if o is not None), default=None)
+            indexOverlap[size] = min((o for o in (self.MinOverlap(s, size) for s in sizes if s >= size) if o is not None), default=None)
+
+        gramSets: List[Set[int]] = [set(s) for s in sets]
+        rows: List[List[Tuple[int, float]]] = [[] for _ in sortedWords]
+        index: Dict[int, List[Tuple[int, int, int]]] = {}  # gram rank, [(word id, position in its set, set size)] in increasing set size.
+        starts: Dict[int, int] = {}                         # gram rank, first posting that can still reach the minimum similarity.
+        for x in sorted((w for w in range(len(sets)) if sets[w]), key=lambda w: (len(sets[w]), w)):
+            setX = sets[x]
+            sizeX = len(setX)
+            if probeOverlap[sizeX] is not None:
+                minOverlaps: Dict[int, int] = {s: self.MinOverlap(sizeX, s) for s in sizes if s <= sizeX and self.MinOverlap(sizeX, s) is not None}
+                minPartnerSize: int = min(minOverlaps)
+                overlaps: Dict[int, int] = {}   # candidate, shared grams so far (-1: pruned)
+                for px in range(0, sizeX - probeOverlap[sizeX] + 1):
+                    postings = index.get(setX[px])
+                    if postings is None:
+                        continue
+                    p = starts.get(setX[px], 0)
+                    while p < len(postings) and postings[p][2] < minPartnerSize:  # Length filter. Later sets are not smaller, so these postings are dropped for good.
+                        p += 1
+                    starts[setX[px]] = p
+                    for p in range(p, len(postings)):
+                        y, py, sizeY = postings[p]
+                        shared = overlaps.get(y, 0)
+                        if shared < 0:
+                            continue
+                        minOverlap = minOverlaps.get(sizeY)
+                        if minOverlap is None or shared + 1 + min(sizeX - px - 1, sizeY - py - 1) < minOverlap:  # Length and positional filters.
+                            overlaps[y] = -1
+                        else:
+                            overlaps[y] = shared + 1
+                for y, shared in overlaps.items():
+                    if shared > 0:
+                        self.ScoredPairs += 1
+                        inter = len(gramSets[x].intersection(gramSets[y]))
+                        if inter >= minOverlaps[len(sets[y])]:
+                            w1, w2 = (y, x) if y < x else (x, y)
+                            rows[w1].append((w2, float(self.Measure._MeasureOverlapBatchImpl(inter, len(sets[w1]), len(sets[w2])))))   # Same expression as WordSimilarityBatch.
+            if indexOverlap[sizeX] is not None:
+                for px in range(0, sizeX - indexOverlap[sizeX] + 1):
+                    index.setdefault(setX[px], []).append((x, px, sizeX))
+        for hits in rows:
+            hits.sort()  # Keeps the exhaustive order.
+        return rows
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        if self._Joined is None or self._Joined[0] is not sortedWords:
+            self._Joined = (sortedWords, self._Join(sortedWords))   # The join is not row by row, so it runs once for all rows.
+
+    def _RowDetections(self, sortedWords: List[str], startRow: int, endRow: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        self.Prepare(sortedWords)
+        rows = self._Joined[1]
+        for i in range(startRow, endRow):
+            yield i, rows[i]
+
+
+class PrefixFilterCandidateGeneratorTest(TestCase):
+
+    def test_GenerateCandidatePairs_SameDetectionsAndScoresAsExhaustive(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        from src.Core.Orthographic.OverlappingMeasures import Dice, Jaccard, OverlapCoefficient
+        from src.Core.Segmentation.Ngram import Ngram
+        for measure in [Dice(Ngram(2)), Jaccard(Ngram(2)), OverlapCoefficient(Ngram(2)), Jaccard(Ngram(3))]:
+            for minSim in [0.3, 0.5, 0.75, 1.0]:
+                CandidatePairTestPool.AssertSameAsExhaustive(self, PrefixFilterCandidateGenerator(measure, minSim), measure, minSim)
+
+    def test_MinOverlap(self):
+        from src.Core.Orthographic.OverlappingMeasures import Jaccard, OverlapCoefficient
+        from src.Core.Segmentation.Ngram import Ngram
+        self.assertEqual(4, PrefixFilterCandidateGenerator(Jaccard(Ngram(2)), 0.5).MinOverlap(6, 6))   # 4/8
+        self.assertIsNone(PrefixFilterCandidateGenerator(Jaccard(Ngram(2)), 0.5).MinOverlap(10, 4))
+        self.assertEqual(1, PrefixFilterCandidateGenerator(OverlapCoefficient(Ngram(2)), 0.5).MinOverlap(10, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
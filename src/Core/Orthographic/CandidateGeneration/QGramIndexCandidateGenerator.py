@@ -0,0 +1,114 @@
+# coding=utf-8
+import unittest
+from bisect import bisect_right
+from typing import List, Dict, Iterator, Tuple
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.CandidateColumnsGeneratorBase import CandidateColumnsGeneratorBase
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+from src.Core.Segmentation.Ngram import Ngram
+
+
+class QGramIndexCandidateGenerator(CandidateColumnsGeneratorBase):
+    """
+    Count filtering over a q-gram inverted index for the normalized edit distance (nedit).
+    Two strings within edit distance k share at least max(|a|,|b|) - q + 1 - k*q q-grams (counted with repetitions), so only word pairs sharing that many grams are yielded.
+    The allowed k is derived from the minimum similarity for every length combination; length combinations that cannot reach it are skipped as in LengthBucketCandidateGenerator.
+    Note: The bound gets weaker as q or k grows. When it drops to zero for a length combination, all pairs of that combination are yielded without counting.
+    With nedit and Q3=0.5 this happens for every q >= 2, so use q=1 (shared letter counts) for low thresholds.
+    The index is built once per pool, and CountCandidatePairs keeps the columns for GenerateCandidatePairs (see CandidateColumnsGeneratorBase).
+    """
+
+    def __init__(self, minSimilarity: float, q: int = 2) -> None:
+        super().__init__()
+        if (q < 1): raise Exception("q must be at least 1.")
+        self.MinSimilarity: float = minSimilarity
+        self.Q: int = q
+        self._Ngram: Ngram = Ngram(q)
+
+    def _MinSharedGrams(self, len1: int, len2: int) -> Tuple[bool, int]:
+        """
+        :return: Whether the two lengths can reach the minimum similarity, and the minimum number of shared q-grams (<= 0 means no filtering).
+        """
+        m_len = max(len1, len2)
+        k: int = EditDistance.MaxDistance(m_len, self.MinSimilarity)
+        if k < abs(len1 - len2):
+            return False, 0
+        return True, m_len - self.Q + 1 - k * self.Q
+
+    def _BuildIndex(self, sortedWords: List[str]) -> Tuple[Dict[str, Dict[int, Tuple[List[int], List[int]]]], Dict[int, List[int]], Dict[int, List[Tuple[int, int]]]]:
+        index: Dict[str, Dict[int, Tuple[List[int], List[int]]]] = {}  # gram, word length, (ascending word ids, gram counts)
+        buckets: Dict[int, List[int]] = {}  # word length, ascending word ids
+        for wordId, word in enumerate(sortedWords):
+            length = len(word)
+            buckets.setdefault(length, []).append(wordId)
+            for gram, count in self._Ngram.ExtractGramsWithCounts(word).items():
+                ids, counts = index.setdefault(gram, {}).setdefault(length, ([], []))
+                ids.append(wordId)
+                counts.append(count)
+        lengths = sorted(buckets)
+        requirements: Dict[int, List[Tuple[int, int]]] = {}  # length, [(compatible length, min shared grams)]
+        for len1 in lengths:
+            requirements[len1] = []
+            for len2 in lengths:
+                possible, minShared = self._MinSharedGrams(len1, len2)
+                if possible:
+                    requirements[len1].append((len2, minShared))
+        return index, buckets, requirements
+
+    def _CandidateColumns(self, sortedWords: List[str], qgramIndex, startRow: int, endRow: int) -> Iterator[Tuple[int, List[int]]]:
+        index, buckets, requirements = qgramIndex
+        for i in range(startRow, endRow):
+            w1: str = sortedWords[i]
+            grams = None
+            columns: List[int] = []
+            for len2, minShared in requirements[len(w1)]:
+                if minShared <= 0:  # Count filter cannot prune this length combination.
+                    bucket = buckets[len2]
+                    columns.extend(bucket[bisect_right(bucket, i):])
+                    continue
+                if grams is None:
+                    grams = self._Ngram.ExtractGramsWithCounts(w1)
+                shared: Dict[int, int] = {}
+                for gram, count1 in grams.items():
+                    postings = index[gram].get(len2)
+                    if postings is None:
+                        continue
+                    ids, counts = postings
+                    for p in range(bisect_right(ids, i), len(ids)):  # Only the upper triangle.
+                        j = ids[p]
+                        count2 = counts[p]
+                        shared[j] = shared.get(j, 0) + (count1 if count1 < count2 else count2)
+                columns.extend(j for j, count in shared.items() if count >= minShared)
+            columns.sort()  # Keeps the exhaustive order.
+            yield i, columns
+
+
+class QGramIndexCandidateGeneratorTest(TestCase):
+    Words = CandidatePairTestPool.Words
+
+    def _AssertSameAsExhaustive(self, minSim: float, q: int):
+        return CandidatePairTestPool.AssertSameAsExhaustive(self, QGramIndexCandidateGenerator(minSim, q), EditDistance(), minSim)
+
+    def test_GenerateCandidatePairs_SameDetectionsAsExhaustive(self):
+        for minSim in [0.5, 0.75, 0.8]:
+            for q in [1, 2, 3]:
+                self._AssertSameAsExhaustive(minSim, q)
+
+    def test_CountCandidatePairs_KeepsColumnsForGenerate(self):
+        expected = [wp.ToKey() for wp in QGramIndexCandidateGenerator(0.75, 2).GenerateCandidatePairs(self.Words, 3, 9)]
+        target = QGramIndexCandidateGenerator(0.75, 2)
+        count = target.CountCandidatePairs(self.Words)
+        target._CandidateColumns = None     # Filtering again would fail.
+        self.assertEqual(count, len(list(target.GenerateCandidatePairs(self.Words))))
+        self.assertEqual(expected, [wp.ToKey() for wp in target.GenerateCandidatePairs(self.Words, 3, 9)])
+
+    def test_GenerateCandidatePairs_Prunes(self):
+        n = len(self.Words)
+        self.assertLess(len(self._AssertSameAsExhaustive(0.75, 2)), n * (n - 1) / 10)
+        self.assertLess(len(self._AssertSameAsExhaustive(0.5, 1)), n * (n - 1) / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# coding=utf-8
+from abc import abstractmethod
+from typing import List, Iterator, Tuple
+
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import ICandidatePairGenerator
+from src.Core.WordPair import WordPair, SlottedWordPair
+
+
+class ScoredRowsGeneratorBase(ICandidatePairGenerator):
+    """
+    Base of the generators that find the detections themselves and yield them already scored (see ScoresPairs).
+    The detections of each row are small compared to the pair space, so the ones computed by CountCandidatePairs are kept for the following GenerateCandidatePairs call.
+    """
+
+    def __init__(self, simName: str) -> None:
+        """
+        :param simName: Name of the similarity the yielded pairs are scored with. Stage 2 reads the score under str(orthographicSim).
+        """
+        super().__init__()
+        self.SimName: str = simName
+        self.ScoredPairs: int = 0   # Pairs scored by the generator itself so far, for the Stage 2 report. The yielded pairs are only the detections among them.
+        self._CachedRows: Tuple[List[str], List[Tuple[int, List[Tuple[int, float]]]]] = None
+
+    @abstractmethod
+    def _RowDetections(self, sortedWords: List[str], startRow: int, endRow: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        """
+        :return: For every row i in [startRow, endRow): (i, [(j, similarity)]) with j > i in ascending order.
+        """
+        pass
+
+    def ScoresPairs(self) -> bool:
+        return True
+
+    def _GetRowDetections(self, sortedWords: List[str], startRow: int = 0, endRow: int = None) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        if self._CachedRows is not None and self._CachedRows[0] is sortedWords:
+            return iter(self._CachedRows[1][startRow:endRow])   # One item per row.
+        return self._RowDetections(sortedWords, startRow, len(sortedWords) if endRow is None else endRow)
+
+    def GenerateCandidatePairs(self, sortedWords: List[str], startRow: int = 0, endRow: int = None) -> Iterator[WordPair]:
+        for i, hits in self._GetRowDetections(sortedWords, startRow, endRow):
+            w1: str = sortedWords[i]
+            for j, sim in hits:
+                w2: str = sortedWords[j]
+                wp = SlottedWordPair(w1, w2) if w1 < w2 else SlottedWordPair(w2, w1)  # Only detections, straight into the Stage 2 tables.
+                wp.SetOtherSimilarity(self.SimName, sim)
+                yield wp
+
+    def CountCandidatePairs(self, sortedWords: List[str]) -> int:
+        """
+        Finds all the detections and keeps them, so the following GenerateCandidatePairs call on the same list does not repeat the work.
+        """
+        allRows = list(self._GetRowDetections(sortedWords))
+        self._CachedRows = (sortedWords, allRows)
+        return sum(len(hits) for _, hits in allRows)
@@ -0,0 +1,83 @@
+# coding=utf-8
+import unittest
+from typing import List, Iterator, Tuple
+from unittest import TestCase
+
+import numpy
+from scipy.sparse import csr_matrix
+
+from src.Core.Orthographic.CandidateGeneration.ScoredRowsGeneratorBase import ScoredRowsGeneratorBase
+from src.Core.Orthographic.OverlappingMeasures import OverlappingMeasureBase
+
+
+class SparseOverlapCandidateGenerator(ScoredRowsGeneratorBase):
+    """
+    All-pairs Jaccard/Dice/Overlap as a sparse matrix product. Words are the rows of a binary word x gram incidence matrix,
+    so the product of a block of rows with the transposed matrix holds the intersection counts of all pairs that share at least one gram.
+    The measure is derived from the intersection counts and the row sizes with the same expression as the measure itself, and only the entries above the minimum similarity are kept.
+    Requires scipy.
+    """
+
+    def __init__(self, measure: OverlappingMeasureBase, minSimilarity: float, blockSize: int = 1024) -> None:
+        """
+        :param blockSize: Number of rows multiplied at once. The memory of a block grows with blockSize x (pairs sharing a gram per row).
+        """
+        super().__init__(str(measure))
+        self.Measure: OverlappingMeasureBase = measure
+        self.MinSimilarity: float = minSimilarity
+        self.BlockSize: int = blockSize
+        self._Incidence: Tuple[List[str], csr_matrix, numpy.ndarray] = None    # Row ranges and workers reuse the incidence matrix of the pool.
+
+    def _BuildIncidence(self, sortedWords: List[str]) -> Tuple[csr_matrix, numpy.ndarray]:
+        gramIds = {}
+        indices: List[int] = []
+        indptr: List[int] = [0]
+        for word in sortedWords:
+            for gram in self.Measure.GramExtractor.ExtractGrams(word):
+                indices.append(gramIds.setdefault(gram, len(gramIds)))
+            indptr.append(len(indices))
+        incidence = csr_matrix((numpy.ones(len(indices), dtype=numpy.int32), indices, indptr), shape=(len(sortedWords), len(gramIds)))
+        return incidence, numpy.diff(numpy.array(indptr, dtype=numpy.int64))
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        if self._Incidence is None or self._Incidence[0] is not sortedWords:
+            self._Incidence = (sortedWords,) + self._BuildIncidence(sortedWords)
+
+    def _RowDetections(self, sortedWords: List[str], startRow: int, endRow: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        self.Prepare(sortedWords)
+        _, incidence, sizes = self._Incidence
+        for blockStart in range(startRow, endRow, self.BlockSize):
+            blockEnd = min(blockStart + self.BlockSize, endRow)
+            product = (incidence[blockStart:blockEnd] @ incidence[blockStart:].T).tocsr()  # Columns start from blockStart, enough for the upper triangle.
+            product.sort_indices()
+            rows = numpy.repeat(numpy.arange(blockStart, blockEnd), numpy.diff(product.indptr))
+            cols = product.indices.astype(numpy.int64) + blockStart
+            inter = product.data.astype(numpy.int64)
+            upper = cols > rows
+            rows, cols, inter = rows[upper], cols[upper], inter[upper]
+            self.ScoredPairs += len(rows)    # The pairs sharing a gram. The others score 0.
+            sims = self.Measure._MeasureOverlapBatchImpl(inter, sizes[rows], sizes[cols])
+            detected = sims >= self.MinSimilarity
+            rows, cols, sims = rows[detected], cols[detected], sims[detected]
+            bounds = numpy.searchsorted(rows, numpy.arange(blockStart, blockEnd + 1))
+            cols, sims = cols.tolist(), sims.tolist()
+            for i in range(blockStart, blockEnd):
+                start, end = bounds[i - blockStart], bounds[i - blockStart + 1]
+                yield i, list(zip(cols[start:end], sims[start:end]))
+
+
+class SparseOverlapCandidateGeneratorTest(TestCase):
+
+    def test_GenerateCandidatePairs_SameDetectionsAndScoresAsExhaustive(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        from src.Core.Orthographic.OverlappingMeasures import Dice, Jaccard, OverlapCoefficient
+        from src.Core.Segmentation.Ngram import Ngram
+        for measure in [Dice(Ngram(2)), Jaccard(Ngram(2)), OverlapCoefficient(Ngram(3))]:
+            for minSim in [0.3, 0.5, 0.75]:
+                target = SparseOverlapCandidateGenerator(measure, minSim, blockSize=3)
+                expected = CandidatePairTestPool.Detections(CandidatePairTestPool.AssertSameAsExhaustive(self, target, measure, minSim), measure)
+                self.assertEqual(expected, CandidatePairTestPool.Detections(target.GenerateCandidatePairs(CandidatePairTestPool.Words), measure))  # From the cached rows.
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# coding=utf-8
+import unittest
+from typing import List, Dict, Iterator, Tuple
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.ScoredRowsGeneratorBase import ScoredRowsGeneratorBase
+from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+
+
+class _TrieNode(object):
+    __slots__ = ["Children", "WordId", "MaxWordId", "MinLength", "MaxLength"]
+
+    def __init__(self) -> None:
+        self.Children: Dict[str, '_TrieNode'] = {}
+        self.WordId: int = -1           # Set if a word ends here.
+        self.MaxWordId: int = -1        # Largest word id in the subtree. Words are inserted in sorted order, so a subtree holds a contiguous id range.
+        self.MinLength: int = -1        # Shortest and longest word of the subtree.
+        self.MaxLength: int = -1
+
+
+class TrieCandidateGenerator(ScoredRowsGeneratorBase):
+    """
+    Walks a trie of the sorted wordpool once per word and computes the edit distance DP row by row along the trie edges.
+    Words sharing a prefix share the rows of that prefix, instead of recomputing them for every pair.
+    A subtree is skipped when it only holds words before the query word (upper triangle) or words of lengths that cannot reach the minimum similarity,
+    and pruned as soon as its row minimum exceeds the allowed distance. Only the diagonal band of the allowed distance is computed, in row buffers reused by depth.
+    Still a Python loop per trie cell: on 2,000 English words it takes 5 s at 0.75 and 32 s at 0.5, where the vectorized rows (Exhaustive) take 2.5 s and 4 s.
+    So it is not a performance strategy and Auto never picks it; it is kept as an exact, dependency-free cross-check of the other generators. The trie is built once per pool.
+    Yields only the pairs above the minimum similarity, with their similarity already set (see ScoresPairs).
+    """
+
+    def __init__(self, editDistance: EditDistance, minSimilarity: float) -> None:
+        super().__init__(str(editDistance))
+        self.EditDistance: EditDistance = editDistance
+        self.MinSimilarity: float = minSimilarity
+        self._Trie: Tuple[List[str], _TrieNode] = None     # Row ranges and workers reuse the trie of the pool.
+
+    def _BuildTrie(self, sortedWords: List[str]) -> _TrieNode:
+        root = _TrieNode()
+        for wordId, word in enumerate(sortedWords):
+            node = root
+            path = [root]
+            for c in word:
+                child = node.Children.get(c)
+                if child is None:
+                    child = node.Children[c] = _TrieNode()
+                node = child
+                path.append(node)
+            node.WordId = wordId
+            for node in path:
+                node.MaxWordId = wordId
+                if node.MinLength < 0 or len(word) < node.MinLength: node.MinLength = len(word)
+                if len(word) > node.MaxLength: node.MaxLength = len(word)
+        return root
+
+    def Prepare(self, sortedWords: List[str]) -> None:
+        if self._Trie is None or self._Trie[0] is not sortedWords:
+            self._Trie = (sortedWords, self._BuildTrie(sortedWords))
+
+    def _RowDetections(self, sortedWords: List[str], startRow: int, endRow: int) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        self.Prepare(sortedWords)
+        root = self._Trie[1]
+        lengths = sorted(set(len(w) for w in sortedWords))
+        maxDistances: Dict[Tuple[int, int], int] = {}  # (len1, len2), allowed distance. Missing if the lengths cannot reach the minimum similarity.
+        for len1 in lengths:
+            for len2 in lengths:
+                k: int = EditDistance.MaxDistance(max(len1, len2), self.MinSimilarity)
+                if k >= abs(len1 - len2):
+                    maxDistances[(len1, len2)] = k
+
+        for i in range(startRow, endRow):
+            w1: str = sortedWords[i]
+            len1: int = len(w1)
+            partners: Dict[int, int] = {len2: k for (l1, len2), k in maxDistances.items() if l1 == len1}   # length, allowed distance
+            hits: List[Tuple[int, int]] = []  # (word id, distance)
+            if partners:
+                radius: int = max(partners.values())
+                over: int = radius + 1
+                rows: List[List[int]] = [[over] * (len1 + 2) for _ in range(max(partners) + 1)]   # Depth, DP row. The cell after the band is always over.
+                for j in range(min(len1, radius) + 1):
+                    rows[0][j] = j
+                self._Walk(root, 0, rows, w1, i, radius, min(partners), max(partners), partners, hits)
+            hits.sort()  # Keeps the exhaustive order.
+            yield i, [(j, 1 - d / max(len1, len(sortedWords[j]))) for j, d in hits]  # Same expression as EditDistance.WordSimilarity.
+
+    def _Walk(self, node: _TrieNode, depth: int, rows: List[List[int]], w1: str, i: int, radius: int, minLength: int, maxLength: int,
+              partners: Dict[int, int], hits: List[Tuple[int, int]]):
+        len1: int = len(w1)
+        over: int = radius + 1
+        row: List[int] = rows[depth]
+        newRow: List[int] = rows[depth + 1]
+        d1: int = depth + 1
+        lo: int = d1 - radius if d1 > radius else 1
+        hi: int = d1 + radius if d1 + radius < len1 else len1
+        for c, child in node.Children.items():
+            if child.MaxWordId <= i or child.MaxLength < minLength or child.MinLength > maxLength:
+                continue  # Only words before the query word, or of lengths that cannot reach it, below.
+            left: int = d1 if d1 <= radius else over
+            newRow[0] = left
+            rowMin: int = left if lo == 1 else over
+            if lo > 1:
+                newRow[lo - 1] = over   # Left edge of the band.
+                left = over
+            for j in range(lo, hi + 1):
+                v = row[j - 1] if w1[j - 1] == c else row[j - 1] + 1
+                up = row[j] + 1
+                if up < v: v = up
+                if left + 1 < v: v = left + 1
+                if v > over: v = over
+                newRow[j] = v
+                left = v
+                if v < rowMin: rowMin = v
+            newRow[hi + 1] = over       # Right edge of the band.
+            if rowMin > radius:
+                continue  # Row minimums never decrease along a path.
+            if child.WordId > i and hi == len1:
+                self.ScoredPairs += 1   # A whole word within the band: its distance is complete.
+                k = partners.get(d1)
+                if k is not None and newRow[len1] <= k:
+                    hits.append((child.WordId, newRow[len1]))
+            if child.Children and d1 < maxLength:
+                self._Walk(child, d1, rows, w1, i, radius, minLength, maxLength, partners, hits)
+
+
+class TrieCandidateGeneratorTest(TestCase):
+
+    def test_GenerateCandidatePairs_SameDetectionsAndScoresAsExhaustive(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        edit = EditDistance()
+        for minSim in [0.5, 0.75, 0.8]:
+            target = TrieCandidateGenerator(edit, minSim)
+            expected = CandidatePairTestPool.Detections(CandidatePairTestPool.AssertSameAsExhaustive(self, target, edit, minSim), edit)
+            self.assertEqual(expected, CandidatePairTestPool.Detections(target.GenerateCandidatePairs(CandidatePairTestPool.Words), edit))  # From the cached trie.
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# coding=utf-8
+import unittest
+from functools import reduce
+from typing import List, Dict, Optional
+from unittest import TestCase
+
+import numpy
+
+from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.Orthographic.ILengthBoundedSimilarity import ILengthBoundedSimilarity
+from src.Core.Orthographic.OverlappingMeasures import OverlappingMeasureBase
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+
+
+class CompositeOrthographicSimilarity(IWordSimilarity):
+    """
+    Several orthographic similarities scored in one pass over the candidates, so Stage 2 can compare nedit, jacc, dice and over without enumerating the pairs once per measure
+    (see S2_GenerateOrthographicallySimilarWordPairsMultiMeasure).
+    Overlap measures with the same gram extraction (e.g. jacc_ngr2 and dice_ngr2) share the grams and the intersection counts of a row; only the final ratio differs.
+    Length-bounded measures (nedit) only score the candidates whose lengths can reach their minimum similarity.
+    As a single IWordSimilarity, a pair gets the best similarity of its measures.
+    """
+
+    def __init__(self, measures: List[IWordSimilarity]) -> None:
+        super().__init__()
+        if (not measures): raise Exception("A composite similarity needs at least one measure.")
+        self.Measures: List[IWordSimilarity] = measures
+        self.Names: List[str] = [str(m) for m in measures]
+        if (len(set(self.Names)) != len(self.Names)): raise Exception("Measures of a composite similarity must have different names: " + str(self.Names))
+        self._GramGroups: Dict[str, List[int]] = {}    # Gram extraction config, indices of the overlap measures that use it.
+        for index, measure in enumerate(measures):
+            if isinstance(measure, OverlappingMeasureBase):
+                self._GramGroups.setdefault(measure.GramExtractor.ToConfigValue(), []).append(index)
+
+    def WordSimilarities(self, w1: str, w2: str) -> Dict[str, Optional[float]]:
+        """
+        :return: Measure name, similarity.
+        """
+        return {name: measure.WordSimilarity(w1, w2) for name, measure in zip(self.Names, self.Measures)}
+
+    def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
+        sims = [sim for sim in self.WordSimilarities(w1, w2).values() if sim is not None]
+        return max(sims) if sims else None
+
+    def WordSimilaritiesBatch(self, word: str, candidates: List[str], minSimilarities: Dict[str, float] = None) -> Dict[str, numpy.ndarray]:
+        """
+        Same values as WordSimilarityBatch of every measure.
+        :param minSimilarities: Measure name, minimum similarity. The length-bounded measures get NaN instead of a score for the candidates that cannot reach it.
+        :return: Measure name, float64 array aligned with candidates.
+        """
+        sims: Dict[str, numpy.ndarray] = {}
+        for indices in self._GramGroups.values():
+            counts = self.Measures[indices[0]].OverlapCountsBatch(word, candidates)
+            for index in indices:
+                sims[self.Names[index]] = self.Measures[index].MeasureOverlapBatch(*counts)
+        lengths: numpy.ndarray = None
+        for name, measure in zip(self.Names, self.Measures):
+            if name in sims:
+                continue
+            minSimilarity = minSimilarities.get(name) if minSimilarities else None
+            if minSimilarity is None or not isinstance(measure, ILengthBoundedSimilarity):
+                sims[name] = measure.WordSimilarityBatch(word, candidates)
+                continue
+            if lengths is None:
+                lengths = numpy.fromiter((len(c) for c in candidates), dtype=numpy.int64, count=len(candidates))
+            reachable = {len2: measure.MaxSimilarityByLengths(len(word), len2) >= minSimilarity for len2 in numpy.unique(lengths).tolist()}
+            columns = numpy.fromiter((reachable[len2] for len2 in lengths.tolist()), dtype=bool, count=len(candidates)).nonzero()[0]
+            sims[name] = numpy.full(len(candidates), numpy.nan)
+            if len(columns):
+                sims[name][columns] = measure.WordSimilarityBatch(word, [candidates[j] for j in columns])
+        return {name: sims[name] for name in self.Names}
+
+    def WordSimilarityBatch(self, word: str, candidates: List[str]) -> numpy.ndarray:
+        return reduce(numpy.fmax, self.WordSimilaritiesBatch(word, candidates).values())
+
+    def IsBatchVectorized(self) -> bool:
+        return True
+
+    def SimilarityScale(self) -> DiscreteScale:
+        return DiscreteScale(0, 1)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __str__(self) -> str:
+        return "+".join(self.Names)
+
+
+class CompositeOrthographicSimilarityTest(TestCase):
+
+    def test_WordSimilaritiesBatch_SameAsEveryMeasure(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        from src.Core.Orthographic.OverlappingMeasures import Dice, Jaccard, OverlapCoefficient
+        from src.Core.Segmentation.Ngram import Ngram
+        measures = [EditDistance(), Jaccard(Ngram(2)), Dice(Ngram(2)), OverlapCoefficient(Ngram(3))]
+        target = CompositeOrthographicSimilarity(measures)
+        candidates = ["professor", "processor", "prison", "a", "", "poisonous", "tyrannosaurus"]
+        actual = target.WordSimilaritiesBatch("poison", candidates)
+        for name, measure in zip(target.Names, measures):
+            self.assertEqual(measure.WordSimilarityBatch("poison", candidates).tolist(), actual[name].tolist(), name)
+        self.assertEqual(max(m.WordSimilarity("poison", "prison") for m in measures), target.WordSimilarity("poison", "prison"))
+
+    def test_WordSimilaritiesBatch_LengthBoundSkipsCandidates(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        target = CompositeOrthographicSimilarity([EditDistance()])
+        actual = target.WordSimilaritiesBatch("poison", ["prison", "tyrannosaurus"], {"nedit": 0.5})["nedit"]
+        self.assertEqual(EditDistance().WordSimilarity("poison", "prison"), actual[0])
+        self.assertTrue(numpy.isnan(actual[1]))
+        with self.assertRaises(Exception):
+            CompositeOrthographicSimilarity([EditDistance(), EditDistance()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+# coding=utf-8
+from abc import ABC, abstractmethod
+
+
+class ILengthBoundedSimilarity(ABC):
+    """
+    Specifies that the highest similarity a word pair can reach is known from the lengths of the two words alone.
+    Candidate generators use it to discard impossible pairs before calling the actual similarity.
+    """
+
+    @abstractmethod
+    def MaxSimilarityByLengths(self, len1: int, len2: int) -> float:
+        """
+        Returns the upper bound of the similarity for any two words with the given lengths.
+        The bound must be computed with the same float expression as the similarity itself, so that threshold comparisons agree.
+        :param len1:
+        :param len2:
+        :return:
+        """
+        pass
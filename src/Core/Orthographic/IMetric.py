@@ -4,7 +4,7 @@ from abc import ABC
 class IMetric(ABC):
     """
     Specifies that implementing classes represent metrics adhering to MetricSpace rules such as the 'Triangle Inequality.'
-    Currently, it is used solely for informational purposes. It has no functional role and was introduced to create self-awareness.
+    The raw (not normalized) distances of metrics can be indexed with MetricIndex.BKTree, which prunes by the triangle inequality.
     https://mathworld.wolfram.com/MetricSpace.html
     """
     def __init__(self) -> None:
@@ -0,0 +1,117 @@
+# coding=utf-8
+import unittest
+from typing import List, Tuple, Dict
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+from src.Core.Orthographic.IStringDistance import IStringDistance
+from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+
+
+class BKTree(object):
+    """
+    Burkhard-Keller tree over a wordpool for 'all words within distance d of w' queries.
+    Every child edge is labeled with its distance to the parent word. By the triangle inequality, a radius query only descends into the edges in [d-radius, d+radius].
+    The distance must be an integer metric such as the (not normalized) edit distance.
+    With an EditDistance, each node is compared with a cutoff of radius + its largest edge (see Query), so the banded or bit-parallel distance stops early on the far nodes.
+    Usage for ad-hoc lookups: BKTree.FromWordpoolFile("S1-FinalWordPool-xyz.txt").QueryWords("action", 2)
+    """
+
+    def __init__(self, distance: IStringDistance = None) -> None:
+        super().__init__()
+        self.Distance: IStringDistance = distance if distance else EditDistance()
+        self.Words: List[str] = []                              # Word ids are the insertion indices.
+        self._Children: List[Dict[int, int]] = []               # word id, (edge distance -> child word id)
+        self._MaxEdges: List[int] = []                          # word id, largest edge distance to its children
+        self._CutOff: bool = isinstance(self.Distance, EditDistance)
+
+    def Add(self, word: str) -> int:
+        """
+        :return: The id of the added word. Duplicates are added again with a new id.
+        """
+        wordId: int = len(self.Words)
+        self.Words.append(word)
+        self._Children.append({})
+        self._MaxEdges.append(0)
+        if wordId == 0:
+            return wordId
+        node: int = 0
+        while True:
+            d: int = int(self.Distance.Distance(word, self.Words[node]))
+            child = self._Children[node].get(d)
+            if child is None:
+                self._Children[node][d] = wordId
+                if d > self._MaxEdges[node]:
+                    self._MaxEdges[node] = d
+                return wordId
+            node = child
+
+    def AddAll(self, words: List[str]) -> 'BKTree':
+        for w in words:
+            self.Add(w)
+        return self
+
+    def Query(self, word: str, radius: int) -> List[Tuple[int, int]]:
+        """
+        A node farther than radius + its largest edge is neither a hit nor has a child edge in [d-radius, d+radius], so its exact distance is not needed beyond that cutoff.
+        :return: (word id, distance) of all words within the radius, in no particular order.
+        """
+        results: List[Tuple[int, int]] = []
+        if not self.Words:
+            return results
+        stack: List[int] = [0]
+        while stack:
+            node = stack.pop()
+            if self._CutOff:
+                d: int = int(self.Distance.Distance(word, self.Words[node], radius + self._MaxEdges[node]))     # Cutoff + 1 if farther.
+            else:
+                d: int = int(self.Distance.Distance(word, self.Words[node]))
+            if d <= radius:
+                results.append((node, d))
+            for edge, child in self._Children[node].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return results
+
+    def QueryWords(self, word: str, radius: int) -> List[Tuple[str, int]]:
+        """
+        :return: (word, distance) of all words within the radius, closest first.
+        """
+        return sorted(((self.Words[wordId], d) for wordId, d in self.Query(word, radius)), key=lambda r: (r[1], r[0]))
+
+    def __len__(self) -> int:
+        return len(self.Words)
+
+    @staticmethod
+    def FromWordpoolFile(wordpoolPath: str, distance: IStringDistance = None) -> 'BKTree':
+        """
+        Builds the tree from a saved pool file with one word per line, e.g. S1-FinalWordPool-*.txt.
+        """
+        tree = BKTree(distance)
+        with open(wordpoolPath, encoding="utf-8-sig") as file:
+            for w in file:
+                w = w.strip()
+                if w:
+                    tree.Add(w)
+        return tree
+
+
+class BKTreeTest(TestCase):
+    Words = CandidatePairTestPool.Words
+
+    def test_Query_SameAsLinearScan(self):
+        edit = EditDistance()
+        tree = BKTree(edit).AddAll(self.Words)
+        for w in self.Words + ["prisoner", "actions", "zzz"]:
+            for radius in range(0, 5):
+                expected = sorted((i, edit.Distance(w, other)) for i, other in enumerate(self.Words) if edit.Distance(w, other) <= radius)
+                self.assertEqual(expected, sorted(tree.Query(w, radius)), w)
+
+    def test_QueryWords_ClosestFirst(self):
+        tree = BKTree().AddAll(self.Words)
+        self.assertEqual([("poison", 0), ("prison", 1)], tree.QueryWords("poison", 1))
+        self.assertEqual([], BKTree().QueryWords("poison", 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
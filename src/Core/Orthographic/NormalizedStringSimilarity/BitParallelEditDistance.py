@@ -0,0 +1,216 @@
+# coding=utf-8
+import random
+import unittest
+from typing import Dict, List
+from unittest import TestCase
+
+import numpy
+
+from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+
+
+class BitParallelEditDistance(EditDistance):
+    """
+    Same edit distance as EditDistance, calculated with Myers' bit-vector algorithm (Hyyrö's formulation for Levenshtein).
+    A whole DP column is kept in two Python ints, so each character of the second word costs a handful of integer ops instead of an inner loop.
+    The character masks (Peq) of the first word are cached, so they are built once per wordpool word and reused for all pairs of its row in Stage 2.
+    The batch methods advance the columns of all candidates together as uint64 arrays (words up to 64 letters), so a Stage 2 row costs a few array ops per candidate character.
+    Reports itself as "nedit", so studies and resume files of EditDistance stay compatible.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._PeqCache: Dict[str, Dict[str, int]] = {}     # word, char -> bitmask of its positions in the word
+
+    def _GetPeq(self, pattern: str) -> Dict[str, int]:
+        peq = self._PeqCache.get(pattern)
+        if peq is None:
+            peq = {}
+            bit: int = 1
+            for c in pattern:
+                peq[c] = peq.get(c, 0) | bit
+                bit <<= 1
+            self._PeqCache[pattern] = peq
+        return peq
+
+    def ClearCache(self) -> None:
+        self._PeqCache.clear()
+
+    def Distance(self, s0: str, s1: str, maxDist: int = None):
+        """
+        :param maxDist: If given, the calculation stops as soon as the distance cannot get back to maxDist and maxDist+1 is returned.
+        """
+        if s0 is None:
+            raise TypeError("Argument s0 is NoneType.")
+        if s1 is None:
+            raise TypeError("Argument s1 is NoneType.")
+        if s0 == s1:
+            return 0.0
+        if len(s0) == 0:
+            return len(s1)
+        if len(s1) == 0:
+            return len(s1)     # Same as EditDistance.
+        if maxDist is not None and abs(len(s0) - len(s1)) > maxDist:
+            return maxDist + 1
+
+        peq = self._GetPeq(s0)
+        m: int = len(s0)
+        mask: int = (1 << m) - 1
+        last: int = 1 << (m - 1)
+        pv: int = mask
+        mv: int = 0
+        score: int = m
+        remaining: int = len(s1)
+        for c in s1:
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+            ph = mv | (~(xh | pv) & mask)
+            mh = pv & xh
+            if ph & last:
+                score += 1
+            elif mh & last:
+                score -= 1
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = mh | (~(xv | ph) & mask)
+            mv = ph & xv
+            remaining -= 1
+            if maxDist is not None and score - remaining > maxDist:
+                return maxDist + 1     # The score can drop by at most one per remaining character.
+        return score
+
+    def WordSimilarityBatch(self, word: str, candidates: List[str]) -> numpy.ndarray:
+        """
+        Same values as WordSimilarity for every candidate, with the bit-vector columns of all candidates advanced together (see _DistanceBatch).
+        """
+        return self._SimilarityBatch(word, candidates, None)
+
+    def WordSimilarityBatchAtLeast(self, word: str, candidates: List[str], minSimilarity: float) -> numpy.ndarray:
+        """
+        Candidates whose lengths cannot reach minSimilarity are not scored at all, and the others are dropped as soon as their distance cannot get back to the largest allowed one.
+        """
+        return self._SimilarityBatch(word, candidates, minSimilarity)
+
+    def _SimilarityBatch(self, word: str, candidates: List[str], minSimilarity: float = None) -> numpy.ndarray:
+        m: int = len(word)
+        if not word or not candidates or m > 64:   # The DP of EditDistance has no length limit.
+            sims = super().WordSimilarityBatch(word, candidates)
+            if minSimilarity is not None:
+                sims[sims < minSimilarity] = numpy.nan
+            return sims
+        lengths = numpy.fromiter(map(len, candidates), dtype=numpy.int64, count=len(candidates))
+        sims = numpy.full(len(candidates), numpy.nan)
+        sims[lengths == 0] = 1.0    # Same as Distance, which returns len(s1) for an empty s1.
+        limits = numpy.full(int(lengths.max()) + 1, m + int(lengths.max()), dtype=numpy.int64)  # Length, largest distance worth computing.
+        if minSimilarity is not None:
+            for len2 in numpy.unique(lengths).tolist():
+                k: int = EditDistance.MaxDistance(max(m, len2), minSimilarity)
+                limits[len2] = k if k >= abs(m - len2) else -1
+            if 1.0 < minSimilarity: sims[lengths == 0] = numpy.nan
+        limits[0] = -1
+        maxDists = limits[lengths]
+        selected = (maxDists >= 0).nonzero()[0]
+        if len(selected):
+            dists = self._DistanceBatch(word, [candidates[i] for i in selected], lengths[selected], maxDists[selected])
+            found = dists <= maxDists[selected]
+            sims[selected[found]] = 1 - dists[found] / numpy.maximum(lengths[selected[found]], m)
+        if minSimilarity is not None:
+            sims[sims < minSimilarity] = numpy.nan
+        return sims
+
+    def _DistanceBatch(self, word: str, candidates: List[str], lengths: numpy.ndarray, maxDists: numpy.ndarray) -> numpy.ndarray:
+        """
+        Myers' algorithm over the cached Peq of word, for all the (non-empty) candidates at once. Needs len(word) <= 64.
+        The candidates are ordered longest first, so the ones still running at a character position are a prefix of the state arrays.
+        :param maxDists: Largest distance of interest for each candidate. Candidates that cannot get back to it are abandoned (compacted away) and get maxDist+1.
+        :return: int64 distances aligned with candidates.
+        """
+        m: int = len(word)
+        peq = self._GetPeq(word)
+        chars = sorted(peq)
+        charCodes = numpy.array([ord(c) for c in chars], dtype=numpy.uint32)
+        charMasks = numpy.array([peq[c] for c in chars], dtype=numpy.uint64)
+        one = numpy.uint64(1)
+        mask = numpy.uint64((1 << m) - 1)
+        last = numpy.uint64(1 << (m - 1))
+
+        order = numpy.argsort(-lengths, kind="stable")
+        rowLengths = lengths[order]
+        rowLimits = maxDists[order]
+        rows = order            # State row -> candidate index.
+        codes = EditDistance.EncodeCandidates([candidates[i] for i in order], rowLengths)
+        pv = numpy.full(len(rows), mask, dtype=numpy.uint64)
+        mv = numpy.zeros(len(rows), dtype=numpy.uint64)
+        score = numpy.full(len(rows), m, dtype=numpy.int64)
+        dists = numpy.empty(len(candidates), dtype=numpy.int64)
+        active: int = len(rows)
+        for j in range(int(rowLengths[0])):
+            eqCodes = codes[:active, j]
+            positions = numpy.minimum(numpy.searchsorted(charCodes, eqCodes), len(charCodes) - 1)
+            eq = numpy.where(charCodes[positions] == eqCodes, charMasks[positions], numpy.uint64(0))
+            p, n = pv[:active], mv[:active]
+            xv = eq | n
+            xh = ((((eq & p) + p) & mask) ^ p) | eq
+            ph = n | (~(xh | p) & mask)
+            mh = p & xh
+            score[:active] += (ph & last) != 0
+            score[:active] -= (mh & last) != 0
+            ph = ((ph << one) | one) & mask
+            mh = (mh << one) & mask
+            pv[:active] = mh | (~(xv | ph) & mask)
+            mv[:active] = ph & xv
+
+            finished: int = active
+            while active and rowLengths[active - 1] <= j + 1:
+                active -= 1
+            dists[rows[active:finished]] = score[active:finished]
+            if active and j % 4 == 3:   # Early abandon: the score can drop by at most one per remaining character.
+                hopeless = score[:active] - (rowLengths[:active] - (j + 1)) > rowLimits[:active]
+                if hopeless.sum() * 4 > active:
+                    dists[rows[:active][hopeless]] = rowLimits[:active][hopeless] + 1
+                    keep = ~hopeless
+                    rows, rowLengths, rowLimits, codes = rows[:active][keep], rowLengths[:active][keep], rowLimits[:active][keep], codes[:active][keep]
+                    pv, mv, score = pv[:active][keep], mv[:active][keep], score[:active][keep]
+                    active = len(rows)
+            if not active:
+                break
+        return dists
+
+
+class BitParallelEditDistanceTest(TestCase):
+
+    def test_Distance_SameAsEditDistance(self):
+        target = BitParallelEditDistance()
+        expected = EditDistance()
+        rnd = random.Random(11)
+        for _ in range(3000):
+            s0 = "".join(rnd.choice("abcd") for _ in range(rnd.randint(0, 12)))
+            s1 = "".join(rnd.choice("abcd") for _ in range(rnd.randint(0, 12)))
+            self.assertEqual(expected.Distance(s0, s1), target.Distance(s0, s1), s0 + "-" + s1)
+            for maxDist in range(0, 6):
+                self.assertEqual(expected.Distance(s0, s1, maxDist), target.Distance(s0, s1, maxDist), s0 + "-" + s1)
+
+    def test_WordSimilarity_LongWordsAndName(self):
+        target = BitParallelEditDistance()
+        expected = EditDistance()
+        for w1, w2 in [("vascularisation", "vascularization"), ("tencerelerimizden", "pencerelerimizden"), ("biracılık", "kiracılık"),
+                       ("pneumonoultramicroscopicsilicovolcanoconiosis", "ultramicroscopic"), ("shakespeare", "shakespearean")]:
+            self.assertEqual(expected.WordSimilarity(w1, w2), target.WordSimilarity(w1, w2))
+            self.assertEqual(expected.WordSimilarityAtLeast(w1, w2, 0.5), target.WordSimilarityAtLeast(w1, w2, 0.5))
+        self.assertEqual("nedit", str(target))
+
+    def test_WordSimilarityBatch_SameAsEditDistance(self):
+        target = BitParallelEditDistance()
+        expected = EditDistance()
+        rnd = random.Random(3)
+        candidates = ["".join(rnd.choice("abcç") for _ in range(rnd.randint(0, 14))) for _ in range(500)] + ["pneumonoultramicroscopicsilicovolcanoconiosis" * 2]
+        for word in ["", "a", "abcab", "çaçbacab", "bbbbbbbbbbbbbb", "ab" * 32, "abc" * 30]:
+            self.assertEqual(expected.WordSimilarityBatch(word, candidates).tolist(), target.WordSimilarityBatch(word, candidates).tolist(), word)
+            for minSim in [0.3, 0.5, 0.75, 1.0]:
+                actual = [None if numpy.isnan(sim) else sim for sim in target.WordSimilarityBatchAtLeast(word, candidates, minSim).tolist()]
+                self.assertEqual([expected.WordSimilarityAtLeast(word, c, minSim) for c in candidates], actual, word + " " + str(minSim))
+
+
+if __name__ == '__main__':
+    unittest.main()
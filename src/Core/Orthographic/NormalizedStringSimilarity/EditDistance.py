@@ -1,12 +1,19 @@
-from typing import List
+import random
+import unittest
+from typing import List, Optional
+from unittest import TestCase
+
+import numpy
 
 from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.Orthographic.ILengthBoundedSimilarity import ILengthBoundedSimilarity
 from src.Core.Orthographic.IMetric import IMetric
 from src.Core.WordPair import WordPair
+from src.Core.WordSim.IThresholdedWordSimilarity import IThresholdedWordSimilarity
 from src.Core.WordSim.IWordSimilarity import IWordSimilarity
 
 
-class EditDistance(IWordSimilarity, IMetric):
+class EditDistance(IWordSimilarity, IMetric, ILengthBoundedSimilarity, IThresholdedWordSimilarity):
     """
     Copied from StringSimilarityFamily for Cython support.
     The normalized version is also an IWordSimilarity.
@@ -23,7 +30,107 @@ class EditDistance(IWordSimilarity, IMetric):
             return 0.0
         return self.Distance(s0, s1) / m_len
 
-    def Distance(self, s0: str, s1: str):
+    def WordSimilarityBatch(self, word: str, candidates: List[str]) -> numpy.ndarray:
+        """
+        Same values as WordSimilarity for every candidate, with the DP of all candidates advanced together (see DistanceBatch).
+        """
+        if not word or not candidates:
+            return super().WordSimilarityBatch(word, candidates)
+        lengths = numpy.fromiter((len(c) for c in candidates), dtype=numpy.int64, count=len(candidates))
+        dists = self.DistanceBatch(word, candidates, lengths)
+        dists[lengths == 0] = 0     # Same as Distance, which returns len(s1) for an empty s1.
+        return 1 - dists / numpy.maximum(lengths, len(word))
+
+    def IsBatchVectorized(self) -> bool:
+        return True
+
+    @staticmethod
+    def DistanceBatch(word: str, candidates: List[str], lengths: numpy.ndarray = None) -> numpy.ndarray:
+        """
+        Levenshtein distances of word to all candidates. The candidates are encoded as a zero-padded uint32 code point matrix,
+        and the DP column over word is advanced one candidate character at a time for all candidates at once.
+        The insertion chain inside a column is resolved with a cumulative minimum instead of a loop over the characters of word.
+        :param lengths: Candidate lengths, if already known.
+        :return: int64 array aligned with candidates.
+        """
+        k: int = len(candidates)
+        m: int = len(word)
+        if lengths is None:
+            lengths = numpy.fromiter((len(c) for c in candidates), dtype=numpy.int64, count=k)
+        maxLen: int = int(lengths.max()) if k else 0
+        codes = EditDistance.EncodeCandidates(candidates, lengths)
+        wordCodes = numpy.frombuffer(word.encode("utf-32-le"), dtype=numpy.uint32)
+
+        steps = numpy.arange(m + 1, dtype=numpy.int64)
+        column = numpy.tile(steps, (k, 1))     # Distances of word[:i] to the consumed candidate prefix.
+        dists = column[:, m].copy()            # Empty candidates.
+        for j in range(maxLen):
+            substitution = column[:, :-1] + (wordCodes[None, :] != codes[:, j, None])
+            deletion = column[:, 1:] + 1
+            best = numpy.empty_like(column)
+            best[:, 0] = j + 1
+            numpy.minimum(substitution, deletion, out=best[:, 1:])
+            column = numpy.minimum.accumulate(best - steps, axis=1) + steps      # Insertions: column[i] = min(column[i], column[i-1] + 1)
+            finished = lengths == j + 1
+            dists[finished] = column[finished, m]
+        return dists
+
+    @staticmethod
+    def EncodeCandidates(candidates: List[str], lengths: numpy.ndarray) -> numpy.ndarray:
+        """
+        :return: uint32 matrix of shape (len(candidates), max length) with the code points of each candidate, zero-padded.
+        """
+        k: int = len(candidates)
+        codes = numpy.zeros((k, int(lengths.max()) if k else 0), dtype=numpy.uint32)
+        flat = numpy.frombuffer("".join(candidates).encode("utf-32-le"), dtype=numpy.uint32)
+        rows = numpy.repeat(numpy.arange(k), lengths)
+        offsets = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        codes[rows, numpy.arange(len(flat)) - offsets] = flat
+        return codes
+
+    def MaxSimilarityByLengths(self, len1: int, len2: int) -> float:
+        """
+        The distance is at least the length difference, so the similarity cannot exceed 1 - |len1-len2| / max(len1,len2).
+        """
+        m_len = max(len1, len2)
+        if m_len == 0:
+            return 1.0
+        return 1 - abs(len1 - len2) / m_len
+
+    def WordSimilarityAtLeast(self, w1: str, w2: str, minSimilarity: float) -> Optional[float]:
+        """
+        Runs the banded distance with the largest distance that can still reach minSimilarity.
+        Returns the same value as WordSimilarity when it is at least minSimilarity, otherwise None.
+        """
+        m_len = max(len(w1), len(w2))
+        if m_len == 0:
+            return 1.0 if 1.0 >= minSimilarity else None
+        maxDist: int = self.MaxDistance(m_len, minSimilarity)
+        if maxDist < 0:
+            return None
+        dist = self.Distance(w1, w2, maxDist)
+        if dist > maxDist:
+            return None
+        return 1 - dist / m_len
+
+    @staticmethod
+    def MaxDistance(m_len: int, minSimilarity: float) -> int:
+        """
+        The largest distance whose normalized similarity (1 - d/m_len) is still >= minSimilarity. Returns -1 if even 0 is not enough.
+        Evaluated with the same float expression as WordSimilarity so that borderline pairs are decided the same way.
+        """
+        k: int = min(m_len, int((1 - minSimilarity) * m_len))
+        while k < m_len and 1 - (k + 1) / m_len >= minSimilarity:
+            k += 1
+        while k >= 0 and 1 - k / m_len < minSimilarity:
+            k -= 1
+        return k
+
+    def Distance(self, s0: str, s1: str, maxDist: int = None):
+        """
+        :param maxDist: If given, only the diagonal band of width 2*maxDist+1 is computed and the calculation stops as soon as a whole row exceeds maxDist.
+        In that case any value greater than maxDist (maxDist+1) is returned instead of the exact distance.
+        """
         if s0 is None:
             raise TypeError("Argument s0 is NoneType.")
         if s1 is None:
@@ -34,6 +141,8 @@ class EditDistance(IWordSimilarity, IMetric):
             return len(s1)
         if len(s1) == 0:
             return len(s1)
+        if maxDist is not None:
+            return self._BandedDistance(s0, s1, maxDist)
 
         v0 = [0] * (len(s1) + 1)
         v1 = [0] * (len(s1) + 1)
@@ -52,12 +161,93 @@ class EditDistance(IWordSimilarity, IMetric):
 
         return v0[len(s1)]
 
+    def _BandedDistance(self, s0: str, s1: str, maxDist: int):
+        """
+        Ukkonen's cut-off: cells farther than maxDist from the diagonal can only hold values above maxDist, so they are never computed.
+        Row minimums never decrease, which allows the early abandon.
+        """
+        len0 = len(s0)
+        len1 = len(s1)
+        over = maxDist + 1      # Every value above maxDist is capped here.
+        if abs(len0 - len1) > maxDist:
+            return over
+
+        v0 = [over] * (len1 + 1)
+        v1 = [over] * (len1 + 1)
+        for j in range(min(len1, maxDist) + 1):
+            v0[j] = j
+
+        for i in range(1, len0 + 1):
+            lo = i - maxDist if i > maxDist else 1
+            hi = i + maxDist if i + maxDist < len1 else len1
+            v1[0] = i if i <= maxDist else over
+            if lo > 1:
+                v1[lo - 1] = over       # Left edge of the band; the buffer holds a stale value from two rows before.
+            if hi < len1:
+                v1[hi + 1] = over       # Right edge of the band.
+            rowMin = v1[0] if lo == 1 else over
+            c0 = s0[i - 1]
+            for j in range(lo, hi + 1):
+                cost = 0 if c0 == s1[j - 1] else 1
+                v = min(v1[j - 1] + 1, v0[j] + 1, v0[j - 1] + cost)
+                if v > over:
+                    v = over
+                v1[j] = v
+                if v < rowMin:
+                    rowMin = v
+            if rowMin > maxDist:
+                return over     # Early abandon: the final distance cannot get below the row minimum.
+            v0, v1 = v1, v0
+
+        return v0[len1] if v0[len1] <= maxDist else over
+
     def __str__(self) -> str:
         return "nedit"
 
     def IsMetric(self):
         return None  # It includes both versions, so I cannot answer. IsMetric() is not a good question at the class level. The normalized version is not a metric.
 
+
+class EditDistanceTest(TestCase):
+
+    def test_Distance_Banded_SameAsFullWithinBand(self):
+        edit = EditDistance()
+        rnd = random.Random(7)
+        for _ in range(2000):
+            s0 = "".join(rnd.choice("abc") for _ in range(rnd.randint(1, 9)))
+            s1 = "".join(rnd.choice("abc") for _ in range(rnd.randint(1, 9)))
+            full = edit.Distance(s0, s1)
+            for maxDist in range(0, 10):
+                banded = edit.Distance(s0, s1, maxDist)
+                if full <= maxDist:
+                    self.assertEqual(full, banded, s0 + "-" + s1)
+                else:
+                    self.assertEqual(maxDist + 1, banded, s0 + "-" + s1)
+
+    def test_WordSimilarityAtLeast_SameDecisionsAsWordSimilarity(self):
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        edit = EditDistance()
+        for w1 in CandidatePairTestPool.Words:
+            for w2 in CandidatePairTestPool.Words:
+                for minSim in [0.0, 0.5, 0.75, 0.8, 1.0]:
+                    sim = edit.WordSimilarity(w1, w2)
+                    self.assertEqual(sim if sim >= minSim else None, edit.WordSimilarityAtLeast(w1, w2, minSim))
+
+    def test_WordSimilarityBatch_SameAsWordSimilarity(self):
+        edit = EditDistance()
+        rnd = random.Random(5)
+        candidates = ["".join(rnd.choice("abcç") for _ in range(rnd.randint(0, 11))) for _ in range(400)]
+        for word in ["", "a", "abcab", "çaçbacab", "bbbbbbbbbbbbbb"]:
+            actual = edit.WordSimilarityBatch(word, candidates).tolist()
+            self.assertEqual([edit.WordSimilarity(word, c) for c in candidates], actual, word)
+        self.assertEqual((0, 2), edit.WordSimilarityMatrix([], ["a", "b"]).shape)
+
+    def test_MaxDistance(self):
+        self.assertEqual(5, EditDistance.MaxDistance(10, 0.5))
+        self.assertEqual(2, EditDistance.MaxDistance(9, 0.75))
+        self.assertEqual(0, EditDistance.MaxDistance(7, 1.0))
+
+
 if __name__ == "__main__":
 
     def CalculateEditDistances(wps: List[WordPair]):
@@ -1,6 +1,8 @@
 # coding=utf-8
 from abc import abstractmethod
-from typing import Optional, Set
+from typing import Optional, Set, Dict, List, Tuple
+
+import numpy
 
 from src.Core.Dataset.DiscreteScale import DiscreteScale
 from src.Core.Orthographic.IStringDistance import INormalizedStringDistance
@@ -13,6 +15,8 @@ class OverlappingMeasureBase(IWordSimilarity, INormalizedStringDistance):
     def __init__(self,gramExtractor:IGramExtractor) -> None:
         super().__init__()
         self.GramExtractor= gramExtractor
+        self._GramIds: Dict[str, int] = {}                  # Vocabulary of all grams seen by WordSimilarityBatch.
+        self._WordGramIds: Dict[str, numpy.ndarray] = {}    # word -> ids of its distinct grams. Stage 2 passes every pool word many times as a candidate.
 
     def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
         grams1 = self.GramExtractor.ExtractGrams(w1)
@@ -25,6 +29,46 @@ class OverlappingMeasureBase(IWordSimilarity, INormalizedStringDistance):
     def SimilarityScale(self) -> DiscreteScale:
         return DiscreteScale(0,1)
 
+    def _GetGramIds(self, word: str) -> numpy.ndarray:
+        ids = self._WordGramIds.get(word)
+        if ids is None:
+            ids = numpy.array([self._GramIds.setdefault(g, len(self._GramIds)) for g in self.GramExtractor.ExtractGrams(word)], dtype=numpy.int64)
+            self._WordGramIds[word] = ids
+        return ids
+
+    def WordSimilarityBatch(self, word: str, candidates: List[str]) -> numpy.ndarray:
+        """
+        Same values as WordSimilarity. Candidate grams are concatenated into one id array, and the intersection counts come from a single membership test.
+        """
+        return self.MeasureOverlapBatch(*self.OverlapCountsBatch(word, candidates))
+
+    def OverlapCountsBatch(self, word: str, candidates: List[str]) -> Tuple[numpy.ndarray, int, numpy.ndarray]:
+        """
+        The gram counts all overlap measures are computed from, so the measures of the same gram extraction can share them (see CompositeOrthographicSimilarity).
+        :return: Distinct grams shared with each candidate, distinct grams of word, distinct grams of each candidate.
+        """
+        ids1 = self._GetGramIds(word)
+        candidateIds = [self._GetGramIds(c) for c in candidates]
+        len2 = numpy.fromiter((len(ids) for ids in candidateIds), dtype=numpy.int64, count=len(candidates))
+        if len(candidates) == 0:
+            return numpy.empty(0, dtype=numpy.int64), len(ids1), len2
+        shared = numpy.concatenate([[0], numpy.cumsum(numpy.isin(numpy.concatenate(candidateIds), ids1))])
+        ends = numpy.cumsum(len2)
+        return shared[ends] - shared[ends - len2], len(ids1), len2
+
+    def MeasureOverlapBatch(self, inter: numpy.ndarray, len1: int, len2: numpy.ndarray) -> numpy.ndarray:
+        """
+        :return: The similarities of OverlapCountsBatch counts. 0 if one of the words has no grams, as in WordSimilarity.
+        """
+        sims = numpy.zeros(len(len2), dtype=numpy.float64)
+        if len1 > 0:
+            valid = len2 > 0
+            sims[valid] = self._MeasureOverlapBatchImpl(inter[valid], len1, len2[valid])
+        return sims
+
+    def IsBatchVectorized(self) -> bool:
+        return True
+
     def __repr__(self) -> str:
         return self.__str__()
 
@@ -54,6 +98,13 @@ class OverlappingMeasureBase(IWordSimilarity, INormalizedStringDistance):
     def _MeasureOverlapImpl(self, grams1:Set[str],grams2:Set[str])-> Optional[float]:
         pass
 
+    @abstractmethod
+    def _MeasureOverlapBatchImpl(self, inter: numpy.ndarray, len1: int, len2: numpy.ndarray) -> numpy.ndarray:
+        """
+        Vectorized _MeasureOverlapImpl over the intersection counts and the gram counts of the candidates. Both sides have at least one gram.
+        """
+        pass
+
     @abstractmethod
     def MeasureName(self)->str:
         pass
@@ -67,6 +118,9 @@ class Dice(OverlappingMeasureBase):
         inter = self.IntersectionCount(grams1,grams2,union)
         return 2.0 * inter / (len(grams1) + len(grams2))
 
+    def _MeasureOverlapBatchImpl(self, inter: numpy.ndarray, len1: int, len2: numpy.ndarray) -> numpy.ndarray:
+        return 2.0 * inter / (len1 + len2)
+
     def MeasureName(self) -> str:
         return "dice"
 
@@ -77,6 +131,9 @@ class Jaccard(OverlappingMeasureBase):
         inter = self.IntersectionCount(grams1,grams2,union)
         return inter / len(union)
 
+    def _MeasureOverlapBatchImpl(self, inter: numpy.ndarray, len1: int, len2: numpy.ndarray) -> numpy.ndarray:
+        return inter / (len1 + len2 - inter)
+
     def MeasureName(self) -> str:
         return "jacc"
 
@@ -88,5 +145,8 @@ class OverlapCoefficient(OverlappingMeasureBase):
         inter = self.IntersectionCount(grams1,grams2,union)
         return inter / min(len(grams1),len(grams2))
 
+    def _MeasureOverlapBatchImpl(self, inter: numpy.ndarray, len1: int, len2: numpy.ndarray) -> numpy.ndarray:
+        return inter / numpy.minimum(len1, len2)
+
     def MeasureName(self) -> str:
         return "over"
@@ -47,6 +47,15 @@ class OverlappingMeasuresTests(TestCase):
     def test_AnyMeasure_WordSimilarity_WithNgramAsExtractor_DistinctGrams_Half(self):
         self.assertEqual(1,OverlapCoefficient(Ngram(2)).WordSimilarity("go","gogo"))
 
+    #Batch
+    def test_AnyMeasure_WordSimilarityBatch_SameAsWordSimilarity(self):
+        candidates = ["gokhan", "gokhangokhan", "ercan", "a", "", "hango", "kahn", "gogo"]
+        for measure in [Dice(Ngram(2)), Jaccard(Ngram(2)), OverlapCoefficient(Ngram(2)), Jaccard(Ngram(3))]:
+            for word in ["gokhan", "go", "a", ""]:
+                expected = [measure.WordSimilarity(word, c) for c in candidates]
+                self.assertEqual(expected, measure.WordSimilarityBatch(word, candidates).tolist(), str(measure) + ":" + word)
+            self.assertEqual((0,), measure.WordSimilarityBatch("gokhan", []).shape)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,209 @@
+# coding=utf-8
+import multiprocessing
+import unittest
+from typing import List, Tuple, Iterator, Callable, Optional
+from unittest import TestCase
+
+from src.Core.Orthographic.CandidateGeneration.CandidateGeneratorFactory import CandidateGeneratorFactory, CandidateStrategies
+from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import ICandidatePairGenerator, CandidatePairTestPool
+from src.Core.Orthographic.CandidateGeneration.MinHashLSHCandidateGenerator import MinHashLSHSettings
+from src.Core.WordPair import WordPair, SlottedWordPair
+from src.Core.WordPairSynthesizer import WordPairSynthesizer
+from src.Core.WordSim.IThresholdedWordSimilarity import IThresholdedWordSimilarity
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+from src.Tools.Progressor import Progressor
+
+
+def TriangularChunks(n: int, chunkCount: int, startRow: int = 0) -> List[Tuple[int, int]]:
+    """
+    Splits the rows [startRow, n) of the upper-triangular pair space into contiguous row ranges with roughly equal pair counts.
+    Row i has n-1-i pairs, so the first chunks get fewer rows than the last ones.
+    :return: [(startRow, endRow)] ranges, endRow excluded.
+    """
+    return [ranges[0] for ranges in BalancedChunks(n, [(startRow, n)], chunkCount)]
+
+
+def BalancedChunks(n: int, rowRanges: List[Tuple[int, int]], chunkCount: int) -> List[List[Tuple[int, int]]]:
+    """
+    Splits the rows of the row ranges, in their order (see Stage2RowOrder), into chunks with roughly equal pair counts.
+    Ranges are cut or merged where needed: a shuffled order puts the long rows of the start of the pool anywhere, so one chunk per range would not balance the workers.
+    :return: [[(startRow, endRow)]] row ranges of each chunk, in the order of the given ranges.
+    """
+    total: int = sum(n - 1 - i for startRow, endRow in rowRanges for i in range(startRow, endRow))
+    target: float = total / max(1, chunkCount)
+    chunks: List[List[Tuple[int, int]]] = []
+    chunk: List[Tuple[int, int]] = []
+    accumulated: int = 0
+    for startRow, endRow in rowRanges:
+        pieceStart: int = startRow
+        for i in range(startRow, endRow):
+            accumulated += n - 1 - i
+            if accumulated >= target * (len(chunks) + 1) and len(chunks) < chunkCount - 1:
+                chunk.append((pieceStart, i + 1))
+                chunks.append(chunk)
+                chunk = []
+                pieceStart = i + 1
+        if pieceStart < endRow:
+            chunk.append((pieceStart, endRow))
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+#region Worker process state
+# Set once per worker by _InitWorker. With the fork start method the sorted pool and the prepared candidate generator are inherited from the parent instead of being pickled.
+_WorkerWords: List[str] = None
+_WorkerSim: IWordSimilarity = None
+_WorkerMinSimilarity: float = None
+_WorkerGenerator: Optional[ICandidatePairGenerator] = None
+
+
+def _InitWorker(sortedWords: List[str], orthographicSim: IWordSimilarity, minSimilarity: float, candidateGenerator: Optional[ICandidatePairGenerator]):
+    global _WorkerWords, _WorkerSim, _WorkerMinSimilarity, _WorkerGenerator
+    _WorkerWords = sortedWords
+    _WorkerSim = orthographicSim
+    _WorkerMinSimilarity = minSimilarity
+    _WorkerGenerator = candidateGenerator
+
+
+def _ScoreChunk(rowRanges: List[Tuple[int, int]]) -> Tuple[List[Tuple[str, str, float]], int]:
+    """
+    :return: (word1, word2, similarity) of the pairs above the minimum similarity, range by range in the exhaustive order, and the number of pairs scored.
+    """
+    detections: List[Tuple[str, str, float]] = []
+    scored: int = 0
+    for startRow, endRow in rowRanges:
+        rangeDetections, rangeScored = _ScoreRows(startRow, endRow)
+        detections.extend(rangeDetections)
+        scored += rangeScored
+    return detections, scored
+
+
+def _ScoreRows(startRow: int, endRow: int) -> Tuple[List[Tuple[str, str, float]], int]:
+    """
+    :return: (word1, word2, similarity) of the pairs above the minimum similarity of the rows [startRow, endRow) in the exhaustive order, and the number of pairs scored.
+    """
+    if _WorkerGenerator is None:
+        synthesizer = WordPairSynthesizer()
+        scoredRows = synthesizer.GenerateScoredPairsByRows if _WorkerSim.IsBatchVectorized() else synthesizer.GenerateScoredPairsByIndex
+        detections = [(wp.Word1, wp.Word2, wp.GetOtherSimilarity(str(_WorkerSim))) for wp in scoredRows(_WorkerWords, _WorkerSim, _WorkerMinSimilarity, startRow, endRow)]
+        return detections, sum(len(_WorkerWords) - 1 - i for i in range(startRow, endRow))
+    pairs = _WorkerGenerator.GenerateCandidatePairs(_WorkerWords, startRow, endRow)
+    scoredPairs: bool = _WorkerGenerator.ScoresPairs()
+    scoredBefore: int = _WorkerGenerator.ScoredPairs if scoredPairs else 0
+    thresholdedSim = _WorkerSim if isinstance(_WorkerSim, IThresholdedWordSimilarity) else None
+    simName: str = str(_WorkerSim)
+    detections: List[Tuple[str, str, float]] = []
+    scored: int = 0
+    for wp in pairs:
+        if scoredPairs:
+            sim = wp.GetOtherSimilarity(simName)
+        elif thresholdedSim is not None:
+            sim = thresholdedSim.WordSimilarityAtLeast(wp.Word1, wp.Word2, _WorkerMinSimilarity)
+        else:
+            sim = _WorkerSim.WordSimilarity(wp.Word1, wp.Word2)
+        if sim is not None and sim >= _WorkerMinSimilarity:
+            detections.append((wp.Word1, wp.Word2, sim))
+        scored += 1
+    if scoredPairs:  # The yielded pairs are only the detections, the generator counts the pairs it scored.
+        scored = _WorkerGenerator.ScoredPairs - scoredBefore
+    return detections, scored
+#endregion
+
+
+class ParallelPairScorer(object):
+    """
+    Runs Stage 2 over a process pool. The rows to score are split into chunks of roughly equal pair count (see BalancedChunks),
+    and the detections come back chunk by chunk in the row order, so the output is the same as the single-process run.
+    The candidate generator is created and prepared (see ICandidatePairGenerator.Prepare) once, before the pool.
+    Workers are fork-started where the platform supports it (not on Windows), so the sorted pool, the similarity and the generator index are shared instead of pickled or rebuilt.
+    """
+
+    def __init__(self, workers: int, chunksPerWorker: int = 8) -> None:
+        """
+        :param chunksPerWorker: More chunks than workers keep all workers busy until the end, and make the progress and snapshots more frequent.
+        """
+        super().__init__()
+        self.Workers: int = workers
+        self.ChunksPerWorker: int = chunksPerWorker
+        self.ScoredPairs: int = 0
+
+    def GenerateScoredPairs(self, sortedWords: List[str], orthographicSim: IWordSimilarity, minSimilarity: float, candidateStrategy: CandidateStrategies = None,
+                            startRow: int = 0, chunkCallback: Callable[[float], None] = None, lshSettings: MinHashLSHSettings = None,
+                            rowRanges: List[Tuple[int, int]] = None) -> Iterator[WordPair]:
+        """
+        Yields only the pairs above minSimilarity, with the similarity set under the name of orthographicSim.
+        :param startRow: Rows before it are skipped. Used to resume.
+        :param rowRanges: [(startRow, endRow)] ranges to score in this order instead of the rows from startRow on (see Stage2RowOrder). They are rechunked by pair count.
+        :param chunkCallback: Called with the completed percentage after all detections of a chunk are consumed by the caller.
+        :param lshSettings: Only for CandidateStrategies.MinHashLSH.
+        """
+        simName: str = str(orthographicSim)
+        n: int = len(sortedWords)
+        chunks = BalancedChunks(n, rowRanges if rowRanges is not None else [(startRow, n)], self.Workers * self.ChunksPerWorker)
+        totalPairs: int = sum(n - 1 - i for chunk in chunks for startOfRange, endOfRange in chunk for i in range(startOfRange, endOfRange))
+        candidateGenerator = CandidateGeneratorFactory(orthographicSim, minSimilarity, lshSettings).CreateCandidateGenerator(candidateStrategy)
+        if candidateGenerator:
+            candidateGenerator.Prepare(sortedWords)   # Before the fork, so the workers inherit the index.
+        context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+        prog = Progressor(reportRemaniningTime=True, expectedIteration=len(chunks))
+        self.ScoredPairs = candidateGenerator.ScoredPairs if candidateGenerator and candidateGenerator.ScoresPairs() else 0   # Joins that score while preparing.
+        donePairs: int = 0
+        with context.Pool(self.Workers, initializer=_InitWorker, initargs=(sortedWords, orthographicSim, minSimilarity, candidateGenerator)) as pool:
+            for c, (detections, scored) in enumerate(pool.imap(_ScoreChunk, chunks, chunksize=1)):  # imap keeps the chunk order.
+                for w1, w2, sim in detections:
+                    wp = SlottedWordPair(w1, w2)
+                    wp.SetOtherSimilarity(simName, sim)
+                    yield wp
+                self.ScoredPairs += scored
+                donePairs += sum(n - 1 - i for startOfRange, endOfRange in chunks[c] for i in range(startOfRange, endOfRange))
+                prog.logpif(c + 1, iterstr="chunk-" + sortedWords[chunks[c][0][0]][0], progressBatchSize=1, anyMode=True)
+                if chunkCallback:
+                    chunkCallback(100 * donePairs / totalPairs if totalPairs else 100.0)
+
+
+class ParallelPairScorerTest(TestCase):
+    Words = CandidatePairTestPool.Words
+
+    def test_TriangularChunks_BalancedAndComplete(self):
+        n = 1000
+        chunks = TriangularChunks(n, 8)
+        self.assertEqual(8, len(chunks))
+        self.assertEqual(0, chunks[0][0])
+        self.assertEqual(n, chunks[-1][1])
+        for (s1, e1), (s2, e2) in zip(chunks, chunks[1:]):
+            self.assertEqual(e1, s2)
+        counts = [sum(n - 1 - i for i in range(s, e)) for s, e in chunks]
+        self.assertLess(max(counts) - min(counts), n)  # Within a single row.
+        resumed = TriangularChunks(5, 4, 3)
+        self.assertEqual((3, 5), (resumed[0][0], resumed[-1][1]))
+
+    def test_BalancedChunks_ShuffledRangesBalancedByPairs(self):
+        from src.Core.Stage2RowOrder import Stage2RowOrder
+        n = 1000
+        rowRanges = Stage2RowOrder(n, seed=3, blocks=10).Ranges()
+        chunks = BalancedChunks(n, rowRanges, 8)
+        self.assertEqual(8, len(chunks))
+        self.assertEqual([i for startRow, endRow in rowRanges for i in range(startRow, endRow)],
+                         [i for chunk in chunks for startRow, endRow in chunk for i in range(startRow, endRow)])  # Same rows in the same order.
+        counts = [sum(n - 1 - i for startRow, endRow in chunk for i in range(startRow, endRow)) for chunk in chunks]
+        self.assertLess(max(counts) - min(counts), n)  # Within a single row, although the blocks have 10x different pair counts.
+
+    def test_GenerateScoredPairs_SameAsSingleProcess(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        edit = EditDistance()
+        expected = CandidatePairTestPool.ExhaustiveDetections(edit, 0.5)
+        n = len(self.Words)
+        for strategy in [CandidateStrategies.Exhaustive, CandidateStrategies.Auto, CandidateStrategies.Trie]:
+            target = ParallelPairScorer(2, chunksPerWorker=3)
+            self.assertEqual(expected, CandidatePairTestPool.Detections(target.GenerateScoredPairs(self.Words, edit, 0.5, strategy), edit))
+            if strategy == CandidateStrategies.Exhaustive:
+                self.assertEqual(n * (n - 1) // 2, target.ScoredPairs)
+            else:
+                self.assertGreater(target.ScoredPairs, len(expected))   # Pairs scored, not the detections.
+            shuffled = sorted(target.GenerateScoredPairs(self.Words, edit, 0.5, strategy, rowRanges=[(10, n), (0, 4), (4, 10)]), key=lambda wp: wp.ToKey())
+            self.assertEqual(sorted(expected), CandidatePairTestPool.Detections(shuffled, edit))
+
+
+if __name__ == '__main__':
+    unittest.main()
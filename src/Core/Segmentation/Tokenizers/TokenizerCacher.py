@@ -4,18 +4,23 @@ from unittest import TestCase
 from src.Core.Morphology.RootDetection.RootDetectorCacher import ICacher
 from src.Core.Segmentation.Tokenizers.ITokenizer import ITokenizer
 from src.Core.Segmentation.Tokenizers.NLTKWhitespaceTokenizer import NLTKWhitespaceTokenizer
+from src.Core.Vocabulary import Vocabulary
 
 
 class TokenizerCacher(ITokenizer, ICacher):
 
-    def __init__(self, tokenizer: ITokenizer) -> None:
+    def __init__(self, tokenizer: ITokenizer, vocabulary: Vocabulary = None) -> None:
+        """
+        :param vocabulary: The tokens are interned in it, so the definition tokens share the ids and strings of the words. Default (None): A vocabulary of this cache only.
+        """
         self.Tokenizer: ITokenizer = tokenizer
+        self.Vocabulary: Vocabulary = vocabulary if vocabulary is not None else Vocabulary()
         self._Cache: Dict[str, List[str]] = {}  # word, tokens
 
     def Tokenize(self, text: str) -> 'Iterable[str]':
         cached = self._Cache.get(text)
         if cached is None:
-            cached = self.Tokenizer.Tokenize(text)
+            cached = [self.Vocabulary.Intern(token) for token in self.Tokenizer.Tokenize(text)]
             self._Cache[text] = cached
         return cached
 
@@ -35,6 +40,7 @@ class NLTKWhitespaceTokenizerTest(TestCase):
         self.assertEqual("ali", target.Tokenize("ali ")[0])                 # test if the cacher mixes two cache keys
         self.assertEqual("gokhan", target.Tokenize("gokhan  ercan")[0])     # check if it retrieves this value from the cache
         self.assertEqual(2, target.CachedItemCount())
+        self.assertIn("ercan", target.Vocabulary)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+# coding=utf-8
+import json
+import os
+import queue
+import tempfile
+import threading
+import unittest
+from typing import Dict, Optional, List, Union
+from unittest import TestCase
+
+from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.Stage2RowOrder import Stage2RowOrder
+from src.Core.WordPair import SlottedWordPair
+from src.Core.WordSim.WordSimDataset import WordSimDataset
+from src.Tools.Logger import logp
+
+
+class Stage2Checkpoint(object):
+    """
+    Manifest of a Stage 2 session, rewritten at every snapshot next to the Q3/Q4 files of the session, which are only appended to (see Stage2OutputWriter).
+    Row is the position of the first row that is not complete in the row order of the session (see Stage2RowOrder), which is the row of the sorted pool in the sorted order:
+    up to their offsets, the files hold all the detections of the rows visited before it and nothing else.
+    A resumed session truncates the files to the offsets and continues from Row, without enumerating the pairs of the earlier rows.
+    """
+    ScoreStoreKey = "Scores"    # Output key of the Stage2ScoreStore, the only output that is not a dataset.
+
+    def __init__(self, directory: str, sessionId: str, orthographicSimName: str, outputNames: Dict[str, str], poolSize: int, minSimilarities: Dict[str, float],
+                 rowOrder: Stage2RowOrder = None) -> None:
+        """
+        :param outputNames: Output key (Q3, Q4), dataset name without the session id (e.g. S2-OrthographicallySimilarsQ3-nedit).
+        :param minSimilarities: Output key, threshold of the output. A session can only be resumed with the same thresholds, pool size and row order.
+        :param rowOrder: Default (None): The sorted order.
+        """
+        super().__init__()
+        self.Directory: str = directory
+        self.SessionId: str = sessionId
+        self.OrthographicSim: str = orthographicSimName
+        self.OutputNames: Dict[str, str] = outputNames
+        self.PoolSize: int = poolSize
+        self.MinSimilarities: Dict[str, float] = minSimilarities
+        self.RowOrder: Stage2RowOrder = rowOrder if rowOrder is not None else Stage2RowOrder(poolSize)
+        self.Row: int = 0                   # Position of the first row that is not complete.
+        self.Pairs: int = 0                 # Pairs consumed by Stage 2 before Row.
+        self.Counts: Dict[str, int] = {key: 0 for key in outputNames}    # Output key, detections before Row.
+        self.Offsets: Dict[str, int] = {key: 0 for key in outputNames}   # Output key, file size in bytes at Row.
+
+    @staticmethod
+    def SessionFilePath(directory: str, name: str, sessionId: str, extension: str = "csv") -> str:
+        """
+        Same naming as the Stage 2 snapshots: {name}-{sessionId}.{extension}
+        """
+        return os.path.join(directory, name + "-" + sessionId + "." + extension)
+
+    @staticmethod
+    def ManifestPath(directory: str, orthographicSimName: str, sessionId: str) -> str:
+        return Stage2Checkpoint.SessionFilePath(directory, "S2-Checkpoint-" + orthographicSimName.lower(), sessionId, "json")
+
+    def OutputPath(self, key: str) -> str:
+        return Stage2Checkpoint.SessionFilePath(self.Directory, self.OutputNames[key], self.SessionId, "bin" if key == Stage2Checkpoint.ScoreStoreKey else "csv")
+
+    def Save(self):
+        """
+        Replaces the manifest atomically, so a crash leaves either the previous or the new checkpoint.
+        """
+        path = Stage2Checkpoint.ManifestPath(self.Directory, self.OrthographicSim, self.SessionId)
+        manifest = {"SessionId": self.SessionId, "OrthographicSim": self.OrthographicSim, "PoolSize": self.PoolSize, "RowOrder": self.RowOrder.ToManifest(), "Row": self.Row, "Pairs": self.Pairs,
+                    "Outputs": {key: {"Name": self.OutputNames[key], "MinSimilarity": self.MinSimilarities[key], "Count": self.Counts[key], "Offset": self.Offsets[key]}
+                                for key in self.OutputNames}}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def Load(directory: str, orthographicSimName: str, sessionId: str) -> Optional['Stage2Checkpoint']:
+        """
+        :return: None if the session has no manifest (e.g. it was saved by full snapshots).
+        """
+        path = Stage2Checkpoint.ManifestPath(directory, orthographicSimName, sessionId)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        outputs = manifest["Outputs"]
+        checkpoint = Stage2Checkpoint(directory, manifest["SessionId"], manifest["OrthographicSim"], {key: o["Name"] for key, o in outputs.items()},
+                                      manifest["PoolSize"], {key: o["MinSimilarity"] for key, o in outputs.items()},
+                                      Stage2RowOrder.FromManifest(manifest["PoolSize"], manifest.get("RowOrder")))
+        checkpoint.Row = manifest["Row"]
+        checkpoint.Pairs = manifest["Pairs"]
+        checkpoint.Counts = {key: o["Count"] for key, o in outputs.items()}
+        checkpoint.Offsets = {key: o["Offset"] for key, o in outputs.items()}
+        return checkpoint
+
+    def ResumeAs(self, sessionId: str, poolSize: int, minSimilarities: Dict[str, float], rowOrder: Stage2RowOrder = None):
+        """
+        Moves the files of the session to the new session id and truncates them to the checkpoint. Nothing is copied or rewritten.
+        :param rowOrder: Default (None): The sorted order.
+        """
+        if poolSize != self.PoolSize or minSimilarities != self.MinSimilarities:
+            raise Exception("Stage 2 session " + self.SessionId + " was run for " + str(self.PoolSize) + " words and the thresholds " + str(self.MinSimilarities)
+                            + ", cannot resume it for " + str(poolSize) + " words and " + str(minSimilarities) + ".")
+        rowOrderManifest = (rowOrder if rowOrder is not None else Stage2RowOrder(poolSize)).ToManifest()
+        if rowOrderManifest != self.RowOrder.ToManifest():
+            raise Exception("Stage 2 session " + self.SessionId + " visits the rows in the order " + str(self.RowOrder.ToManifest()) + ", cannot resume it in the order " + str(rowOrderManifest) + ".")
+        oldManifest = Stage2Checkpoint.ManifestPath(self.Directory, self.OrthographicSim, self.SessionId)
+        oldPaths = {key: self.OutputPath(key) for key in self.OutputNames}
+        for key, oldPath in oldPaths.items():
+            if os.path.getsize(oldPath) < self.Offsets[key]:
+                raise Exception("'" + oldPath + "' is shorter than its checkpoint offset " + str(self.Offsets[key]) + ".")
+        moved: bool = sessionId != self.SessionId
+        self.SessionId = sessionId
+        for key, oldPath in oldPaths.items():
+            if moved: os.replace(oldPath, self.OutputPath(key))
+            os.truncate(self.OutputPath(key), self.Offsets[key])    # Drops the detections of the incomplete row.
+        self.Save()
+        if moved: os.remove(oldManifest)
+        logp("Stage 2 continues in session " + sessionId + " from row " + str(self.Row) + " of " + str(self.PoolSize) + ". Detections so far: " + str(self.Counts) + ".", anyMode=True)
+
+
+class Stage2OutputWriter(object):
+    """
+    Single background thread that appends the Stage 2 detections to the files of a Stage2Checkpoint and saves the checkpoints, fed by a bounded queue.
+    Stage 2 hands over each detection once it is found and never shares its tables with the thread. A full queue makes Stage 2 wait for the disk.
+    The files are written in binary, so the offsets in the manifest are byte positions that can be truncated to.
+    """
+    _Stop = None
+
+    def __init__(self, checkpoint: Stage2Checkpoint, simAttrs: Union[List[str], Dict[str, List[str]]], scale: DiscreteScale = None, maxQueued: int = 10000,
+                 headers: Dict[str, bytes] = None) -> None:
+        """
+        :param simAttrs: Other similarity columns of the files (e.g. neditSimilarity), or the columns of each output key when the files have different measures.
+        :param maxQueued: Detections and checkpoints that can wait for the thread.
+        :param headers: Output key, header of the outputs that are not datasets (e.g. the Stage2ScoreStore). They are written with AppendRecords.
+        """
+        super().__init__()
+        self.Checkpoint: Stage2Checkpoint = checkpoint
+        self.SimAttrs: Dict[str, List[str]] = simAttrs if isinstance(simAttrs, dict) else {key: simAttrs for key in checkpoint.OutputNames}
+        self._Written: Dict[str, int] = dict(checkpoint.Counts)   # Output key, detections in the file.
+        self._Files = {}
+        for key in checkpoint.OutputNames:
+            path = checkpoint.OutputPath(key)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._Files[key] = open(path, "ab")
+            if self._Files[key].tell() == 0 and headers and key in headers:
+                self._Files[key].write(headers[key])
+            elif self._Files[key].tell() == 0:  # Header first, as WordSimDataset.Persist writes it.
+                header = (WordSimDataset.ScaleHeader(scale) + "\n" if scale else "") + WordSimDataset.PersistHeader(self.SimAttrs[key]) + "\n"
+                self._Files[key].write(header.encode("utf-8", errors="ignore"))
+        self._Queue: queue.Queue = queue.Queue(maxQueued)
+        self._Error: Exception = None
+        self._Thread = threading.Thread(target=self._Run, name="Stage2OutputWriter")
+        self._Thread.daemon = True
+        self._Thread.start()
+
+    def _Run(self):
+        try:
+            while True:
+                item = self._Queue.get()
+                if item is Stage2OutputWriter._Stop:
+                    break
+                if item[0] == "pair":
+                    _, key, wp = item
+                    self._Files[key].write((WordSimDataset.PersistLine(wp, self.SimAttrs[key]) + "\n").encode("utf-8", errors="ignore"))
+                    self._Written[key] += 1
+                elif item[0] == "records":
+                    _, key, data, count = item
+                    self._Files[key].write(data)
+                    self._Written[key] += count
+                else:
+                    _, row, pairs = item
+                    self._SaveCheckpoint(row, pairs)
+        except Exception as e:
+            self._Error = e
+            while self._Queue.get() is not Stage2OutputWriter._Stop:  # Keeps Stage 2 from blocking on a full queue until Close raises the error.
+                pass
+        finally:
+            for f in self._Files.values():
+                f.close()
+
+    def _SaveCheckpoint(self, row: int, pairs: int):
+        for key, f in self._Files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            self.Checkpoint.Offsets[key] = f.tell()
+            self.Checkpoint.Counts[key] = self._Written[key]
+        self.Checkpoint.Row = row
+        self.Checkpoint.Pairs = pairs
+        self.Checkpoint.Save()
+
+    def _Put(self, item):
+        if self._Error is not None:
+            raise Exception("Stage 2 output writer stopped: " + str(self._Error))
+        self._Queue.put(item)
+
+    def Append(self, key: str, wp):
+        """
+        :param wp: A WordPair Stage 2 does not change after handing it over.
+        """
+        self._Put(("pair", key, wp))
+
+    def AppendRecords(self, key: str, data: bytes, count: int):
+        """
+        :param data: count binary records, written as they are.
+        """
+        self._Put(("records", key, data, count))
+
+    def SaveCheckpoint(self, row: int, pairs: int):
+        """
+        Saves the manifest once the detections handed over so far are synced to disk. They must be exactly the detections of the rows before row.
+        """
+        self._Put(("checkpoint", row, pairs))
+
+    def Close(self):
+        """
+        Writes the remaining detections without moving the checkpoint and waits for the thread.
+        """
+        self._Queue.put(Stage2OutputWriter._Stop)
+        self._Thread.join()
+        if self._Error is not None:
+            raise Exception("Stage 2 output writer stopped: " + str(self._Error))
+
+
+class Stage2CheckpointTest(TestCase):
+
+    @staticmethod
+    def _Pair(w1: str, w2: str, sim: float) -> SlottedWordPair:
+        wp = SlottedWordPair(w1, w2)
+        wp.SetOtherSimilarity("nedit", sim)
+        return wp
+
+    def test_WriterResumeAs_TruncatesToLastCheckpoint(self):
+        directory = tempfile.mkdtemp()
+        checkpoint = Stage2Checkpoint(directory, "AAAAA", "nedit", {"Q3": "S2-OrthographicallySimilarsQ3-nedit"}, 10, {"Q3": 0.5})
+        writer = Stage2OutputWriter(checkpoint, ["neditSimilarity"], DiscreteScale(0, 1), maxQueued=1)
+        writer.Append("Q3", Stage2CheckpointTest._Pair("action", "auction", 0.75))
+        writer.SaveCheckpoint(1, 9)
+        writer.Append("Q3", Stage2CheckpointTest._Pair("banana", "bandana", 0.5))  # Incomplete row 2
+        writer.Close()
+
+        loaded = Stage2Checkpoint.Load(directory, "nedit", "AAAAA")
+        self.assertEqual((1, 9, {"Q3": 1}), (loaded.Row, loaded.Pairs, loaded.Counts))
+        self.assertEqual(2, len(WordSimDataset(fullPath=loaded.OutputPath("Q3")).Load(autoLowerCase=False).Wordpairs))
+        with self.assertRaises(Exception):
+            loaded.ResumeAs("BBBBB", 11, {"Q3": 0.5})
+        with self.assertRaises(Exception):
+            loaded.ResumeAs("BBBBB", 10, {"Q3": 0.5}, Stage2RowOrder(10, seed=1))
+        loaded.ResumeAs("BBBBB", 10, {"Q3": 0.5})
+        self.assertIsNone(Stage2Checkpoint.Load(directory, "nedit", "AAAAA"))
+        resumed = WordSimDataset(fullPath=loaded.OutputPath("Q3")).Load(autoLowerCase=False)
+        self.assertEqual(["action-auction"], [wp.ToKey() for wp in resumed.Wordpairs])
+        self.assertEqual(0.75, resumed.Wordpairs[0].GetOtherSimilarity("nedit"))
+        self.assertEqual(1, resumed.Scale.Max)
+
+
+if __name__ == '__main__':
+    unittest.main()
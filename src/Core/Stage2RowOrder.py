@@ -0,0 +1,104 @@
+# coding=utf-8
+import math
+import random
+import unittest
+from typing import List, Tuple, Optional, Dict
+from unittest import TestCase
+
+
+class Stage2RowOrder(object):
+    """
+    Order in which Stage 2 visits the rows of the sorted pool. A row i holds the pairs (i, j) with j > i, so any order of the rows covers every pair once.
+    The sorted order visits row 0 to n-1. A shuffled order cuts the pool into contiguous blocks of rows and visits the blocks in a seeded random order,
+    so a Stage 2 stopped early (see the deadline of Stage 2) has scored every pair with the same probability instead of only the words starting with "a".
+    Inside a block the rows stay sorted, so the candidate generators still get row ranges; more blocks make a finer sample but generators that index the pool per call rebuild their index once per block.
+    Positions count the rows in the visiting order: the position of the first row that is not complete is the resume cursor of a Stage2Checkpoint. In the sorted order, the position is the row.
+    """
+
+    def __init__(self, poolSize: int, seed: int = None, blocks: int = 100) -> None:
+        """
+        :param seed: Seed of the block permutation. Default (None): The sorted order.
+        :param blocks: Number of blocks of the shuffled order.
+        """
+        super().__init__()
+        if (seed is not None and blocks < 1): raise Exception("A shuffled row order needs at least one block.")
+        self.PoolSize: int = poolSize
+        self.Seed: Optional[int] = seed
+        self.Blocks: int = 1 if seed is None else blocks
+        self.BlockRows: int = max(1, math.ceil(poolSize / self.Blocks))
+        self._Ranges: List[Tuple[int, int]] = [(start, min(start + self.BlockRows, poolSize)) for start in range(0, poolSize, self.BlockRows)]
+        if seed is not None:
+            random.Random(seed).shuffle(self._Ranges)
+        self._Positions: List[int] = [0] * len(self._Ranges)    # Block index in the pool, position of its first row.
+        position: int = 0
+        for startRow, endRow in self._Ranges:
+            self._Positions[startRow // self.BlockRows] = position
+            position += endRow - startRow
+
+    def IsSorted(self) -> bool:
+        return self.Seed is None
+
+    def Position(self, row: int) -> int:
+        """
+        :return: Number of rows visited before the row.
+        """
+        return self._Positions[row // self.BlockRows] + row % self.BlockRows
+
+    def Ranges(self, position: int = 0) -> List[Tuple[int, int]]:
+        """
+        :return: [(startRow, endRow)] row ranges of the pool, endRow excluded, that visit the rows from the position on in this order.
+        """
+        ranges: List[Tuple[int, int]] = []
+        visited: int = 0
+        for startRow, endRow in self._Ranges:
+            if visited + endRow - startRow > position:
+                ranges.append((startRow + max(0, position - visited), endRow))
+            visited += endRow - startRow
+        return ranges
+
+    @staticmethod
+    def PairsInRows(poolSize: int, startRow: int, endRow: int) -> int:
+        """
+        :return: Number of pairs of the upper triangle in the rows [startRow, endRow).
+        """
+        rows: int = endRow - startRow
+        return rows * (poolSize - 1) - (startRow + endRow - 1) * rows // 2
+
+    def ToManifest(self) -> Dict[str, int]:
+        return {"Seed": self.Seed, "Blocks": self.Blocks}
+
+    @staticmethod
+    def FromManifest(poolSize: int, manifest: Optional[Dict[str, int]]) -> 'Stage2RowOrder':
+        """
+        :param manifest: None for the manifests saved before the row orders, which are all sorted.
+        """
+        if not manifest:
+            return Stage2RowOrder(poolSize)
+        return Stage2RowOrder(poolSize, manifest["Seed"], manifest["Blocks"])
+
+
+class Stage2RowOrderTest(TestCase):
+
+    def test_Ranges_SortedOrderIsThePool(self):
+        target = Stage2RowOrder(10)
+        self.assertEqual([(0, 10)], target.Ranges())
+        self.assertEqual([(4, 10)], target.Ranges(4))
+        self.assertEqual([], target.Ranges(10))
+        self.assertEqual(7, target.Position(7))
+
+    def test_Ranges_ShuffledOrderVisitsEveryRowOnce(self):
+        target = Stage2RowOrder(10, seed=3, blocks=4)
+        rows = [row for startRow, endRow in target.Ranges() for row in range(startRow, endRow)]
+        self.assertEqual(list(range(10)), sorted(rows))
+        self.assertNotEqual(list(range(10)), rows)
+        self.assertEqual(list(range(10)), [target.Position(row) for row in rows])
+        self.assertEqual(rows[5:], [row for startRow, endRow in target.Ranges(5) for row in range(startRow, endRow)])
+        self.assertEqual(target.Ranges(), Stage2RowOrder.FromManifest(10, target.ToManifest()).Ranges())
+
+    def test_PairsInRows_UpperTriangle(self):
+        self.assertEqual(sum(10 - 1 - i for i in range(3, 7)), Stage2RowOrder.PairsInRows(10, 3, 7))
+        self.assertEqual(45, Stage2RowOrder.PairsInRows(10, 0, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# coding=utf-8
+import json
+import os
+import struct
+import tempfile
+import unittest
+from typing import List, Tuple
+from unittest import TestCase
+
+import numpy
+
+from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.WordPair import SlottedWordPair
+from src.Core.WordSim.WordSimDataset import WordSimDataset
+
+
+class Stage2ScoreStore(object):
+    """
+    Every pair Stage 2 scored at or above a floor threshold, kept as fixed-size binary records (row of word 1, row of word 2, score) over the sorted pool.
+    Stage 2 appends the records row by row (see Stage2OutputWriter), so a store written in the sorted row order is already sorted by pair, in the order of the Stage 2 outputs.
+    The Q3/Q4 datasets of any thresholds above the floor are then a mask over the scores (see Bucket and PersistBucket) instead of another Stage 2 run.
+    File: one JSON header line (measure, floor, pool), then the records.
+    """
+    RecordType = numpy.dtype([("Row1", "<i4"), ("Row2", "<i4"), ("Score", "<f8")])
+    Record = struct.Struct("<iid")  # Same layout as RecordType, for the records packed one by one.
+
+    def __init__(self, words: List[str], measureName: str, floor: float, records: numpy.ndarray) -> None:
+        super().__init__()
+        self.Words: List[str] = words
+        self.MeasureName: str = measureName
+        self.Floor: float = floor
+        self.Records: numpy.ndarray = records
+
+    @staticmethod
+    def Header(words: List[str], measureName: str, floor: float) -> bytes:
+        return (json.dumps({"Measure": measureName, "Floor": floor, "Words": words}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    @staticmethod
+    def Load(path: str) -> 'Stage2ScoreStore':
+        """
+        The records of a shuffled row order (or several sessions) are sorted by pair here.
+        """
+        with open(path, "rb") as f:
+            header = json.loads(f.readline().decode("utf-8"))
+            records = numpy.frombuffer(f.read(), dtype=Stage2ScoreStore.RecordType)
+        order = numpy.lexsort((records["Row2"], records["Row1"]))
+        if (numpy.any(order != numpy.arange(len(records)))):
+            records = records[order]
+        return Stage2ScoreStore(header["Words"], header["Measure"], header["Floor"], records)
+
+    def Bucket(self, minSimilarityQ3: float, minSimilarityQ4: float) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        :return: The records of Q3 (Q3 <= score < Q4) and of Q4 (score >= Q4), each in the order of the Stage 2 outputs.
+        """
+        if (minSimilarityQ3 < self.Floor): raise Exception("The store only has the pairs above " + str(self.Floor) + ", cannot bucket them for Q3=" + str(minSimilarityQ3) + ".")
+        if (minSimilarityQ3 >= minSimilarityQ4): raise Exception("Q3 cannot be greater than Q4.")
+        scores = self.Records["Score"]
+        return self.Records[(scores >= minSimilarityQ3) & (scores < minSimilarityQ4)], self.Records[scores >= minSimilarityQ4]
+
+    def PersistBucket(self, records: numpy.ndarray, path: str, scale: DiscreteScale = None) -> int:
+        """
+        Writes the records as a Stage 2 dataset, with the same lines as the Stage 2 files of the measure.
+        :return: Number of pairs written.
+        """
+        simAttrs: List[str] = [self.MeasureName.lower() + "Similarity"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8", errors="ignore") as f:
+            if scale:
+                f.write(WordSimDataset.ScaleHeader(scale) + "\n")
+            f.write(WordSimDataset.PersistHeader(simAttrs) + "\n")
+            for row1, row2, score in zip(records["Row1"].tolist(), records["Row2"].tolist(), records["Score"].tolist()):
+                wp = SlottedWordPair(self.Words[row1], self.Words[row2])
+                wp.SetOtherSimilarity(self.MeasureName, score)
+                f.write(WordSimDataset.PersistLine(wp, simAttrs) + "\n")
+        return len(records)
+
+
+class Stage2ScoreStoreTest(TestCase):
+
+    def test_Bucket_SplitsAtThresholdsInPairOrder(self):
+        words = ["action", "auction", "banana", "bandana"]
+        path = os.path.join(tempfile.mkdtemp(), "S2-ScoreStore-nedit-AAAAA.bin")
+        with open(path, "wb") as f:
+            f.write(Stage2ScoreStore.Header(words, "nedit", 0.3))
+            for record in [(2, 3, 0.875), (0, 1, 0.8571428571428572), (0, 2, 0.3333333333333333)]:     # Shuffled rows.
+                f.write(Stage2ScoreStore.Record.pack(*record))
+        target = Stage2ScoreStore.Load(path)
+        q3, q4 = target.Bucket(0.3, 0.85)
+        self.assertEqual([(0, 2)], [(r["Row1"], r["Row2"]) for r in q3])
+        self.assertEqual([(0, 1), (2, 3)], [(r["Row1"], r["Row2"]) for r in q4])
+        with self.assertRaises(Exception):
+            target.Bucket(0.2, 0.85)
+        self.assertEqual(2, target.PersistBucket(q4, path + ".csv", DiscreteScale(0, 1)))
+        ds = WordSimDataset(fullPath=path + ".csv").Load(autoLowerCase=False)
+        self.assertEqual(["action-auction", "banana-bandana"], [wp.ToKey() for wp in ds.Wordpairs])
+        self.assertEqual(0.875, ds.Wordpairs[1].GetOtherSimilarity("nedit"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# coding=utf-8
+import os
+import sys
+import tempfile
+import unittest
+from typing import List, Dict, Optional, Iterable
+from unittest import TestCase
+
+
+class Vocabulary(object):
+    """
+    Stable integer ids for the words of a study: the pool words and the roots and definition tokens derived from them.
+    Ids are given in the order the words are first seen, so interning the sorted pool first makes the id of a pool word its row in the pool.
+    The strings are interned (sys.intern), so a word is held once in memory however many pairs and caches refer to it,
+    and pairs and caches can be keyed on ints (see PairKey) instead of concatenated strings.
+    """
+    def __init__(self, words: Iterable[str] = None) -> None:
+        super().__init__()
+        self.Words: List[str] = []      # Id, word.
+        self._Ids: Dict[str, int] = {}  # Word, id.
+        if words:
+            self.Ids(words)
+
+    def Id(self, word: str) -> int:
+        """
+        :return: The id of the word, adding it if it is new.
+        """
+        wordId = self._Ids.get(word)
+        if wordId is None:
+            word = sys.intern(word)
+            wordId = self._Ids[word] = len(self.Words)
+            self.Words.append(word)
+        return wordId
+
+    def TryGetId(self, word: str) -> Optional[int]:
+        """
+        :return: None if the word is not in the vocabulary. Does not add it.
+        """
+        return self._Ids.get(word)
+
+    def Ids(self, words: Iterable[str]) -> List[int]:
+        return [self.Id(w) for w in words]
+
+    def Word(self, wordId: int) -> str:
+        return self.Words[wordId]
+
+    def Intern(self, word: str) -> str:
+        """
+        :return: The single string instance the vocabulary keeps for the word.
+        """
+        return self.Words[self.Id(word)]
+
+    @staticmethod
+    def OrderFreePairKey(id1: int, id2: int) -> int:
+        """
+        The int counterpart of WordPair.ToOrderFreeUniqueStr: the same key for (w1, w2) and (w2, w1).
+        """
+        return (id1 << 32) | id2 if id1 < id2 else (id2 << 32) | id1
+
+    def PairKey(self, w1: str, w2: str) -> int:
+        return Vocabulary.OrderFreePairKey(self.Id(w1), self.Id(w2))
+
+    def TryGetPairKey(self, w1: str, w2: str) -> Optional[int]:
+        """
+        :return: None if one of the words is not in the vocabulary, in which case no pair keyed with this vocabulary has it either.
+        """
+        id1 = self._Ids.get(w1)
+        id2 = self._Ids.get(w2)
+        if id1 is None or id2 is None:
+            return None
+        return Vocabulary.OrderFreePairKey(id1, id2)
+
+    def __len__(self) -> int:
+        return len(self.Words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._Ids
+
+    def Save(self, path: str):
+        """
+        One word per line; the line number (from 0) is the id.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding="utf-8") as f:
+            for w in self.Words:
+                f.write("%s\n" % w)
+
+    def Load(self, path: str) -> 'Vocabulary':
+        """
+        Adds the words of a saved vocabulary with their saved ids. Load before any other word is added; ids that cannot be kept raise.
+        """
+        with open(path, encoding="utf-8") as f:
+            for savedId, line in enumerate(f):
+                word = line.rstrip("\n")
+                if self.Id(word) != savedId:
+                    raise Exception("Vocabulary '" + path + "' cannot keep its ids: '" + word + "' is already " + str(self.Id(word)) + ", not " + str(savedId) + ".")
+        return self
+
+
+class VocabularyTest(TestCase):
+
+    def test_Id_StableInFirstSeenOrder(self):
+        target = Vocabulary(["ahmet", "ercan", "gokhan"])
+        self.assertEqual([0, 1, 2, 0], target.Ids(["ahmet", "ercan", "gokhan", "ahmet"]))
+        self.assertEqual("ercan", target.Word(1))
+        self.assertIsNone(target.TryGetId("mehmet"))
+        self.assertEqual(3, len(target))
+
+    def test_PairKey_OrderFree(self):
+        target = Vocabulary()
+        self.assertEqual(target.PairKey("gokhan", "ercan"), target.PairKey("ercan", "gokhan"))
+        self.assertNotEqual(target.PairKey("gokhan", "ercan"), target.PairKey("gokhan", "ahmet"))
+        self.assertEqual(target.PairKey("gokhan", "ercan"), target.TryGetPairKey("ercan", "gokhan"))
+        self.assertIsNone(target.TryGetPairKey("gokhan", "mehmet"))
+
+    def test_SaveLoad_SameIds(self):
+        target = Vocabulary(["gokhan", "ercan", "ahmet"])
+        path = os.path.join(tempfile.mkdtemp(), "S1-Vocabulary.txt")
+        target.Save(path)
+        loaded = Vocabulary().Load(path)
+        self.assertEqual(target.Words, loaded.Words)
+        self.assertEqual(target.Words, Vocabulary(["gokhan"]).Load(path).Words)   # Same prefix, same ids.
+        with self.assertRaises(Exception):
+            Vocabulary(["ercan"]).Load(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# coding=utf-8
+import random
+import unittest
+from typing import List, Optional, Tuple, Dict
+from unittest import TestCase
+
+from nltk.corpus.reader import Synset
+
+from src.Core.Morphology.POSTypes import POSTypes
+from src.Core.WordNet.CompiledWordNetTaxonomy import CompiledWordNetTaxonomy
+from src.Core.WordNet.IWordNet import WordNetSimilarityAlgorithms, Lemma2SynsetMatching
+from src.Core.WordNet.NLTKWordNetWrapper import NLTKWordNetWrapper
+from src.Tools import Resources
+
+
+class CompiledNLTKWordNetWrapper(NLTKWordNetWrapper):
+    """
+    NLTKWordNetWrapper whose PATH, LCH and WUP sense pairs are scored on a CompiledWordNetTaxonomy instead of NLTK, with the same values.
+    The senses still come from NLTK; LIN, JCN, RES and the UseFirstSense mode run on NLTK as before.
+    """
+    CompiledMethodNames: List[str] = ["path_similarity", "lch_similarity", "wup_similarity"]
+
+    def __init__(self, algorithm: WordNetSimilarityAlgorithms = WordNetSimilarityAlgorithms.WUP, l2s: Lemma2SynsetMatching = Lemma2SynsetMatching.HighestScoreOfCombinations,
+                 wordSimPOSFilters: List[POSTypes] = None, taxonomy: CompiledWordNetTaxonomy = None, taxonomyPath: str = None,
+                 senseCacheSize: int = 10000, scoreCacheSize: int = 100000, pruneSenses: bool = False,
+                 closedLCHScale: bool = False) -> None:
+        """
+        :param taxonomy: Default (None): Loaded from taxonomyPath on the first similarity call.
+        :param taxonomyPath: Default (None): Resources/Others/WordNetTaxonomy.npz. Compiled from NLTK WordNet if it does not exist yet.
+        """
+        super().__init__(algorithm, l2s, wordSimPOSFilters, senseCacheSize, scoreCacheSize, pruneSenses, closedLCHScale)
+        self._Taxonomy: CompiledWordNetTaxonomy = taxonomy
+        self.TaxonomyPath: str = taxonomyPath
+
+    @property
+    def Taxonomy(self) -> CompiledWordNetTaxonomy:
+        if self._Taxonomy is None:
+            self._Taxonomy = CompiledWordNetTaxonomy.LoadOrCompile(self.TaxonomyPath or Resources.GetOthersPath("WordNetTaxonomy.npz"))
+        return self._Taxonomy
+
+    def _SynsetSimilarity(self, methodName, syn1: Synset, syn2: Synset, informationContent=None) -> Optional[float]:
+        if methodName not in self.CompiledMethodNames:
+            return super()._SynsetSimilarity(methodName, syn1, syn2, informationContent)
+        taxonomy = self.Taxonomy
+        i1, i2 = taxonomy.Ids[syn1._name], taxonomy.Ids[syn2._name]
+        if methodName == "lch_similarity" and taxonomy.Poses[i1] != taxonomy.Poses[i2]:
+            return None     # NLTK raises, the wrapper returns None.
+        try:
+            if methodName == "path_similarity": return taxonomy.PathSimilarity(i1, i2)
+            if methodName == "lch_similarity": return taxonomy.LCHSimilarity(i1, i2)
+            return taxonomy.WUPSimilarity(i1, i2)
+        except Exception as ex:
+            print(ex)
+            return None
+
+    def _SynsetDepths(self, syn: Synset) -> Tuple[int, int]:
+        i = self.Taxonomy.Ids[syn._name]
+        return int(self.Taxonomy.MinDepths[i]), int(self.Taxonomy.MaxDepths[i])
+
+    def _LCHDepth(self, pos: str) -> int:
+        return self.Taxonomy.MaxDepthOfPos(pos)
+
+
+class CompiledNLTKWordNetWrapperTest(TestCase):
+
+    class _FakeSynset(object):
+        def __init__(self, name: str, pos: str) -> None:
+            self._name = name
+            self._pos = pos
+
+    class _FakeSensesWordNet(CompiledNLTKWordNetWrapper):
+        """
+        Words are random sense sets of a random taxonomy, instead of NLTK WordNet.
+        """
+        def __init__(self, taxonomy: CompiledWordNetTaxonomy, senses: Dict[str, List[int]], algorithm: WordNetSimilarityAlgorithms, pruneSenses: bool) -> None:
+            super().__init__(algorithm, wordSimPOSFilters=[POSTypes.NOUN, POSTypes.VERB], taxonomy=taxonomy, scoreCacheSize=0, pruneSenses=pruneSenses)
+            self.Senses: Dict[str, List[int]] = senses
+            self.Scores: int = 0
+
+        def _LoadSynsets(self, lemma: str, posFilters: List[POSTypes] = None, lang="eng") -> List[Synset]:
+            return [CompiledNLTKWordNetWrapperTest._FakeSynset(self.Taxonomy.Names[i], self.Taxonomy.Poses[i]) for i in self.Senses[lemma]]
+
+        def _SynsetSimilarity(self, methodName, syn1: Synset, syn2: Synset, informationContent=None) -> Optional[float]:
+            self.Scores += 1
+            return super()._SynsetSimilarity(methodName, syn1, syn2, informationContent)
+
+    def test_SimilarityScale_ClosedLCHScaleEndsAtTheSameSynset(self):
+        from src.Core.WordNet.CompiledWordNetTaxonomy import CompiledWordNetTaxonomyTest
+        taxonomy = CompiledWordNetTaxonomyTest._CreateTaxonomy()
+        target = CompiledNLTKWordNetWrapper(WordNetSimilarityAlgorithms.LCH, wordSimPOSFilters=[POSTypes.NOUN, POSTypes.VERB], taxonomy=taxonomy, closedLCHScale=True)
+        self.assertTrue(target.SimilarityScale().IsNormalized())
+        dog = taxonomy.Ids["dog.n.01"]
+        self.assertEqual(taxonomy.LCHSimilarity(dog, dog), target.SimilarityScale().Max)     # Nouns are deeper than verbs here.
+        self.assertFalse(CompiledNLTKWordNetWrapper(WordNetSimilarityAlgorithms.LCH, taxonomy=taxonomy).SimilarityScale().IsNormalized())
+
+    def test_PruneSenses_SameMaxWithFewerScores(self):
+        rnd = random.Random(7)
+        poses = ["n"] * 300 + ["v"] * 100
+        parents: List[List[int]] = []      # Nouns under one top, verbs under two tops; some synsets have 2 parents.
+        for i, pos in enumerate(poses):
+            first = 0 if pos == "n" else 300
+            parents.append([] if i in (0, 300, 301) else rnd.sample(range(first, i), min(i - first, rnd.choice([1, 1, 1, 2]))))
+        taxonomy = CompiledWordNetTaxonomy([("s" + str(i) + "." + p + ".01") for i, p in enumerate(poses)], poses, parents)
+        senses = {"w" + str(w): rnd.sample(range(400), rnd.randint(1, 12)) for w in range(30)}
+        words = sorted(senses)
+        for algorithm in [WordNetSimilarityAlgorithms.PATH, WordNetSimilarityAlgorithms.LCH, WordNetSimilarityAlgorithms.WUP]:
+            expected = CompiledNLTKWordNetWrapperTest._FakeSensesWordNet(taxonomy, senses, algorithm, False)
+            target = CompiledNLTKWordNetWrapperTest._FakeSensesWordNet(taxonomy, senses, algorithm, True)
+            for w1 in words:
+                for w2 in words:
+                    self.assertEqual(expected.WordSimilarity(w1, w2), target.WordSimilarity(w1, w2), str(algorithm) + " " + w1 + "-" + w2)
+            method = algorithm.name.lower() + "_similarity"
+            for i1 in range(0, 400, 7):         # The bounds hold for every pair.
+                for i2 in range(0, 400, 3):
+                    syn1, syn2 = [CompiledNLTKWordNetWrapperTest._FakeSynset(taxonomy.Names[i], taxonomy.Poses[i]) for i in (i1, i2)]
+                    sim = target._SynsetSimilarity(method, syn1, syn2)
+                    if sim is not None:
+                        self.assertLessEqual(sim, target._SimilarityUpperBound(method, syn1, syn2))
+            self.assertLess(target.Scores, expected.Scores)
+
+
+class CompiledNLTKWordNetWrapperIntegrationTest(TestCase):
+
+    def test_WordSimilarity_SameAsNLTK(self):
+        words = [("dog", "cat"), ("car", "automobile"), ("turkey", "turkish"), ("group", "communication"), ("run", "walk"), ("bank", "river")]
+        taxonomy = CompiledWordNetTaxonomy.Compile()
+        for algorithm in [WordNetSimilarityAlgorithms.PATH, WordNetSimilarityAlgorithms.LCH, WordNetSimilarityAlgorithms.WUP]:
+            for posFilters in [[POSTypes.NOUN], [POSTypes.VERB], [POSTypes.NOUN, POSTypes.VERB, POSTypes.ADJ]]:
+                expected = NLTKWordNetWrapper(algorithm, wordSimPOSFilters=posFilters)
+                target = CompiledNLTKWordNetWrapper(algorithm, wordSimPOSFilters=posFilters, taxonomy=taxonomy)
+                for w1, w2 in words:
+                    self.assertEqual(expected.WordSimilarity(w1, w2), target.WordSimilarity(w1, w2), str(algorithm) + " " + w1 + "-" + w2)
+
+
+if __name__ == '__main__':
+    unittest.main()
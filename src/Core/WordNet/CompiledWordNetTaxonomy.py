@@ -0,0 +1,267 @@
+# coding=utf-8
+import math
+import os
+import tempfile
+import unittest
+from typing import List, Dict, Optional, Tuple
+from unittest import TestCase
+
+import numpy
+
+from src.Tools.Logger import logp
+
+
+class CompiledWordNetTaxonomy(object):
+    """
+    The hypernym taxonomy of WordNet with integer synset ids: a parent array (hypernyms and instance hypernyms, as CSR offsets), the min/max depths of every synset and the max depth per POS.
+    PATH, LCH and WUP are computed from these arrays with the same definitions as NLTK 3.4.5 (the version the readme pins), instead of NLTK recomputing the hypernym paths and depths on every call:
+        - Shortest path distances go through the common ancestors (or the simulated root, for the POS that need one: the verbs, and the nouns of WordNet 1.6), path = 1 / (distance + 1).
+        - LCH = -log((distance + 1) / (2 * max depth of the POS)), only for synsets of the same POS.
+        - WUP takes the common ancestor with the greatest min depth (the smallest name on ties, or the synset itself) as the subsumer, = 2 * depth / (len1 + len2).
+    The NLTK quirks are kept on purpose, e.g. the root is simulated according to the first synset only, so path(verb, noun) has a value while path(noun, verb) has not.
+    Ancestor distances are computed once per synset and kept.
+    """
+    RootId: int = -1
+    RootName: str = "*ROOT*"
+
+    def __init__(self, names: List[str], poses: List[str], parents: List[List[int]], version: str = "3.0") -> None:
+        """
+        :param names: Synset name of each id (e.g. dog.n.01).
+        :param poses: Synset POS of each id, as NLTK gives them ('n', 'v', 'a', 's', 'r').
+        :param parents: Ids of the hypernyms and instance hypernyms of each id.
+        :param version: WordNet version. Verbs always need a simulated root, nouns only in WordNet 1.6, the adjectives and adverbs never (Synset._needs_root of NLTK 3.4.5).
+        """
+        super().__init__()
+        self.Names: List[str] = names
+        self.Ids: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.Poses: List[str] = poses
+        self.Version: str = version
+        self.ParentOffsets: numpy.ndarray = numpy.zeros(len(names) + 1, dtype=numpy.int32)
+        self.ParentOffsets[1:] = numpy.cumsum([len(p) for p in parents])
+        self.ParentIds: numpy.ndarray = numpy.fromiter((p for ps in parents for p in ps), dtype=numpy.int32, count=int(self.ParentOffsets[-1]))
+        self._Parents: List[Tuple[int, ...]] = [tuple(ps) for ps in parents]
+        self.MinDepths: numpy.ndarray = numpy.full(len(names), -1, dtype=numpy.int32)
+        self.MaxDepths: numpy.ndarray = numpy.full(len(names), -1, dtype=numpy.int32)
+        for i in range(len(names)):
+            self._ComputeDepths(i)
+        self.MaxDepthByPos: Dict[str, int] = {}
+        for depth, pos in zip(self.MaxDepths.tolist(), poses):
+            group = self._PosGroup(pos)
+            self.MaxDepthByPos[group] = max(self.MaxDepthByPos.get(group, 0), depth)
+        self._Ancestors: Dict[int, Dict[int, int]] = {}     # Synset id, {ancestor (or itself) id, shortest distance}.
+        self._RootDistances: Dict[int, int] = {}             # Synset id, distance to the simulated root.
+
+    def _ComputeDepths(self, i: int) -> None:
+        if self.MinDepths[i] >= 0:
+            return
+        parents = self._Parents[i]
+        if not parents:
+            self.MinDepths[i] = self.MaxDepths[i] = 0
+            return
+        for p in parents:
+            self._ComputeDepths(p)
+        self.MinDepths[i] = 1 + min(int(self.MinDepths[p]) for p in parents)
+        self.MaxDepths[i] = 1 + max(int(self.MaxDepths[p]) for p in parents)
+
+    @staticmethod
+    def _PosGroup(pos: str) -> str:
+        return "a" if pos == "s" else pos      # Satellites are in the adjective file, NLTK takes the max depth of both.
+
+    def NeedsRoot(self, i: int) -> bool:
+        return self._PosNeedsRoot(self.Poses[i])
+
+    def _PosNeedsRoot(self, pos: str) -> bool:
+        return pos == "v" or (pos == "n" and self.Version == "1.6")
+
+    def MaxDepthOfPos(self, pos: str) -> int:
+        """
+        :return: Max depth of the POS, + 1 for the simulated root if the POS needs one.
+        """
+        depth = self.MaxDepthByPos.get(self._PosGroup(pos), 0)
+        return depth + 1 if self._PosNeedsRoot(pos) else depth
+
+    def Ancestors(self, i: int) -> Dict[int, int]:
+        """
+        :return: {ancestor id, shortest distance}, the synset itself included with 0.
+        """
+        ancestors = self._Ancestors.get(i)
+        if ancestors is None:
+            ancestors = {i: 0}
+            level: List[int] = [i]
+            distance: int = 0
+            while level:
+                distance += 1
+                nextLevel: List[int] = []
+                for s in level:
+                    for p in self._Parents[s]:
+                        if p not in ancestors:
+                            ancestors[p] = distance
+                            nextLevel.append(p)
+                level = nextLevel
+            self._Ancestors[i] = ancestors
+            self._RootDistances[i] = max(ancestors.values()) + 1
+        return ancestors
+
+    def RootDistance(self, i: int) -> int:
+        self.Ancestors(i)
+        return self._RootDistances[i]
+
+    def ShortestPathDistance(self, i1: int, i2: int, simulateRoot: bool = False) -> Optional[int]:
+        if i1 == i2:
+            return 0
+        if i2 == self.RootId:
+            return self.RootDistance(i1) if simulateRoot else None
+        a1, a2 = self.Ancestors(i1), self.Ancestors(i2)
+        if len(a1) > len(a2):
+            a1, a2 = a2, a1
+        distances = [d + a2[s] for s, d in a1.items() if s in a2]
+        if simulateRoot:
+            distances.append(self.RootDistance(i1) + self.RootDistance(i2))
+        return min(distances) if distances else None
+
+    def PathSimilarity(self, i1: int, i2: int) -> Optional[float]:
+        distance = self.ShortestPathDistance(i1, i2, self.NeedsRoot(i1))
+        if distance is None or distance < 0:
+            return None
+        return 1.0 / (distance + 1)
+
+    def LCHSimilarity(self, i1: int, i2: int) -> Optional[float]:
+        if self.Poses[i1] != self.Poses[i2]:
+            raise Exception("Computing the lch similarity requires " + self.Names[i1] + " and " + self.Names[i2] + " to have the same part of speech.")
+        depth = self.MaxDepthOfPos(self.Poses[i1])
+        distance = self.ShortestPathDistance(i1, i2, self.NeedsRoot(i1))
+        if distance is None or distance < 0 or depth == 0:
+            return None
+        return -math.log((distance + 1) / (2.0 * depth))
+
+    def LowestCommonSubsumer(self, i1: int, i2: int) -> Optional[int]:
+        """
+        :return: The subsumer WUP uses: among the common ancestors (and the simulated root), the ones with the greatest min depth, the first synset if it is one of them, else the one with the smallest name. None if there is none.
+        """
+        a1, a2 = self.Ancestors(i1), self.Ancestors(i2)
+        common: List[int] = [s for s in a1 if s in a2]
+        if self.NeedsRoot(i1):
+            common.append(self.RootId)
+        if not common:
+            return None
+        minDepth = max(self._MinDepth(s) for s in common)
+        lowests = [s for s in common if self._MinDepth(s) == minDepth]
+        if i1 in lowests:
+            return i1
+        return min(lowests, key=self._Name)
+
+    def WUPSimilarity(self, i1: int, i2: int) -> Optional[float]:
+        subsumer = self.LowestCommonSubsumer(i1, i2)
+        if subsumer is None:
+            return None
+        depth = (0 if subsumer == self.RootId else int(self.MaxDepths[subsumer])) + 1
+        simulateRoot = self.NeedsRoot(i1)
+        len1 = self.ShortestPathDistance(i1, subsumer, simulateRoot)
+        len2 = self.ShortestPathDistance(i2, subsumer, simulateRoot)
+        if len1 is None or len2 is None:
+            return None
+        len1 += depth
+        len2 += depth
+        return (2.0 * depth) / (len1 + len2)
+
+    def _MinDepth(self, i: int) -> int:
+        return 0 if i == self.RootId else int(self.MinDepths[i])
+
+    def _Name(self, i: int) -> str:
+        return self.RootName if i == self.RootId else self.Names[i]
+
+    #region Persistence
+
+    @staticmethod
+    def Compile(wordnet=None) -> 'CompiledWordNetTaxonomy':
+        """
+        :param wordnet: NLTK WordNet corpus reader. Default: nltk.corpus.wordnet.
+        """
+        if wordnet is None:
+            from nltk.corpus import wordnet       # Import takes time!
+        logp("Compiling the WordNet taxonomy...")
+        synsets = list(wordnet.all_synsets())
+        ids: Dict[str, int] = {s.name(): i for i, s in enumerate(synsets)}
+        parents: List[List[int]] = [[ids[p.name()] for p in s.hypernyms() + s.instance_hypernyms()] for s in synsets]
+        return CompiledWordNetTaxonomy([s.name() for s in synsets], [s.pos() for s in synsets], parents, wordnet.get_version())
+
+    def Save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            numpy.savez_compressed(f, Names=numpy.array(self.Names), Poses=numpy.array(self.Poses), ParentOffsets=self.ParentOffsets, ParentIds=self.ParentIds, Version=numpy.array(self.Version))
+
+    @staticmethod
+    def Load(path: str) -> 'CompiledWordNetTaxonomy':
+        with numpy.load(path, allow_pickle=False) as data:
+            offsets, parentIds = data["ParentOffsets"].tolist(), data["ParentIds"].tolist()
+            parents = [parentIds[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+            return CompiledWordNetTaxonomy(data["Names"].tolist(), data["Poses"].tolist(), parents, str(data["Version"]))
+
+    @staticmethod
+    def LoadOrCompile(path: str) -> 'CompiledWordNetTaxonomy':
+        """
+        Compiles the taxonomy from NLTK WordNet once and keeps it in the path for the next runs.
+        """
+        if os.path.exists(path):
+            return CompiledWordNetTaxonomy.Load(path)
+        taxonomy = CompiledWordNetTaxonomy.Compile()
+        taxonomy.Save(path)
+        logp("Compiled WordNet taxonomy has been saved to " + path)
+        return taxonomy
+
+    #endregion
+
+
+class CompiledWordNetTaxonomyTest(TestCase):
+
+    @staticmethod
+    def _CreateTaxonomy() -> CompiledWordNetTaxonomy:
+        names = ["entity.n.01", "object.n.01", "animal.n.01", "dog.n.01", "cat.n.01", "artifact.n.01", "run.v.01", "sprint.v.01", "walk.v.01"]
+        poses = ["n", "n", "n", "n", "n", "n", "v", "v", "v"]
+        parents = [[], [0], [1], [2], [2], [1], [], [6], []]
+        return CompiledWordNetTaxonomy(names, poses, parents)
+
+    def test_Similarities_NounsWithoutRoot(self):
+        target = self._CreateTaxonomy()
+        dog, cat, artifact = target.Ids["dog.n.01"], target.Ids["cat.n.01"], target.Ids["artifact.n.01"]
+        self.assertEqual(3, target.MaxDepthOfPos("n"))
+        self.assertEqual(1.0 / 3, target.PathSimilarity(dog, cat))
+        self.assertEqual(-math.log(3 / 6.0), target.LCHSimilarity(dog, cat))
+        self.assertEqual(6.0 / 8, target.WUPSimilarity(dog, cat))     # Subsumer animal (depth 3), 1 step from each.
+        self.assertEqual(4.0 / 7, target.WUPSimilarity(dog, artifact))  # Subsumer object (depth 2).
+        self.assertEqual(1.0, target.WUPSimilarity(dog, dog))
+
+    def test_Similarities_VerbsWithSimulatedRoot(self):
+        target = self._CreateTaxonomy()
+        sprint, walk, dog = target.Ids["sprint.v.01"], target.Ids["walk.v.01"], target.Ids["dog.n.01"]
+        self.assertEqual(2, target.MaxDepthOfPos("v"))
+        self.assertEqual(0.25, target.PathSimilarity(sprint, walk))       # sprint > run > root < walk
+        self.assertEqual(-math.log(4 / 4.0), target.LCHSimilarity(sprint, walk))
+        self.assertEqual(2.0 / 5, target.WUPSimilarity(sprint, walk))
+        self.assertIsNone(target.PathSimilarity(dog, walk))               # The root is simulated for the first synset only.
+        self.assertEqual(1.0 / 6, target.PathSimilarity(walk, dog))
+        with self.assertRaises(Exception):
+            target.LCHSimilarity(dog, walk)
+
+    def test_Similarities_AdjectivesWithoutRoot(self):
+        target = CompiledWordNetTaxonomy(["good.a.01", "bad.a.01", "quick.s.01", "fast.r.01", "slow.r.01"], ["a", "a", "s", "r", "r"], [[], [], [], [], []])
+        for i1, i2 in [(0, 1), (0, 2), (3, 4)]:      # Two distinct senses, without a common ancestor.
+            self.assertIsNone(target.PathSimilarity(i1, i2))
+            self.assertIsNone(target.WUPSimilarity(i1, i2))
+        self.assertEqual(0, target.MaxDepthOfPos("a"))
+        self.assertIsNone(target.LCHSimilarity(0, 1))
+        self.assertIsNone(target.LCHSimilarity(3, 4))
+
+    def test_Load_SameAsSaved(self):
+        target = self._CreateTaxonomy()
+        path = os.path.join(tempfile.mkdtemp(), "WordNetTaxonomy.npz")
+        target.Save(path)
+        actual = CompiledWordNetTaxonomy.Load(path)
+        self.assertEqual(target.Names, actual.Names)
+        self.assertEqual(target.Poses, actual.Poses)
+        self.assertEqual(target.MaxDepths.tolist(), actual.MaxDepths.tolist())
+        self.assertEqual(target.WUPSimilarity(7, 8), actual.WUPSimilarity(7, 8))
+
+
+if __name__ == '__main__':
+    unittest.main()
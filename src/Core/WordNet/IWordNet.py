@@ -116,6 +116,13 @@ class IWordNetMeasures(IWordSimilarity):
         self.Algorithm: WordNetSimilarityAlgorithms = algorithm
         self.Lemma2SynsetMatching = l2s
 
+    @abstractmethod
+    def WordNetVersion(self) -> str:
+        """
+        The version of the WordNet the scores come from.
+        """
+        pass
+
     @abstractmethod
     def PATHSimilarity(self, w1: str, w2: str, l2s: Lemma2SynsetMatching = Lemma2SynsetMatching.HighestScoreOfCombinations):
         pass
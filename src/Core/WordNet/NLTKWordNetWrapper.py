@@ -1,10 +1,11 @@
 # coding=utf-8
+import math
 import pprint
 import unittest
 import warnings
 from builtins import NotImplementedError
 from statistics import mean
-from typing import Optional, List, Set
+from typing import Optional, List, Set, Dict, Tuple
 from unittest import TestCase
 
 from nltk.corpus.reader import Synset, Lemma
@@ -12,6 +13,7 @@ from pandas import DataFrame
 from tabulate import tabulate
 
 from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.LRUCache import LRUCache
 from src.Core.Morphology.POSTypes import POSTypes
 from src.Core.Morphology.RootDetection.IRootDetector import IRootDetector
 from src.Core.WordNet.IWordDefinitionSource import IWordDefinitionSource
@@ -32,17 +34,28 @@ from src.Tools.Logger import logp, logv, logpif
 class NLTKWordNetWrapper(IWordNet,IWordNetMeasures, IRootDetector, IWordDefinitionSource):
 
     def __init__(self, algorithm:WordNetSimilarityAlgorithms = WordNetSimilarityAlgorithms.WUP, l2s:Lemma2SynsetMatching = Lemma2SynsetMatching.HighestScoreOfCombinations,
-                 wordSimPOSFilters:List[POSTypes] = None) -> None:
+                 wordSimPOSFilters:List[POSTypes] = None, senseCacheSize:int = 10000, scoreCacheSize:int = 100000, pruneSenses:bool = False,
+                 closedLCHScale:bool = False) -> None:
         """
         :param algorithm:
         :param l2s:
         :param wordSimPOSFilters: POS Filters to be applied when a WordSim function is observed according to the IWordSimilarity interface (_RunSimilarity etc.).
+        :param senseCacheSize: Max number of words (with their POS filters) whose synsets are kept, see SenseCache. 0 disables it.
+        :param scoreCacheSize: Max number of synset pair scores kept, see ScoreCache. 0 disables it.
+        :param pruneSenses: If True, HighestScoreOfCombinations visits the sense pairs by descending upper bound and stops when no remaining pair can beat the max (same result, see _PrunedMaxSimilarity).
+        :param closedLCHScale: If True, the LCH scale is closed at the LCH of a synset with itself in the deepest POS of the filters, so it can be scaled pair by pair instead of min-max normalized over a dataset.
         """
         # Pay attention to the order!! Normally, the IWordNetMeasure base is called twice. To prevent this, I removed the default super() calls in the bases. As far as I understand, this is normal. The best explanation I found is here: #https://stackoverflow.com/questions/29311504/multiple-inheritance-with-arguments
         IWordNet.__init__(self)
         IWordNetMeasures.__init__(self,algorithm,l2s)
         self._InformationContent = None
+        self.InformationContentFile:str = "ic-brown.dat"     # NLTK wordnet_ic file of LIN, JCN and RES. None when InformationContent is set directly.
         self.WordSimPOSFilters:List[POSTypes] = wordSimPOSFilters
+        self.SenseCache:LRUCache = LRUCache(senseCacheSize)        # (lemma, POS filters, lang), synsets. Words of Q3/Q4 pairs repeat with each of their neighbours.
+        self.ScoreCache:LRUCache = LRUCache(scoreCacheSize)        # (synset name 1, synset name 2, method name), score.
+        self.PruneSenses:bool = pruneSenses
+        self.ClosedLCHScale:bool = closedLCHScale
+        self._LCHDepths:Dict[str,int] = {}      # Synset POS, max depth LCH uses.
         if(self.WordSimPOSFilters is None): logp("WordSimPOSFilters is None!")
         logp("NLTKWordNet instance has been created. Potential member calls could take a while for once if it's the first nltk.wn call!")
 
@@ -83,8 +96,16 @@ class NLTKWordNetWrapper(IWordNet,IWordNetMeasures, IRootDetector, IWordDefiniti
         :param lemma:
         :param posFilters:
         :param lang:
-        :return:
+        :return: A new list on each call, the synsets are cached in SenseCache.
         """
+        key = (lemma, tuple(posFilters) if posFilters else (), lang)
+        found, syns = self.SenseCache.TryGet(key)
+        if not found:
+            syns = tuple(self._LoadSynsets(lemma, posFilters, lang))
+            self.SenseCache.Put(key, syns)
+        return list(syns)
+
+    def _LoadSynsets(self, lemma: str, posFilters:List[POSTypes] = None, lang="eng") -> List[Synset]:
         from nltk.corpus import wordnet as wn
 
         if(posFilters is None or len(posFilters) == 0):
@@ -228,23 +249,18 @@ class NLTKWordNetWrapper(IWordNet,IWordNetMeasures, IRootDetector, IWordDefiniti
         :param informationContent:
         :return:
         """
-        from nltk.corpus import wordnet as wn       # Import takes time!
-
         # Getting all senses
         syns1 = self.LoadSynsets(w1, posFilters=self.WordSimPOSFilters)        # Case doesn't matter in this query!
         syns2 = self.LoadSynsets(w2, posFilters=self.WordSimPOSFilters)
         if len(syns1) == 0: return None
         if len(syns2) == 0: return None
+        if(l2s == Lemma2SynsetMatching.HighestScoreOfCombinations and self.PruneSenses):
+            return self._PrunedMaxSimilarity(methodName, syns1, syns2, informationContent)
 
         scores:List[float] = []
         for syn1 in syns1:
             for syn2 in syns2:
-                m = getattr(syn1,methodName)
-                try:        # Measures can throw errors.
-                    sim = m(wn.synset(syn2._name), informationContent)          # Could yield None on cross-POS situations.
-                except Exception as ex:
-                    sim = None
-                    print(ex)
+                sim = self._SynsetPairScore(methodName, syn1, syn2, informationContent)
                 if(sim is not None): scores.append(sim)
 
         if(len(scores) == 0): return None
@@ -256,7 +272,88 @@ class NLTKWordNetWrapper(IWordNet,IWordNetMeasures, IRootDetector, IWordDefiniti
             return mean(scores)
         raise Exception("Unsupported: " + str(l2s))
 
+    def _SynsetPairScore(self, methodName, syn1:Synset, syn2:Synset, informationContent = None)->Optional[float]:
+        key = (syn1._name, syn2._name, methodName)      # Ordered: some measures are not symmetric (e.g. path on mixed POS).
+        found, sim = self.ScoreCache.TryGet(key)
+        if not found:
+            sim = self._SynsetSimilarity(methodName, syn1, syn2, informationContent)
+            self.ScoreCache.Put(key, sim)
+        return sim
+
+    def _PrunedMaxSimilarity(self, methodName, syns1:List[Synset], syns2:List[Synset], informationContent = None)->Optional[float]:
+        """
+        Max over the sense pairs without scoring all of them: the pairs are visited by descending upper bound (see _SimilarityUpperBound),
+        and the loop stops once the bound of the next pair cannot beat the running max.
+        :return: Same as the max of HighestScoreOfCombinations.
+        """
+        pairs = sorted(((self._SimilarityUpperBound(methodName, syn1, syn2), syn1, syn2) for syn1 in syns1 for syn2 in syns2), key=lambda p: -p[0])
+        best:Optional[float] = None
+        for bound, syn1, syn2 in pairs:
+            if(best is not None and bound <= best): break
+            sim = self._SynsetPairScore(methodName, syn1, syn2, informationContent)
+            if(sim is not None and (best is None or sim > best)): best = sim
+        return best
+
+    def _SimilarityUpperBound(self, methodName, syn1:Synset, syn2:Synset)->float:
+        """
+        Cheap upper bound of the PATH, LCH and WUP of a sense pair, from the min/max depths of the synsets (inf for the other measures).
+        A shortest path between synsets with min depth m1 and max depth M2 is at least m1 - M2 long, and at least 1 between different synsets.
+        The WUP subsumer is an ancestor of both, so its depth + 1 is at most D = min(M1, M2) + 1, and each synset is at least m - D + 1 below it.
+        """
+        if(methodName not in ("path_similarity", "lch_similarity", "wup_similarity") or syn1._name == syn2._name): return math.inf
+        min1, max1 = self._SynsetDepths(syn1)
+        min2, max2 = self._SynsetDepths(syn2)
+        if(methodName == "wup_similarity"):
+            depth = min(max1, max2) + 1
+            lengths = max(1, max(0, min1 - depth + 1) + max(0, min2 - depth + 1))
+            return (2.0 * depth) / (2 * depth + lengths)
+        distance = max(1, min1 - max2, min2 - max1)
+        if(methodName == "path_similarity"): return 1.0 / (distance + 1)
+        if(syn1._pos != syn2._pos): return -math.inf      # LCH fails on different POS.
+        depth = self._LCHDepth(syn1._pos)
+        return -math.log((distance + 1) / (2.0 * depth)) if depth > 0 else -math.inf
+
+    def _SynsetDepths(self, syn:Synset)->Tuple[int,int]:
+        """
+        :return: Min and max depth of the synset, through hypernyms and instance hypernyms. NLTK keeps them in the synset.
+        """
+        return syn.min_depth(), syn.max_depth()
+
+    def _LCHDepth(self, pos:str)->int:
+        """
+        :param pos: Synset POS char.
+        :return: Max depth of the POS, + 1 if it needs a simulated root (the verbs, and the nouns of WordNet 1.6, as Synset._needs_root of NLTK 3.4.5). Same as the depth of NLTK's lch_similarity.
+        """
+        depth = self._LCHDepths.get(pos)
+        if(depth is None):
+            from nltk.corpus import wordnet as wn       # Import takes time!
+            needsRoot = pos == 'v' or (pos == 'n' and wn.get_version() == '1.6')
+            depth = max((s.max_depth() for s in wn.all_synsets(pos)), default=0) + (1 if needsRoot else 0)
+            self._LCHDepths[pos] = depth
+        return depth
+
+    def LCHMaxSimilarity(self)->float:
+        """
+        :return: The highest LCH of the POS filters (all POS if none): a synset with itself, -log(1 / (2 * max depth)).
+        """
+        posChars = [self._GetPosChar(pos) for pos in self.WordSimPOSFilters] if self.WordSimPOSFilters else ['n', 'v', 'a', 'r']
+        return max(-math.log((0 + 1) / (2.0 * depth)) for depth in (self._LCHDepth(pos) for pos in posChars) if depth > 0)
+
+    def _SynsetSimilarity(self, methodName, syn1:Synset, syn2:Synset, informationContent = None)->Optional[float]:
+        """
+        Similarity of a single sense pair. wn.synsets already returns the cached synset objects, so syn2 is used as is.
+        :return: None if the measure fails or has no value (e.g. cross-POS pairs).
+        """
+        m = getattr(syn1,methodName)
+        try:        # Measures can throw errors.
+            return m(syn2, informationContent)          # Could yield None on cross-POS situations.
+        except Exception as ex:
+            print(ex)
+            return None
+
     def SimilarityScale(self) -> DiscreteScale:
+        if(self.Algorithm == WordNetSimilarityAlgorithms.LCH and self.ClosedLCHScale):
+            return DiscreteScale(0,self.LCHMaxSimilarity())        # Negative LCHs (paths longer than twice the depth, through a simulated root) are clamped to 0 when scaled.
         if(self.Algorithm == WordNetSimilarityAlgorithms.LCH
                 or  self.Algorithm == WordNetSimilarityAlgorithms.JCN
                 or  self.Algorithm == WordNetSimilarityAlgorithms.RES
@@ -297,13 +394,19 @@ class NLTKWordNetWrapper(IWordNet,IWordNetMeasures, IRootDetector, IWordDefiniti
     @InformationContent.setter
     def InformationContent(self, value):
         self._InformationContent = value
+        self.InformationContentFile = None      # Not a known file anymore.
+        self.ScoreCache.Clear()     # LIN, JCN and RES scores depend on it.
 
     def _CreateInformationContent(self):
         from nltk.corpus import wordnet_ic
-        brown_ic = wordnet_ic.ic('ic-brown.dat')        # y
+        brown_ic = wordnet_ic.ic(self.InformationContentFile)        # y
         #semcor_ic = wordnet_ic.ic('ic-semcor.dat')
         return brown_ic
 
+    def WordNetVersion(self) -> str:
+        from nltk.corpus import wordnet as wn       # Import takes time!
+        return wn.get_version()
+
     def DetectRoots(self, surface: str, priorPOS: POSTypes = None) -> List[str]:
         """
         Very roughly returns roots using Morphy in WordNet. The list of suffixes is fixed. 
@@ -541,6 +644,39 @@ class NLTKWordNetWrapper(IWordNet,IWordNetMeasures, IRootDetector, IWordDefiniti
         return defs
 
 
+class NLTKWordNetWrapperTest(TestCase):
+
+    class _FakeSynset(object):
+        def __init__(self, name: str) -> None:
+            self._name = name
+
+    class _CountingWordNet(NLTKWordNetWrapper):
+        def __init__(self, **kwargs) -> None:
+            super().__init__(WordNetSimilarityAlgorithms.PATH, wordSimPOSFilters=[POSTypes.NOUN], **kwargs)
+            self.Loads, self.Scores = 0, 0
+
+        def _LoadSynsets(self, lemma: str, posFilters: List[POSTypes] = None, lang="eng") -> List[Synset]:
+            self.Loads += 1
+            return [NLTKWordNetWrapperTest._FakeSynset(lemma + ".n.0" + str(i)) for i in range(1, len(lemma))]
+
+        def _SynsetSimilarity(self, methodName, syn1: Synset, syn2: Synset, informationContent=None) -> Optional[float]:
+            self.Scores += 1
+            return 1.0 / (len(syn1._name) + int(syn2._name[-1]))
+
+    def test_WordSimilarity_SensesAndScoresMemoized(self):
+        target = NLTKWordNetWrapperTest._CountingWordNet()
+        expected = target.WordSimilarity("cat", "dog")
+        self.assertEqual((2, 4), (target.Loads, target.Scores))     # 2 senses each.
+        self.assertEqual(expected, target.WordSimilarity("cat", "dog"))
+        target.WordSimilarity("cat", "bird")
+        self.assertEqual((3, 10), (target.Loads, target.Scores))    # Senses of cat and the cat/dog scores are reused.
+        self.assertEqual((3, 4), (target.SenseCache.Hit, target.ScoreCache.Hit))
+        uncached = NLTKWordNetWrapperTest._CountingWordNet(senseCacheSize=0, scoreCacheSize=0)
+        self.assertEqual(expected, uncached.WordSimilarity("cat", "dog"))
+        uncached.WordSimilarity("cat", "dog")
+        self.assertEqual((4, 8), (uncached.Loads, uncached.Scores))
+
+
 class NLTKWordNetWrapperIntegrationTest(TestCase):
 
     def test_DetectRoot_WithPOSArgument_ReturnRoot(self):
@@ -1,4 +1,5 @@
 import unittest
+from typing import List, Dict
 from unittest import TestCase
 
 class WordPair(object):
@@ -35,6 +36,12 @@ class WordPair(object):
         val = self.__getattribute__(simType.lower() + "Similarity")
         return float(val) if val >= 0 else None
 
+    def SimilarityAttributes(self)->List[str]:
+        """
+        Names of the similarity attributes of the pair (GoldSimilarity and the ones set by SetOtherSimilarity), in the order they were set.
+        """
+        return [attr for attr in vars(self) if attr.__contains__("Similarity")]
+
     def __str__(self):
         return str(vars(self))
 
@@ -63,6 +70,57 @@ class WordPair(object):
         return w1+"-"+w2 if firstOneSmall else w2+"-"+w1
 
 
+class SlottedWordPair(object):
+    """
+    WordPair without an instance dict, for the streams that create a pair per detection.
+    The other similarities are kept in a small dict that is only created with the first SetOtherSimilarity call. Arbitrary attributes cannot be added.
+    """
+    __slots__ = ["Word1", "Word2", "GoldSimilarity", "Note", "IsOOV", "_Similarities"]
+
+    def __init__(self, word1:str, word2:str, goldSimilarity:float=None):
+        self.Word1:str = word1
+        self.Word2:str = word2
+        self.GoldSimilarity:float = goldSimilarity
+        self.Note = None
+        self.IsOOV:bool = None
+        self._Similarities:Dict[str,float] = None
+
+    def SetOtherSimilarity(self, simType:str, sim:float):
+        if self._Similarities is None: self._Similarities = {}
+        self._Similarities[simType.lower() + "Similarity"] = sim
+
+    def GetOtherSimilarity(self, simType:str)->float:
+        val = getattr(self, simType.lower() + "Similarity")
+        return float(val) if val >= 0 else None
+
+    @property
+    def goldSimilarity(self):
+        return self.GoldSimilarity
+
+    def __getattr__(self, name:str):
+        """
+        Only called for the names that are not slots, so the other similarities can be read as attributes like on WordPair.
+        """
+        if name != "_Similarities" and self._Similarities is not None and name in self._Similarities:
+            return self._Similarities[name]
+        raise AttributeError(name)
+
+    def SimilarityAttributes(self)->List[str]:
+        return ["GoldSimilarity"] + (list(self._Similarities) if self._Similarities else [])
+
+    def ToKey(self):
+        return WordPair.ToOrderFreeUniqueStr(self.Word1,self.Word2)
+
+    def ToPairDisplay(self)->str:
+        return self.Word1.ljust(24) + "- " + self.Word2.ljust(24)
+
+    def __str__(self):
+        return str({attr: getattr(self, attr) for attr in ["Word1", "Word2"] + self.SimilarityAttributes() + ["Note", "IsOOV"]})
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
 class WordPairTest(TestCase):
 
     def test_TwoSymetticalyWordPairs_ReturnSameHashes(self):
@@ -70,5 +128,16 @@ class WordPairTest(TestCase):
         hash2:str = WordPair.ToOrderFreeUniqueStr("ercan","gokhan")
         self.assertEqual(hash1,hash2)
 
+    def test_SlottedWordPair_SameSimilarityAccessAsWordPair(self):
+        wp = SlottedWordPair("gokhan","ercan")
+        self.assertFalse(hasattr(wp, "__dict__"))
+        wp.SetOtherSimilarity("NEdit", 0.5)
+        self.assertEqual(0.5, wp.GetOtherSimilarity("nedit"))
+        self.assertEqual(0.5, getattr(wp, "neditSimilarity"))
+        self.assertEqual(["GoldSimilarity", "neditSimilarity"], wp.SimilarityAttributes())
+        self.assertEqual(WordPair("gokhan","ercan").ToKey(), wp.ToKey())
+        with self.assertRaises(AttributeError):
+            wp.GetOtherSimilarity("jacc")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
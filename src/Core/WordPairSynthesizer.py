@@ -1,10 +1,12 @@
 # coding=utf-8
 import random
 import unittest
-from typing import List
+from typing import List, Iterator, Callable
 from unittest import TestCase
 
-from src.Core.WordPair import WordPair
+from src.Core.WordPair import WordPair, SlottedWordPair
+from src.Core.WordSim.IThresholdedWordSimilarity import IThresholdedWordSimilarity
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
 
 
 class WordPairSynthesizer(object):
@@ -35,6 +37,64 @@ class WordPairSynthesizer(object):
                     wp: WordPair = WordPair(w1, w2)
                 yield wp
 
+    def GenerateScoredPairsByIndex(self, sortedWords: List[str], similarity: IWordSimilarity, minSimilarity: float, startRow: int = 0, endRow: int = None,
+                                   rowCallback: Callable[[float], None] = None) -> Iterator[WordPair]:
+        """
+        Scores the same pairs as GeneratePossibleWordPairs by their positions, and creates a WordPair only for the pairs above minSimilarity.
+        For the similarities without a vectorized WordSimilarityBatch (see GenerateScoredPairsByRows for the others). IThresholdedWordSimilarity is used when available.
+        The similarity is set on the yielded pairs under the name of the similarity.
+        :param startRow: Only the rows in [startRow, endRow) are scored.
+        :param rowCallback: Called with the completed percentage of the pairs after the detections of each row are consumed.
+        """
+        n: int = len(sortedWords)
+        endRow = n if endRow is None else endRow
+        simName: str = str(similarity)
+        thresholdedSim: IThresholdedWordSimilarity = similarity if isinstance(similarity, IThresholdedWordSimilarity) else None
+        totalPairs: int = sum(n - 1 - i for i in range(startRow, endRow))
+        donePairs: int = 0
+        for i in range(startRow, endRow):
+            w1: str = sortedWords[i]
+            for j in range(i + 1, n):
+                w2: str = sortedWords[j]
+                sim = thresholdedSim.WordSimilarityAtLeast(w1, w2, minSimilarity) if thresholdedSim is not None else similarity.WordSimilarity(w1, w2)
+                if sim is not None and sim >= minSimilarity:
+                    wp = SlottedWordPair(w1, w2) if w1 < w2 else SlottedWordPair(w2, w1)
+                    wp.SetOtherSimilarity(simName, sim)
+                    yield wp
+            donePairs += n - 1 - i
+            if rowCallback:
+                rowCallback(100 * donePairs / totalPairs if totalPairs else 100.0)
+
+    def GenerateScoredPairsByRows(self, sortedWords: List[str], similarity: IWordSimilarity, minSimilarity: float, startRow: int = 0, endRow: int = None,
+                                  rowCallback: Callable[[float], None] = None) -> Iterator[WordPair]:
+        """
+        Scores the same pairs as GeneratePossibleWordPairs, one row of the triangle per WordSimilarityBatch call, and yields only the pairs above minSimilarity.
+        An IThresholdedWordSimilarity scores the row with WordSimilarityBatchAtLeast, so it can skip the candidates that cannot reach minSimilarity.
+        The similarity is set on the yielded pairs under the name of the similarity.
+        :param startRow: Only the rows in [startRow, endRow) are scored.
+        :param rowCallback: Called with the completed percentage of the pairs after the detections of each row are consumed.
+        """
+        n: int = len(sortedWords)
+        endRow = n if endRow is None else endRow
+        simName: str = str(similarity)
+        thresholdedSim: IThresholdedWordSimilarity = similarity if isinstance(similarity, IThresholdedWordSimilarity) else None
+        totalPairs: int = sum(n - 1 - i for i in range(startRow, endRow))
+        donePairs: int = 0
+        for i in range(startRow, endRow):
+            w1: str = sortedWords[i]
+            if thresholdedSim is not None:
+                sims = thresholdedSim.WordSimilarityBatchAtLeast(w1, sortedWords[i + 1:], minSimilarity)
+            else:
+                sims = similarity.WordSimilarityBatch(w1, sortedWords[i + 1:])
+            for offset in (sims >= minSimilarity).nonzero()[0]:     # NaN (None) is never selected.
+                w2: str = sortedWords[i + 1 + offset]
+                wp = SlottedWordPair(w1, w2) if w1 < w2 else SlottedWordPair(w2, w1)
+                wp.SetOtherSimilarity(simName, float(sims[offset]))
+                yield wp
+            donePairs += n - 1 - i
+            if rowCallback:
+                rowCallback(100 * donePairs / totalPairs if totalPairs else 100.0)
+
     def GenerateRandomWordPairs(self, words: List[str], resultLimit: int = 100):
         """
         Continuously selects random pairs from the given set.
@@ -63,5 +123,25 @@ class WordPairSynthesizerTest(TestCase):
 
         self.assertEqual(3, len(results))
 
+    def test_GenerateScoredPairsByRows_SameAsPossibleWordPairs(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        from src.Core.Orthographic.NormalizedStringSimilarity.BitParallelEditDistance import BitParallelEditDistance
+        expected = CandidatePairTestPool.ExhaustiveDetections(EditDistance(), 0.5)
+        for sim in [EditDistance(), BitParallelEditDistance()]:
+            percentages = []
+            actual = CandidatePairTestPool.Detections(WordPairSynthesizer().GenerateScoredPairsByRows(CandidatePairTestPool.Words, sim, 0.5, rowCallback=percentages.append), sim)
+            self.assertEqual(expected, actual)
+            self.assertEqual(100.0, percentages[-1])
+
+    def test_GenerateScoredPairsByIndex_SameAsPossibleWordPairs(self):
+        from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+        from src.Core.Orthographic.OverlappingMeasures import Dice
+        from src.Core.Orthographic.CandidateGeneration.ICandidatePairGenerator import CandidatePairTestPool
+        from src.Core.Segmentation.Ngram import Ngram
+        for sim in [EditDistance(), Dice(Ngram(2))]:   # Thresholded and plain.
+            actual = CandidatePairTestPool.Detections(WordPairSynthesizer().GenerateScoredPairsByIndex(CandidatePairTestPool.Words, sim, 0.5), sim)
+            self.assertEqual(CandidatePairTestPool.ExhaustiveDetections(sim, 0.5), actual)
+
 if __name__ == '__main__':
     unittest.main()
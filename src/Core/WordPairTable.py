@@ -0,0 +1,253 @@
+# coding=utf-8
+import math
+import unittest
+from array import array
+from typing import List, Dict, Iterator, Optional, Union, Iterable
+from unittest import TestCase
+
+from src.Core.Vocabulary import Vocabulary
+from src.Core.WordPair import WordPair
+
+
+class WordPairTable(object):
+    """
+    Columnar list of word pairs for the large intermediate results (Stage 2 Q3/Q4, Stage 3 inputs).
+    Words are stored once in a Vocabulary, which tables of the same study can share, and the pairs as two int32 word-id arrays; the gold and every other similarity are float64 arrays (NaN for None),
+    so the scores read back are the ones written and compare with the thresholds as they did on WordPair.
+    Notes and OOV flags are rare, so they are kept only for the rows that have them.
+    Indexing and iteration return WordPairView objects that read and write the columns, so the code written for WordPair lists keeps working.
+    """
+
+    def __init__(self, vocabulary: Vocabulary = None) -> None:
+        """
+        :param vocabulary: Where the words get their ids. Default (None): A vocabulary of this table only.
+        """
+        super().__init__()
+        self.Vocabulary: Vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.Word1Ids: array = array("i")
+        self.Word2Ids: array = array("i")
+        self.GoldSimilarities: array = array("d")
+        self.Similarities: Dict[str, array] = {}    # Attribute name (e.g. neditSimilarity), column.
+        self.Notes: Dict[int, str] = {}             # Row, note.
+        self.OOVs: Dict[int, bool] = {}             # Row, IsOOV.
+
+    @property
+    def Words(self) -> List[str]:
+        return self.Vocabulary.Words
+
+    def Append(self, word1: str, word2: str, goldSimilarity: float = None) -> int:
+        """
+        :return: The row of the new pair. Its other similarities are None until set.
+        """
+        self.Word1Ids.append(self.Vocabulary.Id(word1))
+        self.Word2Ids.append(self.Vocabulary.Id(word2))
+        self.GoldSimilarities.append(math.nan if goldSimilarity is None else goldSimilarity)
+        for column in self.Similarities.values():
+            column.append(math.nan)
+        return len(self.Word1Ids) - 1
+
+    def AppendWordPair(self, wp) -> int:
+        """
+        Copies the words, similarities, note and OOV flag of a WordPair (or any object with the same interface).
+        """
+        row = self.Append(wp.Word1, wp.Word2, wp.GoldSimilarity)
+        for attr in wp.SimilarityAttributes():
+            if attr != "GoldSimilarity":
+                self.SetSimilarityValue(row, attr, getattr(wp, attr))
+        if wp.Note is not None: self.Notes[row] = wp.Note
+        if wp.IsOOV is not None: self.OOVs[row] = wp.IsOOV
+        return row
+
+    @staticmethod
+    def FromWordPairs(wordpairs: Iterable, vocabulary: Vocabulary = None) -> 'WordPairTable':
+        table = WordPairTable(vocabulary)
+        for wp in wordpairs:
+            table.AppendWordPair(wp)
+        return table
+
+    def ToWordPairs(self) -> List[WordPair]:
+        wordpairs: List[WordPair] = []
+        for view in self:
+            wp = WordPair(view.Word1, view.Word2, view.GoldSimilarity)
+            for attr in self.Similarities:
+                wp.SetOtherSimilarity(attr.replace("Similarity", ""), self.GetSimilarityValue(view.Row, attr))
+            wp.Note, wp.IsOOV = view.Note, view.IsOOV
+            wordpairs.append(wp)
+        return wordpairs
+
+    def SetSimilarityValue(self, row: int, attr: str, sim: Optional[float]):
+        column = self.Similarities.get(attr)
+        if column is None:
+            column = self.Similarities[attr] = array("d", [math.nan]) * len(self)
+        column[row] = math.nan if sim is None else sim
+
+    def GetSimilarityValue(self, row: int, attr: str) -> Optional[float]:
+        """
+        :return: None for the missing values.
+        """
+        value = self.GoldSimilarities[row] if attr == "GoldSimilarity" else self.Similarities[attr][row]
+        return None if math.isnan(value) else value
+
+    def SimilarityAttributes(self) -> List[str]:
+        return ["GoldSimilarity"] + list(self.Similarities)
+
+    def __len__(self) -> int:
+        return len(self.Word1Ids)
+
+    def __iter__(self) -> Iterator['WordPairView']:
+        for row in range(len(self)):  # Rows appended while iterating (snapshots run in a thread) are left to the next snapshot.
+            yield WordPairView(self, row)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union['WordPairView', 'WordPairTable']:
+        if isinstance(key, slice):
+            return WordPairTable.FromWordPairs((self[row] for row in range(*key.indices(len(self)))), self.Vocabulary)
+        return WordPairView(self, key if key >= 0 else len(self) + key)
+
+
+class WordPairView(object):
+    """
+    One row of a WordPairTable with the interface of WordPair. Changes are written to the table, except the ad-hoc attributes some stages add (e.g. Reason).
+    """
+
+    def __init__(self, table: WordPairTable, row: int) -> None:
+        if not 0 <= row < len(table): raise IndexError("WordPairTable row out of range: " + str(row))
+        self.Table: WordPairTable = table
+        self.Row: int = row
+
+    @property
+    def Word1(self) -> str:
+        return self.Table.Words[self.Table.Word1Ids[self.Row]]
+
+    @property
+    def Word2(self) -> str:
+        return self.Table.Words[self.Table.Word2Ids[self.Row]]
+
+    @property
+    def GoldSimilarity(self) -> Optional[float]:
+        return self.Table.GetSimilarityValue(self.Row, "GoldSimilarity")
+
+    @GoldSimilarity.setter
+    def GoldSimilarity(self, value: Optional[float]):
+        self.Table.GoldSimilarities[self.Row] = math.nan if value is None else value
+
+    @property
+    def goldSimilarity(self) -> Optional[float]:
+        return self.GoldSimilarity
+
+    @property
+    def Note(self) -> Optional[str]:
+        return self.Table.Notes.get(self.Row)
+
+    @Note.setter
+    def Note(self, value: Optional[str]):
+        if value is None:
+            self.Table.Notes.pop(self.Row, None)
+        else:
+            self.Table.Notes[self.Row] = value
+
+    @property
+    def IsOOV(self) -> Optional[bool]:
+        return self.Table.OOVs.get(self.Row)
+
+    @IsOOV.setter
+    def IsOOV(self, value: Optional[bool]):
+        if value is None:
+            self.Table.OOVs.pop(self.Row, None)
+        else:
+            self.Table.OOVs[self.Row] = value
+
+    def SetOtherSimilarity(self, simType: str, sim: float):
+        self.Table.SetSimilarityValue(self.Row, simType.lower() + "Similarity", sim)
+
+    def GetOtherSimilarity(self, simType: str) -> float:
+        val = getattr(self, simType.lower() + "Similarity")
+        return float(val) if val is not None and val >= 0 else None
+
+    def __getattr__(self, name: str):
+        """
+        Reads the other similarities as attributes like on WordPair (e.g. neditSimilarity).
+        """
+        table = self.__dict__.get("Table")
+        if table is not None and name in table.Similarities:
+            return table.GetSimilarityValue(self.Row, name)
+        raise AttributeError(name)
+
+    def SimilarityAttributes(self) -> List[str]:
+        return self.Table.SimilarityAttributes()
+
+    def ToKey(self):
+        return WordPair.ToOrderFreeUniqueStr(self.Word1, self.Word2)
+
+    def ToIdKey(self) -> int:
+        """
+        The order-free int key of the pair in the vocabulary of the table (see Vocabulary.PairKey).
+        """
+        return Vocabulary.OrderFreePairKey(self.Table.Word1Ids[self.Row], self.Table.Word2Ids[self.Row])
+
+    def ToPairDisplay(self) -> str:
+        return self.Word1.ljust(24) + "- " + self.Word2.ljust(24)
+
+    def __str__(self):
+        return str({attr: getattr(self, attr) for attr in ["Word1", "Word2"] + self.SimilarityAttributes() + ["Note", "IsOOV"]})
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class WordPairTableTest(TestCase):
+
+    def test_AppendWordPair_SameValuesThroughViews(self):
+        wp1 = WordPair("gokhan", "ercan", 0.5)
+        wp1.SetOtherSimilarity("nedit", 0.75)
+        wp2 = WordPair("ahmet", "mehmet")
+        wp2.Note = "note"
+        table = WordPairTable.FromWordPairs([wp1, wp2])
+        self.assertEqual(2, len(table))
+        self.assertEqual(4, len(table.Words))
+        self.assertEqual([wp1.ToKey(), wp2.ToKey()], [v.ToKey() for v in table])
+        self.assertEqual(0.75, table[0].GetOtherSimilarity("nedit"))
+        self.assertIsNone(table[1].GetOtherSimilarity("nedit"))
+        self.assertEqual("note", table[-1].Note)
+        self.assertEqual(0.5, table[0].GoldSimilarity)
+        self.assertIsNone(table[1].GoldSimilarity)
+
+    def test_SetOtherSimilarity_NewColumnThroughView(self):
+        table = WordPairTable()
+        table.Append("gokhan", "ercan")
+        table.Append("ahmet", "mehmet")
+        table[1].SetOtherSimilarity("Wn_path", 0.25)
+        self.assertEqual(["GoldSimilarity", "wn_pathSimilarity"], table[0].SimilarityAttributes())
+        self.assertIsNone(table[0].GetOtherSimilarity("wn_path"))
+        self.assertEqual(0.25, table[1].GetOtherSimilarity("wn_path"))
+        self.assertEqual("0.25", str(getattr(table[1], "wn_pathSimilarity")))
+
+    def test_SetOtherSimilarity_KeepsDoublePrecision(self):
+        wp = WordPair("processor", "professor")
+        wp.SetOtherSimilarity("nedit", 5 / 7)
+        table = WordPairTable.FromWordPairs([wp])
+        self.assertEqual(5 / 7, table[0].GetOtherSimilarity("nedit"))
+        self.assertEqual(str(5 / 7), str(table[0].neditSimilarity))     # As persisted.
+        self.assertGreaterEqual(table[0].GetOtherSimilarity("nedit"), 5 / 7)  # A pair at the threshold stays in its band.
+        self.assertEqual(wp.GetOtherSimilarity("nedit"), table.ToWordPairs()[0].GetOtherSimilarity("nedit"))
+
+    def test_Slice_CopiesRows(self):
+        table = WordPairTable.FromWordPairs([WordPair("a" + str(i), "b" + str(i), i / 10) for i in range(5)])
+        head = table[0:2]
+        self.assertEqual(2, len(head))
+        self.assertEqual("a1", head[1].Word1)
+        self.assertEqual(["a0-b0", "a1-b1"], [wp.ToKey() for wp in table.ToWordPairs()[0:2]])
+        self.assertIs(table.Vocabulary, head.Vocabulary)
+
+    def test_SharedVocabulary_WordsStoredOnce(self):
+        vocabulary = Vocabulary()
+        q3 = WordPairTable(vocabulary)
+        q4 = WordPairTable(vocabulary)
+        q3.Append("professor", "processor")
+        q4.Append("processor", "professor")
+        self.assertEqual(2, len(vocabulary))
+        self.assertEqual(q3[0].ToIdKey(), q4[0].ToIdKey())
+        self.assertEqual(vocabulary.PairKey("professor", "processor"), q4[0].ToIdKey())
+
+
+if __name__ == '__main__':
+    unittest.main()
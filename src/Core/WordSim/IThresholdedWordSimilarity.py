@@ -0,0 +1,31 @@
+# coding=utf-8
+from abc import ABC, abstractmethod
+from typing import Optional, List
+
+import numpy
+
+
+class IThresholdedWordSimilarity(ABC):
+    """
+    Similarities that can answer 'is it at least minSimilarity?' cheaper than computing the exact score.
+    Stage 2 only keeps pairs above Q3, so it uses this when the orthographic similarity supports it.
+    """
+
+    @abstractmethod
+    def WordSimilarityAtLeast(self, w1: str, w2: str, minSimilarity: float) -> Optional[float]:
+        """
+        :param w1:
+        :param w2:
+        :param minSimilarity:
+        :return: The exact similarity if it is greater than or equal to minSimilarity, otherwise None (without the exact value).
+        """
+        pass
+
+    def WordSimilarityBatchAtLeast(self, word: str, candidates: List[str], minSimilarity: float) -> numpy.ndarray:
+        """
+        WordSimilarityAtLeast of one word to many candidates: the same values as WordSimilarityBatch, and NaN for the candidates below minSimilarity.
+        This default scores the whole batch with WordSimilarityBatch and masks it; implementations can skip the candidates that cannot reach minSimilarity.
+        """
+        sims = self.WordSimilarityBatch(word, candidates)
+        sims[sims < minSimilarity] = numpy.nan
+        return sims
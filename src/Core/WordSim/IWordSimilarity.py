@@ -1,8 +1,10 @@
 # coding=utf-8
 from abc import abstractmethod
-from typing import Optional
+from typing import Optional, List
 from unittest import TestCase
 
+import numpy
+
 from src.Core.Dataset.DiscreteScale import DiscreteScale
 
 
@@ -15,6 +17,29 @@ class IWordSimilarity(object):
     def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
         pass
 
+    def WordSimilarityBatch(self, word: str, candidates: List[str]) -> numpy.ndarray:
+        """
+        Similarities of one word to many candidates in a single call. Stage 2 uses it to score a whole row of the pair triangle at once.
+        This default only loops over WordSimilarity; see IsBatchVectorized for the implementations that do better.
+        :return: float64 array aligned with candidates. None similarities are returned as NaN.
+        """
+        return numpy.array([self.WordSimilarity(word, c) for c in candidates], dtype=numpy.float64).reshape(len(candidates))
+
+    def WordSimilarityMatrix(self, wordsA: List[str], wordsB: List[str]) -> numpy.ndarray:
+        """
+        :return: float64 array of shape (len(wordsA), len(wordsB)). Built row by row from WordSimilarityBatch.
+        """
+        matrix = numpy.empty((len(wordsA), len(wordsB)), dtype=numpy.float64)
+        for r, word in enumerate(wordsA):
+            matrix[r] = self.WordSimilarityBatch(word, wordsB)
+        return matrix
+
+    def IsBatchVectorized(self) -> bool:
+        """
+        True if WordSimilarityBatch is faster than calling WordSimilarity for every candidate.
+        """
+        return False
+
     @staticmethod
     def ApplyScaling(score: Optional[float], scoreScale: DiscreteScale, finalScale: DiscreteScale) -> Optional[float]:
         """
@@ -73,6 +98,20 @@ class IWordSimilarity(object):
 
 class IWordSimilarityTest(TestCase):
 
+    def test_WordSimilarityBatch_Fallback_SameAsWordSimilarity(self):
+        class FirstLetterSimilarity(IWordSimilarity):
+            def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
+                return None if not w2 else (1.0 if w1[0] == w2[0] else 0.0)
+
+            def SimilarityScale(self) -> DiscreteScale:
+                return DiscreteScale(0, 1)
+
+        target = FirstLetterSimilarity()
+        self.assertEqual([1.0, 0.0], target.WordSimilarityBatch("gokhan", ["gamze", "ercan"]).tolist())
+        self.assertTrue(numpy.isnan(target.WordSimilarityBatch("gokhan", [""])[0]))
+        self.assertEqual((0,), target.WordSimilarityBatch("gokhan", []).shape)
+        self.assertEqual([[1.0, 0.0], [0.0, 1.0]], target.WordSimilarityMatrix(["gokhan", "ercan"], ["gamze", "emre"]).tolist())
+
     def test_ApplyScaling_MinIsNotZero(self):
         dsScale = DiscreteScale(1, 5)  # I later realized that MTurk771 is 1-5. The unrelated region looked completely empty.
         self.assertEqual(0,   IWordSimilarity.ApplyScaling(1, dsScale, DiscreteScale(0, 1)))
@@ -0,0 +1,168 @@
+# coding=utf-8
+import os
+import sqlite3
+import tempfile
+import unittest
+from typing import Optional, Dict, Tuple
+from unittest import TestCase
+
+from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.Morphology.RootDetection.RootDetectorCacher import MonitorableCacheBase
+from src.Core.WordNet.IWordNet import IWordNetMeasures, WordNetSimilarityAlgorithms
+from src.Core.WordPair import WordPair
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+from src.Tools import Resources
+
+
+class PersistentWordSimilarityCache(IWordSimilarity, MonitorableCacheBase):
+    """
+    Wraps any IWordSimilarity and keeps its scores in an SQLite file, so Stage 3 reruns (other thresholds, resumed sessions, other studies) do not compute the same pairs again.
+    Scores are keyed on the order-free pair key and the settings of the wrapped similarity (see SettingsKey); None scores are cached too.
+    The first order a pair is scored in serves both orders, like the pair keys of the datasets. Stage 3 pairs always come in the Stage 2 order.
+    New scores are written in batches, each in one transaction. Call Close (or Flush) to write the last batch.
+    """
+
+    def __init__(self, wrappedWordSimilarity: IWordSimilarity, path: str = None, settingsKey: str = None, batchSize: int = 1000) -> None:
+        """
+        :param path: Default (None): The cache shared by all studies (see DefaultPath).
+        :param settingsKey: Default (None): SettingsKey of the wrapped similarity.
+        :param batchSize: Number of new scores written per transaction.
+        """
+        super().__init__()
+        self._WrappedWordSimilarity: IWordSimilarity = wrappedWordSimilarity
+        self.Path: str = path or PersistentWordSimilarityCache.DefaultPath()
+        self.SettingsKey: str = settingsKey or PersistentWordSimilarityCache.SettingsKey(wrappedWordSimilarity)
+        self.BatchSize: int = batchSize
+        self._Pending: Dict[str, Optional[float]] = {}  # Pair key, score. Not written yet.
+        os.makedirs(os.path.dirname(self.Path) or ".", exist_ok=True)
+        self._Connection = sqlite3.connect(self.Path, timeout=60)
+        with self._Connection:
+            self._Connection.execute("PRAGMA journal_mode=WAL")      # Several studies can read while one writes.
+            self._Connection.execute("CREATE TABLE IF NOT EXISTS Settings (Id INTEGER PRIMARY KEY, Key TEXT NOT NULL UNIQUE)")
+            self._Connection.execute("CREATE TABLE IF NOT EXISTS Similarities (SettingsId INTEGER NOT NULL, Pair TEXT NOT NULL, Score REAL, PRIMARY KEY (SettingsId, Pair)) WITHOUT ROWID")
+            self._Connection.execute("INSERT OR IGNORE INTO Settings (Key) VALUES (?)", (self.SettingsKey,))
+        self._SettingsId: int = self._Connection.execute("SELECT Id FROM Settings WHERE Key = ?", (self.SettingsKey,)).fetchone()[0]
+
+    @staticmethod
+    def DefaultPath() -> str:
+        return str(os.path.join(Resources.GetResourcesSubFolder("Caches"), "WordSimilarityCache.sqlite"))
+
+    @staticmethod
+    def SettingsKey(wordSimilarity: IWordSimilarity) -> str:
+        """
+        :return: The WordNet version, algorithm, lemma-to-synset matching and POS filters of WordNet measures (the NLTK and the compiled ones share their scores),
+        with the information content file for LIN, JCN and RES, else the name of the similarity.
+        """
+        if isinstance(wordSimilarity, IWordNetMeasures):
+            posFilters = getattr(wordSimilarity, "WordSimPOSFilters", None) or []
+            key: str = "WordNet" + wordSimilarity.WordNetVersion() + "-" + wordSimilarity.Algorithm.name + "-" + wordSimilarity.Lemma2SynsetMatching.name + "-" + ",".join(pos.name for pos in posFilters)
+            if wordSimilarity.Algorithm in (WordNetSimilarityAlgorithms.LIN, WordNetSimilarityAlgorithms.JCN, WordNetSimilarityAlgorithms.RES):
+                icFile: str = getattr(wordSimilarity, "InformationContentFile", None)
+                if not icFile:
+                    raise Exception("The scores of " + wordSimilarity.Algorithm.name + " depend on an information content that is not a known file, they cannot be cached.")
+                key = key + "-" + icFile
+            return key
+        return type(wordSimilarity).__name__ + "-" + str(wordSimilarity)
+
+    def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
+        key: str = WordPair.ToOrderFreeUniqueStr(w1, w2)
+        self.Attempt = self.Attempt + 1
+        found, score = self._Get(key)
+        if found:
+            self.Hit = self.Hit + 1
+            return score
+        self.Miss = self.Miss + 1
+        score = self._WrappedWordSimilarity.WordSimilarity(w1, w2)
+        self._Pending[key] = score
+        if len(self._Pending) >= self.BatchSize:
+            self.Flush()
+        return score
+
+    def _Get(self, key: str) -> Tuple[bool, Optional[float]]:
+        if key in self._Pending:
+            return True, self._Pending[key]
+        row = self._Connection.execute("SELECT Score FROM Similarities WHERE SettingsId = ? AND Pair = ?", (self._SettingsId, key)).fetchone()
+        return (False, None) if row is None else (True, row[0])
+
+    def Flush(self) -> None:
+        if not self._Pending:
+            return
+        with self._Connection:
+            self._Connection.executemany("INSERT OR REPLACE INTO Similarities (SettingsId, Pair, Score) VALUES (?, ?, ?)",
+                                         ((self._SettingsId, key, score) for key, score in self._Pending.items()))
+        self._Pending.clear()
+
+    def Close(self) -> None:
+        self.Flush()
+        self._Connection.close()
+
+    def CachedItemCount(self):
+        return self._Connection.execute("SELECT COUNT(*) FROM Similarities WHERE SettingsId = ?", (self._SettingsId,)).fetchone()[0] + len(self._Pending)
+
+    def Report(self) -> str:
+        ratio: str = str(round(self.Hit / self.Attempt * 100, 2)) if self.Attempt else "0"
+        return "Similarity cache " + self.SettingsKey + ": " + str(self.Hit) + " hits, " + str(self.Miss) + " misses (" + ratio + "% served from " + self.Path + ")"
+
+    def SimilarityScale(self) -> DiscreteScale:
+        return self._WrappedWordSimilarity.SimilarityScale()
+
+    def __str__(self) -> str:
+        return "Cached " + str(self._WrappedWordSimilarity)
+
+
+class PersistentWordSimilarityCacheTest(TestCase):
+
+    class _CountingSimilarity(IWordSimilarity):
+        def __init__(self) -> None:
+            self.Calls = 0
+
+        def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
+            self.Calls += 1
+            return None if w2 == "oov" else len(set(w1) & set(w2)) / 10.0
+
+        def SimilarityScale(self) -> DiscreteScale:
+            return DiscreteScale(0, 1)
+
+        def __str__(self) -> str:
+            return "counting"
+
+    def test_WordSimilarity_ServedFromFileAcrossInstances(self):
+        path = os.path.join(tempfile.mkdtemp(), "WordSimilarityCache.sqlite")
+        sim = PersistentWordSimilarityCacheTest._CountingSimilarity()
+        target = PersistentWordSimilarityCache(sim, path, batchSize=2)
+        self.assertEqual(0.3, target.WordSimilarity("bank", "ban"))
+        self.assertEqual(0.3, target.WordSimilarity("ban", "bank"))     # Order-free key.
+        self.assertIsNone(target.WordSimilarity("bank", "oov"))
+        self.assertEqual(2, sim.Calls)
+        self.assertEqual((1, 2), (target.Hit, target.Miss))
+        target.Close()
+
+        target = PersistentWordSimilarityCache(sim, path)
+        self.assertEqual(0.3, target.WordSimilarity("bank", "ban"))
+        self.assertIsNone(target.WordSimilarity("bank", "oov"))
+        self.assertEqual(2, sim.Calls)
+        self.assertEqual(2, target.CachedItemCount())
+        other = PersistentWordSimilarityCache(sim, path, settingsKey="other")   # Other settings do not share the scores.
+        self.assertEqual(0, other.CachedItemCount())
+        target.Close()
+        other.Close()
+
+    def test_SettingsKey_InformationContentAndWordNetVersion(self):
+        from src.Core.WordNet.NLTKWordNetWrapper import NLTKWordNetWrapper
+
+        class _VersionedWordNet(NLTKWordNetWrapper):
+            def WordNetVersion(self) -> str:
+                return "3.0"
+
+        lin = _VersionedWordNet(WordNetSimilarityAlgorithms.LIN)
+        brown = PersistentWordSimilarityCache.SettingsKey(lin)
+        self.assertTrue(brown.startswith("WordNet3.0-LIN-"))
+        lin.InformationContentFile = "ic-semcor.dat"
+        self.assertNotEqual(brown, PersistentWordSimilarityCache.SettingsKey(lin))
+        lin.InformationContent = {}     # Not a known file.
+        self.assertRaises(Exception, PersistentWordSimilarityCache.SettingsKey, lin)
+        self.assertNotIn("ic-", PersistentWordSimilarityCache.SettingsKey(_VersionedWordNet(WordNetSimilarityAlgorithms.PATH)))
+
+
+if __name__ == "__main__":
+    unittest.main()
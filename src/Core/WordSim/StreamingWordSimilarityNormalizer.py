@@ -0,0 +1,120 @@
+# coding=utf-8
+import math
+import os
+import tempfile
+import unittest
+from typing import Optional, List
+from unittest import TestCase
+
+import numpy
+
+from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.WordPair import WordPair
+from src.Core.WordSim.IWordSimilarity import IWordSimilarity
+from src.Core.WordSim.WordSimilarityNormalizerWrapper import WordSimilarityNormalizerWrapper
+from src.Tools import ValueHelper
+from src.Tools.Logger import logp
+from src.Tools.Progressor import Progressor
+
+
+class StreamingWordSimilarityNormalizer(object):
+    """
+    Min-max normalization of an open-scale IWordSimilarity over a word pair list, with the same values as WordSimilarityNormalizerWrapper but without its per-pair dict.
+    Pass one scores the pairs in their order into a float64 array (a memory-mapped spill file if a path is given) and tracks the min/max; pass two rescales the array in place.
+    The scores are then read by the index of the pair (see ScoreInScale). None scores are NaN.
+    """
+
+    def __init__(self, wordSimilarity: IWordSimilarity, normalizationScale: DiscreteScale, spillPath: str = None) -> None:
+        """
+        :param normalizationScale: The scale to be achieved as a result.
+        :param spillPath: If given, the scores are kept in this file instead of memory.
+        """
+        super().__init__()
+        self.WordSimilarity: IWordSimilarity = wordSimilarity
+        self.NormalizationScale: DiscreteScale = normalizationScale
+        self.SpillPath: str = spillPath
+        self.DynamicScale: DiscreteScale = None     # Min and max of the raw scores, after Normalize.
+
+    def Normalize(self, wordpairs: List[WordPair]) -> numpy.ndarray:
+        """
+        :return: float64 array aligned with the word pairs, in the normalization scale.
+        """
+        count: int = len(wordpairs)
+        if count <= 10:
+            logp("Min-max normalization may not give good results with such a small wordpair list!!!! Only " + str(count) + " wordpairs. Ensure at least Min and Max values exist!!")
+        scores: numpy.ndarray = numpy.memmap(self.SpillPath, dtype=numpy.float64, mode="w+", shape=(count,)) if self.SpillPath and count else numpy.empty(count, dtype=numpy.float64)
+
+        # Pass one: raw scores
+        logp("StreamingWordSimilarityNormalizer: Scoring " + str(count) + " wordpairs ...", anyMode=True)
+        prog = Progressor(expectedIteration=count)
+        inf = ValueHelper.POSITIVE_INF
+        minval: Optional[float] = None
+        maxval: Optional[float] = None
+        for i, wp in enumerate(wordpairs):
+            prog.logpif(i, iterstr="wordpair", progressBatchSize=int(count / 100), anyMode=True)
+            sim = self.WordSimilarity.WordSimilarityInScale(wp.Word1, wp.Word2, self.NormalizationScale)
+            if sim is None:
+                scores[i] = numpy.nan
+                continue
+            scores[i] = sim
+            if sim:     # Zero scores do not count for the min/max, as in WordSimilarityNormalizerWrapper.
+                if minval is None or sim < minval: minval = sim
+                if sim != inf and (maxval is None or sim > maxval): maxval = sim
+        mScale = self.WordSimilarity.SimilarityScale()
+        if mScale.Min is not None: minval = mScale.Min
+        if minval is None or maxval is None: raise Exception("Cannot normalize: no non-zero score among " + str(count) + " wordpairs.")
+        self.DynamicScale = DiscreteScale(minval, maxval)
+
+        # Pass two: rescale in place, same arithmetic as IWordSimilarity.ApplyScaling
+        scores[scores == inf] = maxval
+        final = self.NormalizationScale
+        if final is not None and final.IsNormalized():
+            if maxval == 0:
+                scores[~numpy.isnan(scores)] = 0
+            else:
+                scores -= minval
+                scores /= (maxval - minval)
+                scores *= (final.Max - final.Min)
+                scores += final.Min
+                numpy.clip(scores, final.Min, final.Max, out=scores)
+        if isinstance(scores, numpy.memmap):
+            scores.flush()
+        logp("StreamingWordSimilarityNormalizer: Normalization completed in " + str(self.DynamicScale) + "!", anyMode=True)
+        return scores
+
+    def ScoreInScale(self, normalized: float, finalScale: DiscreteScale) -> Optional[float]:
+        """
+        :param normalized: A score of the Normalize array.
+        :return: The score in the final scale, None for the pairs without a score.
+        """
+        if math.isnan(normalized): return None
+        return IWordSimilarity.ApplyScaling(float(normalized), self.NormalizationScale, finalScale)
+
+
+class StreamingWordSimilarityNormalizerTest(TestCase):
+
+    class _OpenScaleSimilarity(IWordSimilarity):
+        def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
+            if w2 == "oov": return None
+            if w2 == "same": return ValueHelper.POSITIVE_INF
+            return len(w1) * len(w2) * 7 % 11 / 3.0
+
+        def SimilarityScale(self) -> DiscreteScale:
+            return DiscreteScale(0, None)
+
+    def test_Normalize_SameAsNormalizerWrapper(self):
+        words = ["a", "bb", "ccc", "dddd", "eeeee", "oov", "same", "ffffff"]
+        wps = [WordPair(w1, w2) for i, w1 in enumerate(words) for w2 in words[i + 1:]]
+        sim = StreamingWordSimilarityNormalizerTest._OpenScaleSimilarity()
+        expected = WordSimilarityNormalizerWrapper(sim, wps, DiscreteScale(0, 1))
+        for spillPath in [None, os.path.join(tempfile.mkdtemp(), "scores.bin")]:
+            target = StreamingWordSimilarityNormalizer(sim, DiscreteScale(0, 1), spillPath)
+            scores = target.Normalize(wps)
+            actual = [target.ScoreInScale(score, DiscreteScale(0, 1)) for score in scores]
+            self.assertEqual([expected.WordSimilarityInScale(wp.Word1, wp.Word2, DiscreteScale(0, 1)) for wp in wps], actual)
+        self.assertIn(None, actual)
+        self.assertIn(1.0, actual)
+
+
+if __name__ == "__main__":
+    unittest.main()
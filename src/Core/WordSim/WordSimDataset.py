@@ -1,7 +1,7 @@
 # coding=utf-8
 import unittest
 from operator import index
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple, Union
 from unittest import TestCase
 from pandas import DataFrame
 
@@ -10,7 +10,9 @@ from src.Core.Dataset.DiscreteScale import DiscreteScale
 from src.Core.Dataset.MetadataParser import MetadataParser
 from src.Core.Languages.Grammars.IGrammar import IGrammar
 from src.Core.Languages.LinguisticContext import LinguisticContext
+from src.Core.Vocabulary import Vocabulary
 from src.Core.WordPair import WordPair
+from src.Core.WordPairTable import WordPairTable
 from src.Core.WordSim.IWordSimilarity import IWordSimilarity
 from src.Tools import Resources
 from src.Tools.Logger import logp
@@ -26,8 +28,9 @@ class WordSimDataset(Dataset, IWordSimilarity):
         super().__init__()
         self.Filename = filename
         self.FullPath = fullPath
-        self.Wordpairs:List[WordPair] = []
-        self._WPIndex:Dict[str,WordPair] = {}  #WpKey,WordPair
+        self.Wordpairs:Union[List[WordPair],WordPairTable] = []
+        self._WPIndex:Dict[int,Union[WordPair,int]] = {}  #Vocabulary pair key,WordPair (or its row in a WordPairTable)
+        self._IndexVocabulary:Vocabulary = None           # The table's vocabulary, or one of the dataset's own pairs for lists.
         self.Name:str = filename
         if(scale is None): scale = DiscreteScale(0,10)      #default
         self.Scale:DiscreteScale = scale
@@ -35,11 +38,17 @@ class WordSimDataset(Dataset, IWordSimilarity):
         self.GoldSimilarityColumn = "GoldSimilarity"     # Which column should be used for IWordSimilarity evaluations as ground truth for this dataset!
 
     def _IndexWordpairs(self):
+        if isinstance(self.Wordpairs, WordPairTable):   # Rows instead of views, which would cost as much as the pairs the table saves.
+            self._IndexVocabulary = self.Wordpairs.Vocabulary
+            for wp in self.Wordpairs:
+                self._WPIndex[wp.ToIdKey()] = wp.Row
+            return
+        self._IndexVocabulary = Vocabulary()
         for wp in self.Wordpairs:
-            wpkey = wp.ToKey()
+            wpkey = self._IndexVocabulary.PairKey(wp.Word1, wp.Word2)
             self._WPIndex[wpkey] = wp
 
-    def LoadWithWordPairs(self, wordpairs:List[WordPair]):
+    def LoadWithWordPairs(self, wordpairs:Union[List[WordPair],WordPairTable]):
         self.Wordpairs = wordpairs
         self._IndexWordpairs()
 
@@ -56,58 +65,59 @@ class WordSimDataset(Dataset, IWordSimilarity):
 
         # Get Schema from the first record. - If it exists in the first record, we assume it exists in the others as well.
         wpFirst = self.Wordpairs[0]
-        attrs = vars(wpFirst)
-        simColumns:List[str] = []
+        attrs = wpFirst.SimilarityAttributes()
         simAttrs:List[str] = []
         for attr in attrs:
             if (attr == "GoldSimilarity"): continue
             if attr.__contains__("Similarity"):
-                simColumns.append(attr.replace("Similarity","").lower())
                 simAttrs.append(attr)
 
         # Iterate and save
         index = 0
-        line:str = ""
+        effScale = metaScale if metaScale else self.Scale
         with open(newPath,mode="w+",encoding="utf-8",errors='ignore',) as wr:
-            # Header
-            header = "w1\tw2\tgold"
-            colIndex = 0
-            for simColumn in simColumns:
-                header = header + "\t" + str(simColumn)
-                colIndex += 1
-            header = header + "\tNote"     #wp.Note column
-            wr.write(header + "\n")
+            # Headers
+            if(effScale):
+                wr.write(WordSimDataset.ScaleHeader(effScale) + "\n")
+            wr.write(WordSimDataset.PersistHeader(simAttrs) + "\n")
 
             for wp in self.Wordpairs:
-                # Core
-                line = wp.Word1 + "\t" + wp.Word2 + "\t" + ("" if wp.GoldSimilarity is None else str(wp.GoldSimilarity))
+                index += 1
+                wr.write(WordSimDataset.PersistLine(wp, simAttrs) + "\n")
+        logp("Dataset kaydedildi. Path: " + newPath)
 
-                # From Other
-                colIndex = 0
-                for simColumn in simColumns:
-                    try:
-                        line = line +"\t" + str(wp.__getattribute__(simAttrs[colIndex]))
-                        colIndex += 1
-                    except Exception as ex:
-                        print("An exception occurred: " + str(ex))
+    @staticmethod
+    def ScaleHeader(scale:DiscreteScale)->str:
+        return "#Scale=" + str(scale.Min) +"-" + str(scale.Max)
 
-                if wp.Note is not None:     # Wp.Note column
-                    line = line + "\t'" + wp.Note + "'"        # There should be no special characters in Note!
+    @staticmethod
+    def PersistHeader(simAttrs:List[str])->str:
+        """
+        Column header of the persisted files for the given other similarity attributes (e.g. neditSimilarity).
+        """
+        header = "w1\tw2\tgold"
+        for attr in simAttrs:
+            header = header + "\t" + attr.replace("Similarity","").lower()
+        return header + "\tNote"     #wp.Note column
 
-                index += 1
-                wr.write(line + "\n")
+    @staticmethod
+    def PersistLine(wp, simAttrs:List[str])->str:
+        """
+        One persisted line of a WordPair (or a WordPairView), without the line break.
+        """
+        # Core
+        line = wp.Word1 + "\t" + wp.Word2 + "\t" + ("" if wp.GoldSimilarity is None else str(wp.GoldSimilarity))
 
-        # Add Headers
-        effScale = metaScale if metaScale else self.Scale
-        if(effScale):
-            lines = None
-            with open(newPath,encoding="utf-8",errors='ignore') as fp:
-                lines = fp.readlines()
-            with open(newPath,mode="w+",encoding="utf-8",errors='ignore',) as wr:
-                wr.write("#Scale=" + str(effScale.Min) +"-" + str(effScale.Max) + "\n")
-                for line in lines:
-                    wr.write(line)
-        logp("Dataset kaydedildi. Path: " + newPath)
+        # From Other
+        for attr in simAttrs:
+            try:
+                line = line +"\t" + str(getattr(wp, attr))
+            except Exception as ex:
+                print("An exception occurred: " + str(ex))
+
+        if wp.Note is not None:     # Wp.Note column
+            line = line + "\t'" + wp.Note + "'"        # There should be no special characters in Note!
+        return line
 
     def ToWSQuestExcel(self, excelFilePath:str):
         """
@@ -129,7 +139,11 @@ class WordSimDataset(Dataset, IWordSimilarity):
             index += 1
         df.to_excel(excelFilePath,sheet_name="Questions",columns=["W1","W2","Qtype"],index=True)
 
-    def Load(self, autoLowerCase:bool=True):
+    def Load(self, autoLowerCase:bool=True, asTable:bool=False, vocabulary:Vocabulary=None):
+        """
+        :param asTable: Loads the word pairs into a WordPairTable instead of a list, for the large Stage 2 and Stage 3 files.
+        :param vocabulary: Vocabulary of the table. Default (None): A vocabulary of the table only.
+        """
         # Validate
         if(autoLowerCase and self.LinguisticContext is None): raise Exception("Cannot lowercase when LinguisticContext is null!")
 
@@ -141,13 +155,13 @@ class WordSimDataset(Dataset, IWordSimilarity):
             path = Resources.GetWordSimilarityFile(self.Filename)
 
         # Load
-        wordpairs, metadata = self.ReadWordPairs(path)
         grammar:IGrammar = self.LinguisticContext.BuildGrammar() if self.LinguisticContext else None
-        for wp in wordpairs:
-            if(autoLowerCase):
-                wp.Word1 = grammar.ToLowerCase(wp.Word1)
-                wp.Word2 = grammar.ToLowerCase(wp.Word2)
-            self.Wordpairs.append(wp)
+        lowerCase = (lambda wp: (grammar.ToLowerCase(wp.Word1), grammar.ToLowerCase(wp.Word2))) if autoLowerCase else None
+        wordpairs, metadata = self.ReadWordPairs(path, asTable=asTable, wordsTransform=lowerCase, vocabulary=vocabulary)
+        if(asTable):
+            self.Wordpairs = wordpairs
+        else:
+            self.Wordpairs.extend(wordpairs)
         self._IndexWordpairs()
         self.Scale = self.GetMetadataScaleOrDefault(metadata)
         return self
@@ -192,10 +206,10 @@ class WordSimDataset(Dataset, IWordSimilarity):
 
     #region IWordSimilarity
     def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
-        wpq:WordPair = WordPair(w1,w2)
-        qkey = wpq.ToKey()
+        qkey = self._IndexVocabulary.TryGetPairKey(w1,w2) if self._IndexVocabulary else None
         wp:WordPair = self._WPIndex.get(qkey)
         if(wp is None): return None
+        if(isinstance(wp, int)): wp = self.Wordpairs[wp]
         return self.GetGoldValue(wp)
 
     def SimilarityScale(self) -> DiscreteScale:
@@ -208,11 +222,7 @@ class WordSimDataset(Dataset, IWordSimilarity):
         """
         if len(self.Wordpairs) == 0: raise Exception("Dataset should be loaded first to get that info!")
         wp = self.Wordpairs[0]      #Using the first instance
-        columns = []
-        for k,v in wp.__dict__.items():
-            if(k.__contains__("Similarity")):
-                columns.append(k)
-        return columns
+        return wp.SimilarityAttributes()
 
     def GetGoldSimilarityColumn(self):
         return self.GoldSimilarityColumn
@@ -234,9 +244,13 @@ class WordSimDataset(Dataset, IWordSimilarity):
     #endregion
 
     @staticmethod
-    def ReadWordPairs(path:str, delimiter='\t', case_insensitive=False, minGoldSimilarity:float = None, maxGoldSimilarity = None, autoTrimWords:bool = False, metadataOnly:bool = False)->Tuple[List[WordPair], Dict[str,str]]:
+    def ReadWordPairs(path:str, delimiter='\t', case_insensitive=False, minGoldSimilarity:float = None, maxGoldSimilarity = None, autoTrimWords:bool = False, metadataOnly:bool = False,
+                      asTable:bool = False, wordsTransform = None, vocabulary:Vocabulary = None)->Tuple[Union[List[WordPair],WordPairTable], Dict[str,str]]:
         """
         Reads WordSim files from the filesystem.
+        :param asTable: Returns a WordPairTable. Each line is parsed into a WordPair and copied into the table, so only the table stays in memory.
+        :param vocabulary: Only with asTable. Vocabulary of the table, e.g. the one shared by the stages of a study.
+        :param wordsTransform: Optional function of a parsed WordPair returning its (word1, word2), applied before storing. Used to lowercase.
         :param path:
         :param delimiter:
         :param case_insensitive:
@@ -244,7 +258,7 @@ class WordSimDataset(Dataset, IWordSimilarity):
         :param maxGoldSimilarity: If given, does not load word pairs with values greater than the given max value.
         :return:
         """
-        wordpairs:List[WordPair] = []
+        wordpairs:Union[List[WordPair],WordPairTable] = WordPairTable(vocabulary) if asTable else []
         headerLine:str = None
 
         # Meta
@@ -311,7 +325,12 @@ class WordSimDataset(Dataset, IWordSimilarity):
                             if (wp.GoldSimilarity < minGoldSimilarity): continue
                         if(maxGoldSimilarity):
                             if (wp.GoldSimilarity > maxGoldSimilarity): continue
-                    wordpairs.append(wp)
+                    if(wordsTransform):
+                        wp.Word1, wp.Word2 = wordsTransform(wp)
+                    if(asTable):
+                        wordpairs.AppendWordPair(wp)
+                    else:
+                        wordpairs.append(wp)
 
         # set metadatas
         logp("Loaded wordpairs from path: " + path + " ("+ str(len(wordpairs)) + " items)",True)
@@ -374,5 +393,27 @@ class WordSimDatasetTest(TestCase):
         self.assertEqual(0.4, merged.Wordpairs[1].GoldSimilarity)
 
 
+    def test_Persist_WordPairTable_SameFileAsWordPairList(self):
+        import os, tempfile
+        from src.Core.WordPairTable import WordPairTable
+        wps = [WordPair("gokhan", "ercan", 0.5), WordPair("ahmet", "mehmet", 0.25)]
+        wps[0].SetOtherSimilarity("nedit", 0.75)
+        wps[1].SetOtherSimilarity("nedit", 0.5)
+        wps[1].Note = "note"
+        paths = []
+        for wordpairs in [wps, WordPairTable.FromWordPairs(wps)]:
+            ds = WordSimDataset(scale=DiscreteScale(0, 1))
+            ds.LoadWithWordPairs(wordpairs)
+            self.assertEqual(0.25, ds.WordSimilarity("mehmet", "ahmet"))
+            paths.append(os.path.join(tempfile.mkdtemp(), "ds.csv"))
+            ds.Persist(paths[-1])
+        with open(paths[0], encoding="utf-8") as f1, open(paths[1], encoding="utf-8") as f2:
+            self.assertEqual(f1.read(), f2.read())
+        loaded = WordSimDataset(fullPath=paths[1]).Load(autoLowerCase=False, asTable=True)
+        self.assertIsInstance(loaded.Wordpairs, WordPairTable)
+        self.assertEqual(0.5, loaded.Wordpairs[1].GetOtherSimilarity("nedit"))
+        self.assertEqual(["GoldSimilarity", "neditSimilarity"], loaded.GetSimilarityColumns())
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
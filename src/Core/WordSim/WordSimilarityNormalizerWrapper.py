@@ -4,7 +4,9 @@ from typing import Optional, List, Dict
 from unittest import TestCase
 
 from src.Core.Dataset.DiscreteScale import DiscreteScale
+from src.Core.Vocabulary import Vocabulary
 from src.Core.WordPair import WordPair
+from src.Core.WordPairTable import WordPairTable
 from src.Core.WordSim.IWordSimilarity import IWordSimilarity
 from src.Core.WordSim.WordSimDataset import WordSimDataset
 from src.Tools import ValueHelper
@@ -30,7 +32,8 @@ class WordSimilarityNormalizerWrapper(IWordSimilarity):
         self._WrappedWordSimilarity = wrappedWordSimilarity
         self.OriginalWordPairs: List[WordPair] = wordpairs
         self.NormalizationScale: DiscreteScale = normalizationScale
-        self._ScaledScores: Dict[WordPair, float] = None
+        self._ScaledScores: Dict[int, float] = None  # Vocabulary pair key, score.
+        self._Vocabulary: Vocabulary = wordpairs.Vocabulary if isinstance(wordpairs, WordPairTable) else Vocabulary()
         self._IsNormalized = False
         if(len(wordpairs) <= 10):
             logp("Min-max normalization may not give good results with such a small wordpair list!!!! Only " + str(len(wordpairs)) + " wordpairs. Ensure at least Min and Max values exist!!")
@@ -44,7 +47,7 @@ class WordSimilarityNormalizerWrapper(IWordSimilarity):
         :param wordPairs:
         :return:
         """
-        self._ScaledScores: Dict[WordPair, float] = {}
+        self._ScaledScores: Dict[int, float] = {}
         m: IWordSimilarity = self._WrappedWordSimilarity
         mScale = m.SimilarityScale()
 
@@ -56,7 +59,7 @@ class WordSimilarityNormalizerWrapper(IWordSimilarity):
             # print(str(iter))
             prog.logpif(iter, iterstr="wordpair", progressBatchSize=int(self.OriginalWordPairs.__len__() / 100), anyMode=True)
             sim = m.WordSimilarityInScale(wp.Word1, wp.Word2, self.NormalizationScale)
-            self._ScaledScores[wp.ToKey()] = sim
+            self._ScaledScores[self._Vocabulary.PairKey(wp.Word1, wp.Word2)] = sim
             iter = iter + 1
 
         # Normalizing
@@ -68,7 +71,7 @@ class WordSimilarityNormalizerWrapper(IWordSimilarity):
         dynamicScale = DiscreteScale(minval, maxval)
         i = 0
         for wp in self.OriginalWordPairs:
-            wpkey = wp.ToKey()
+            wpkey = self._Vocabulary.PairKey(wp.Word1, wp.Word2)
             sim = self._ScaledScores.get(wpkey)
             if(sim is None): continue
             if(sim == inf): sim = maxval  # If INF exists, set it to max.
@@ -80,12 +83,12 @@ class WordSimilarityNormalizerWrapper(IWordSimilarity):
         logp("WordSimilarityNormalizerWrapperNormalization completed!", anyMode=True)
 
     def WordSimilarity(self, w1: str, w2: str) -> Optional[float]:
-        return self._ScaledScores[WordPair(w1, w2).ToKey()]
+        return self._ScaledScores[self._Vocabulary.TryGetPairKey(w1, w2)]
 
     def WordSimilarityInScale(self, w1: str, w2: str, finalScale: DiscreteScale):
         # The normalized scale and finalScale are still different. FinalScale: The projection scale aimed at the end. Normalization is the result of MinMax scaling.
         if(self._IsNormalized):
-            simNormalized = self._ScaledScores.get(WordPair(w1, w2).ToKey())
+            simNormalized = self._ScaledScores.get(self._Vocabulary.TryGetPairKey(w1, w2))
             if(simNormalized is None):  return None  # OOV
             return self.ApplyScaling(simNormalized, self.SimilarityScale(), finalScale)
         else:
@@ -8,7 +8,7 @@ from src.Core.Languages.LinguisticContext import LinguisticContext
 from src.Core.Morphology.POSTypes import POSTypes
 from src.Core.OSimUnrPipeline.EnglishPipeline import EnglishPipeline
 from src.Core.OSimUnrPipeline.PipelineProviderBase import PipelineProviderBase
-from src.Core.Orthographic.NormalizedStringSimilarity.EditDistance import EditDistance
+from src.Core.Orthographic.NormalizedStringSimilarity.BitParallelEditDistance import BitParallelEditDistance
 from src.Core.WordNet.NLTKWordNetWrapper import QueryLanguages
 
 from src.Tools import Resources
@@ -17,7 +17,7 @@ from src.Tools.Logger import logp
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 if __name__ == '__main__':
-    englishPipeline: PipelineProviderBase = EnglishPipeline(LinguisticContext.BuildEnglishContext(), EditDistance())
+    englishPipeline: PipelineProviderBase = EnglishPipeline(LinguisticContext.BuildEnglishContext(), BitParallelEditDistance())
     Generator.Provider =  englishPipeline
     print(englishPipeline)
     # exit()